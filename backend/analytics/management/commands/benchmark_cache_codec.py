@@ -0,0 +1,117 @@
+"""
+Django management command comparing cache codec formats.
+
+Encodes sample values as plain JSON (the format used before the codec),
+JSON and msgpack, each with and without zlib, and reports the stored size
+and the encode/decode time of each. Samples are real cache entries matching
+--pattern when given, otherwise synthetic citation results.
+
+Usage:
+    python manage.py benchmark_cache_codec
+    python manage.py benchmark_cache_codec --pattern 'citation_cache:*' --limit 200
+"""
+
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.cache_codec import CacheCodec, msgpack
+from analytics.services.redis_service import redis_service
+
+# Disables compression
+NEVER = 2 ** 62
+
+
+class Command(BaseCommand):
+    help = 'Compare size and speed of the cache codec formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pattern',
+            help='Sample cached values from keys matching this pattern',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Number of sample values (default: 100)',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=20,
+            help='Encode/decode rounds per value (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        samples = self._samples(options['pattern'], options['limit'])
+        if not samples:
+            raise CommandError('No sample values found')
+
+        formats = [('json', NEVER), ('json', 0)]
+        if msgpack is not None:
+            formats += [('msgpack', NEVER), ('msgpack', 0)]
+        else:
+            self.stdout.write(self.style.WARNING('msgpack is not installed; skipping msgpack formats'))
+
+        rounds = options['rounds']
+        plain = sum(len(json.dumps(value).encode()) for value in samples)
+        self.stdout.write(f'{len(samples)} values, {plain / 1024:,.1f} KiB as plain JSON')
+        for serializer, threshold in formats:
+            codec = CacheCodec(serializer=serializer, compress_threshold=threshold)
+            encoded = [codec.encode(value) for value in samples]
+            size = sum(len(value) for value in encoded)
+
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for value in samples:
+                    codec.encode(value)
+            encode_us = (time.perf_counter() - started) / (rounds * len(samples)) * 1e6
+
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for value in encoded:
+                    codec.decode(value)
+            decode_us = (time.perf_counter() - started) / (rounds * len(samples)) * 1e6
+
+            name = serializer + (' + zlib' if threshold == 0 else '')
+            self.stdout.write(
+                f'  {name:<15} {size / 1024:>9,.1f} KiB ({size / plain:>4.0%})  '
+                f'encode {encode_us:>8.1f} us  decode {decode_us:>8.1f} us'
+            )
+
+    def _samples(self, pattern, limit):
+        if not pattern:
+            return [self._citation_result(i) for i in range(limit)]
+
+        client = redis_service.raw_client
+        if client is None:
+            raise CommandError('Redis is not reachable')
+        samples = []
+        for key in redis_service.client.scan_iter(match=pattern, count=500):
+            raw = client.get(key)
+            if raw:
+                samples.append(CacheCodec().decode(raw))
+            if len(samples) >= limit:
+                break
+        return samples
+
+    @staticmethod
+    def _citation_result(seed):
+        return {
+            "article_title": f"Synthetic article {seed}",
+            "citation_count": 40,
+            "total_results": 40,
+            "search_query": f'"Synthetic article {seed}"',
+            "citations": [
+                {
+                    "title": f"Citing work {seed}-{i}: a study of scholarly communication",
+                    "link": f"https://example.org/works/{seed}/{i}",
+                    "snippet": "This paper builds on prior findings about open access "
+                               f"publishing in East Africa and extends them to {i} journals.",
+                    "year": str(2015 + i % 10),
+                    "venue": ["Nature", "PLOS ONE", "arXiv", "Scientometrics"][i % 4],
+                    "cited_by": i * 3,
+                }
+                for i in range(40)
+            ],
+        }
@@ -0,0 +1,103 @@
+"""
+Django management command comparing Redis memory use of the two article
+counter layouts.
+
+Writes synthetic view/download counters under a scratch prefix in each
+layout, measures the change in used_memory and deletes them again. Run it
+against a non-production Redis with the same configuration as production.
+
+Usage:
+    python manage.py benchmark_counter_layout
+    python manage.py benchmark_counter_layout --articles 50000 --bucket-size 64
+"""
+
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.redis_service import redis_service, counter_bucket_key, COUNTER_FIELDS
+
+PREFIX = "benchmark:counter-layout"
+
+
+class Command(BaseCommand):
+    help = 'Compare memory use of the keys and hash article counter layouts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--articles',
+            type=int,
+            default=20000,
+            help='Number of synthetic articles (default: 20000)',
+        )
+        parser.add_argument(
+            '--bucket-size',
+            type=int,
+            default=64,
+            help='Articles per counter hash (default: 64)',
+        )
+
+    def handle(self, *args, **options):
+        client = redis_service.client
+        if client is None:
+            raise CommandError('Redis is not reachable')
+
+        articles = options['articles']
+        bucket_size = options['bucket_size']
+        counts = [
+            (str(article_id), random.randint(0, 100000), random.randint(0, 5000))
+            for article_id in range(1, articles + 1)
+        ]
+
+        self.stdout.write(f'Benchmarking {articles} articles (bucket size {bucket_size})...')
+
+        def write_keys(pipe):
+            for article_id, views, downloads in counts:
+                pipe.set(f"{PREFIX}:article:{article_id}:views", views)
+                pipe.set(f"{PREFIX}:article:{article_id}:downloads", downloads)
+
+        def write_hash(pipe):
+            for article_id, views, downloads in counts:
+                bucket = counter_bucket_key(article_id, bucket_size, prefix=f"{PREFIX}:counters")
+                pipe.hset(bucket, f"{article_id}:{COUNTER_FIELDS['views']}", views)
+                pipe.hset(bucket, f"{article_id}:{COUNTER_FIELDS['downloads']}", downloads)
+
+        keys_bytes, keys_seconds = self._measure(client, write_keys)
+        hash_bytes, hash_seconds = self._measure(client, write_hash, inspect_encoding=True)
+
+        self.stdout.write(f'  keys layout: {keys_bytes / 1024:,.0f} KiB '
+                          f'({keys_bytes / articles:.1f} B/article, written in {keys_seconds:.2f}s)')
+        self.stdout.write(f'  hash layout: {hash_bytes / 1024:,.0f} KiB '
+                          f'({hash_bytes / articles:.1f} B/article, written in {hash_seconds:.2f}s)')
+        if hash_bytes > 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'  hash layout uses {keys_bytes / hash_bytes:.1f}x less memory'
+            ))
+
+    def _measure(self, client, write, inspect_encoding: bool = False):
+        self._cleanup(client)
+        before = client.info('memory')['used_memory']
+        started = time.perf_counter()
+        pipe = client.pipeline(transaction=False)
+        write(pipe)
+        pipe.execute()
+        elapsed = time.perf_counter() - started
+        used = client.info('memory')['used_memory'] - before
+
+        if inspect_encoding:
+            sample = next(client.scan_iter(match=f"{PREFIX}:counters:*", count=100), None)
+            if sample:
+                encoding = client.object('encoding', sample)
+                self.stdout.write(f'  counter hash encoding: {encoding}')
+                if encoding not in ('listpack', 'ziplist'):
+                    self.stdout.write(self.style.WARNING(
+                        '  hashes are not compactly encoded; lower --bucket-size or raise '
+                        'hash-max-listpack-entries'
+                    ))
+
+        self._cleanup(client)
+        return used, elapsed
+
+    def _cleanup(self, client):
+        keys = list(client.scan_iter(match=f"{PREFIX}:*", count=1000))
+        for start in range(0, len(keys), 1000):
+            client.delete(*keys[start:start + 1000])
@@ -0,0 +1,61 @@
+"""
+Django management command to compute journal impact metrics.
+
+Computes 2- and 5-year impact factors and per-section citations per article
+from the OJS mirror and the citation graph, and stores them for the journal
+metrics endpoint. Run it from cron after update_citations; it needs NumPy.
+
+Usage:
+    python manage.py compute_impact_metrics
+    python manage.py compute_impact_metrics --journal innovative-minds
+"""
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.impact_metrics import impact_metrics, ImpactMetricsError
+from analytics.services.ojs_service import ojs_service
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Compute impact factors and section citation metrics of OJS journals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--journal',
+            help='Only compute this journal path',
+        )
+
+    def handle(self, *args, **options):
+        if not impact_metrics.available:
+            raise CommandError('NumPy is required: pip install numpy')
+        if not ojs_service.is_configured:
+            raise CommandError('OJS is not configured')
+
+        journals = ojs_service.known_journals
+        if options.get('journal'):
+            journals = [j for j in journals if j['path'] == options['journal']]
+            if not journals:
+                raise CommandError(f'Unknown journal {options["journal"]!r}')
+
+        failed = False
+        for journal in journals:
+            try:
+                metrics = impact_metrics.run(journal['path'])
+            except ImpactMetricsError as e:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{journal["path"]}: {e}'))
+                continue
+            latest = max(metrics['impact_factor'], default=None)
+            summary = (
+                f'impact factor {metrics["impact_factor"][latest]["impact_factor"]} ({latest})'
+                if latest else 'no impact factor yet'
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{journal["path"]}: {metrics["articles"]} articles, '
+                f'{metrics["citations"]} citations, {summary}'
+            ))
+
+        if failed:
+            raise CommandError('Some journals failed')
@@ -0,0 +1,66 @@
+"""
+Django management command to ingest OJS article metadata over OAI-PMH.
+
+OAI-PMH needs no API token and returns large pages, so it is the fastest
+way to fill the catalog mirror for a big journal. Harvests are incremental
+from the newest datestamp seen by the previous run.
+
+Usage:
+    python manage.py harvest_oai
+    python manage.py harvest_oai --journal innovative-minds
+    python manage.py harvest_oai --full  # ignore the previous datestamp
+"""
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.ojs_mirror import ojs_mirror
+from analytics.services.ojs_service import ojs_service
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Harvest article metadata from OJS over OAI-PMH into the catalog mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--journal',
+            help='Only harvest this journal path',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Harvest every record instead of those changed since the last run',
+        )
+        parser.add_argument(
+            '--until',
+            help='Only harvest records changed up to this datestamp (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        journals = ojs_service.known_journals
+        if options.get('journal'):
+            journals = [j for j in journals if j['path'] == options['journal']]
+            if not journals:
+                raise CommandError(f'Unknown journal {options["journal"]!r}')
+
+        failed = False
+        for journal in journals:
+            result = ojs_mirror.harvest_journal(
+                journal['path'], full=options['full'], until=options.get('until')
+            )
+            if result.get('error'):
+                failed = True
+                self.stdout.write(self.style.ERROR(
+                    f'{journal["path"]}: {result["error"]} '
+                    f'({result.get("records", 0)} records ingested before the failure)'
+                ))
+                continue
+            since = f' since {result["from"]}' if result.get('from') else ''
+            self.stdout.write(self.style.SUCCESS(
+                f'{journal["path"]}: {result["records"]} records harvested{since}, '
+                f'{result["deleted"]} deleted'
+            ))
+
+        if failed:
+            raise CommandError('Some journals failed to harvest')
@@ -0,0 +1,160 @@
+"""
+Django management command to move article counters between storage layouts.
+
+Counters are moved atomically (read-and-delete plus increment in one Lua
+script), so the command can be re-run safely while traffic keeps writing to
+the old layout: each run moves whatever accumulated since the last one.
+
+Usage:
+    python manage.py migrate_counter_layout --to hash
+    python manage.py migrate_counter_layout --to keys --dry-run
+
+Then set REDIS_COUNTER_LAYOUT to the new layout, restart the workers and run
+the command once more to move counts written during the switch.
+"""
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.redis_service import (
+    redis_service,
+    article_key,
+    article_id_from_key,
+    COUNTER_FIELDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# KEYS: (source key, bucket hash) pairs; ARGV: one hash field per pair
+KEYS_TO_HASH = """
+local moved = 0
+for i = 1, #ARGV do
+    local value = redis.call('GETDEL', KEYS[2 * i - 1])
+    if value then
+        redis.call('HINCRBY', KEYS[2 * i], ARGV[i], value)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+# KEYS: bucket hash followed by one target key per field; ARGV: hash fields
+HASH_TO_KEYS = """
+local moved = 0
+for i = 1, #ARGV do
+    local value = redis.call('HGET', KEYS[1], ARGV[i])
+    if value then
+        redis.call('INCRBY', KEYS[i + 1], value)
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+METRICS_BY_FIELD = {suffix: metric for metric, suffix in COUNTER_FIELDS.items()}
+
+
+class Command(BaseCommand):
+    help = 'Move article view/download counters between the keys and hash layouts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--to',
+            required=True,
+            choices=['hash', 'keys'],
+            help='Target layout',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Counters moved per script call (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the counters that would be moved',
+        )
+
+    def handle(self, *args, **options):
+        client = redis_service.client
+        if client is None:
+            raise CommandError('Redis is not reachable')
+
+        if options['to'] == 'hash':
+            moved = self._to_hash(client, options['batch_size'], options['dry_run'])
+        else:
+            moved = self._to_keys(client, options['dry_run'])
+
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} counters to the {options["to"]} layout'))
+        if redis_service.counter_layout != options['to']:
+            self.stdout.write(self.style.WARNING(
+                f'REDIS_COUNTER_LAYOUT is still "{redis_service.counter_layout}"; '
+                f'set it to "{options["to"]}" and run this command again after restarting.'
+            ))
+
+    def _to_hash(self, client, batch_size: int, dry_run: bool) -> int:
+        script = client.register_script(KEYS_TO_HASH)
+        if redis_service.cluster_mode:
+            script = self._cluster_keys_to_hash(client)
+        moved = 0
+        for metric in COUNTER_FIELDS:
+            keys, fields = [], []
+            for key in client.scan_iter(match=f"article:*:{metric}", count=1000):
+                article_id = article_id_from_key(key)
+                bucket, field = redis_service.article_counter_location(
+                    article_id, metric, layout="hash"
+                )
+                keys.extend([key, bucket])
+                fields.append(field)
+                if len(fields) >= batch_size:
+                    moved += len(fields) if dry_run else script(keys=keys, args=fields)
+                    keys, fields = [], []
+            if fields:
+                moved += len(fields) if dry_run else script(keys=keys, args=fields)
+        return moved
+
+    def _to_keys(self, client, dry_run: bool) -> int:
+        script = client.register_script(HASH_TO_KEYS)
+        if redis_service.cluster_mode:
+            script = self._cluster_hash_to_keys(client)
+        moved = 0
+        for bucket in client.scan_iter(match="counters:*", count=1000):
+            fields = list(client.hkeys(bucket))
+            targets = []
+            for field in fields:
+                article_id, _, suffix = field.rpartition(":")
+                targets.append(article_key(article_id, METRICS_BY_FIELD[suffix]))
+            if not fields:
+                continue
+            moved += len(fields) if dry_run else script(keys=[bucket, *targets], args=fields)
+        return moved
+
+    # In a cluster the source and target keys of a move live on different
+    # slots, which one Lua script cannot touch. Moves are then done one
+    # counter at a time: still safe to re-run, but a crash between the read
+    # and the write of a counter loses that counter's pending delta.
+
+    def _cluster_keys_to_hash(self, client):
+        def move(keys, args):
+            moved = 0
+            for i, field in enumerate(args):
+                value = client.getdel(keys[2 * i])
+                if value:
+                    client.hincrby(keys[2 * i + 1], field, int(value))
+                    moved += 1
+            return moved
+        return move
+
+    def _cluster_hash_to_keys(self, client):
+        def move(keys, args):
+            moved = 0
+            bucket, targets = keys[0], keys[1:]
+            for field, target in zip(args, targets):
+                value = client.hget(bucket, field)
+                if value and client.hdel(bucket, field):
+                    client.incrby(target, int(value))
+                    moved += 1
+            return moved
+        return move
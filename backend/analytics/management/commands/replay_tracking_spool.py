@@ -0,0 +1,34 @@
+"""
+Django management command to drain the local tracking spool into Redis.
+
+The web workers replay their own spools in the background once Redis
+recovers. This command also picks up spools left behind by workers that
+exited before they could replay them.
+
+Usage:
+    python manage.py replay_tracking_spool
+"""
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.redis_service import redis_service
+from analytics.services.spool_service import tracking_spool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Replay spooled tracking events into Redis'
+
+    def handle(self, *args, **options):
+        if not redis_service.is_connected():
+            raise CommandError('Redis is not reachable; nothing was replayed')
+
+        segments = len(tracking_spool.segments())
+        self.stdout.write(f'Replaying tracking spool ({segments} pending segments)...')
+
+        applied = tracking_spool.replay(redis_service.client)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {applied} spooled operations'
+        ))
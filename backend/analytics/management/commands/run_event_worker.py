@@ -0,0 +1,66 @@
+"""
+Django management command to run an event stream consumer-group worker.
+
+The worker reads tracking events from the Redis Stream in batches and
+derives time series, realtime broadcasts and, when
+EVENT_STREAM_DERIVE_COUNTERS is enabled, article counters and trending.
+Run one or more of these next to the web workers.
+
+Usage:
+    python manage.py run_event_worker
+    python manage.py run_event_worker --batch-size 1000 --consumer worker-1
+"""
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.redis_service import redis_service
+from analytics.services.event_stream import EventStreamWorker, DEFAULT_GROUP
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Consume tracking events from the Redis Stream and derive analytics state'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--group',
+            default=DEFAULT_GROUP,
+            help=f'Consumer group name (default: {DEFAULT_GROUP})',
+        )
+        parser.add_argument(
+            '--consumer',
+            help='Consumer name within the group (default: hostname-pid)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Maximum number of events read per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--no-broadcast',
+            action='store_true',
+            help='Do not forward events to WebSocket clients',
+        )
+
+    def handle(self, *args, **options):
+        if not redis_service.is_connected():
+            raise CommandError('Redis is not reachable')
+
+        worker = EventStreamWorker(
+            group=options['group'],
+            consumer=options.get('consumer'),
+            batch_size=options['batch_size'],
+            broadcast=not options['no_broadcast'],
+        )
+
+        self.stdout.write(
+            f'Starting event worker {worker.consumer} in group {worker.group} '
+            f'(derive counters: {worker.derive_counters})...'
+        )
+
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            self.stdout.write('Event worker stopped')
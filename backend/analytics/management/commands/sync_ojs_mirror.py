@@ -0,0 +1,59 @@
+"""
+Django management command to sync the local OJS catalog mirror.
+
+The proxy views refresh stale journals in the background on their own; run
+this from cron to keep the mirror warm, and with --full now and then so
+articles that were unpublished or deleted in OJS are dropped.
+
+Usage:
+    python manage.py sync_ojs_mirror
+    python manage.py sync_ojs_mirror --journal innovative-minds
+    python manage.py sync_ojs_mirror --full  # refetch everything and prune
+"""
+
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.ojs_mirror import ojs_mirror
+from analytics.services.ojs_service import ojs_service
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Sync journals, issues, sections, articles and authors from OJS into the local mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--journal',
+            help='Only sync this journal path',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the last-modified watermark and prune removed articles',
+        )
+
+    def handle(self, *args, **options):
+        if not ojs_service.is_configured:
+            raise CommandError('OJS is not configured')
+
+        journals = ojs_service.known_journals
+        if options.get('journal'):
+            journals = [j for j in journals if j['path'] == options['journal']]
+            if not journals:
+                raise CommandError(f'Unknown journal {options["journal"]!r}')
+
+        failed = False
+        for journal in journals:
+            result = ojs_mirror.sync_journal(journal['path'], journal['id'], full=options['full'])
+            if result.get('error'):
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{journal["path"]}: {result["error"]}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'{journal["path"]}: {result["articles"]} articles, '
+                f'{result["issues"]} issues synced, {result["removed"]} removed'
+            ))
+
+        if failed:
+            raise CommandError('Some journals failed to sync')
@@ -5,11 +5,16 @@ This should be run daily via cron or celery beat.
 Usage:
     python manage.py update_citations
     python manage.py update_citations --force  # Force refresh all citations
+    python manage.py update_citations --resume  # Continue an interrupted run
+    python manage.py update_citations --journal innovative-minds --concurrency 8
+    python manage.py update_citations --scheduled  # Only the most overdue articles, within the daily budget
 """
 
 import logging
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from analytics.services.citation_service import citation_tracker
+from analytics.services.citation_scheduler import citation_scheduler
+from analytics.services.ojs_service import ojs_service
 
 logger = logging.getLogger(__name__)
 
@@ -23,22 +28,65 @@ class Command(BaseCommand):
             action='store_true',
             help='Force refresh all citations instead of using cache',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Number of articles refreshed in parallel (default: CITATION_CONCURRENCY)',
+        )
+        parser.add_argument(
+            '--journal',
+            help='Only update articles of this journal path',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip articles already refreshed by the last, interrupted run',
+        )
+        parser.add_argument(
+            '--scheduled',
+            action='store_true',
+            help='Refresh only due articles by priority, within the daily budget',
+        )
+        parser.add_argument(
+            '--budget',
+            type=int,
+            help='Serper lookups allowed today with --scheduled (default: CITATION_DAILY_BUDGET)',
+        )
 
     def handle(self, *args, **options):
-        force = options.get('force', False)
-        
+        journal = options.get('journal')
+        if journal and journal not in {j['path'] for j in ojs_service.known_journals}:
+            raise CommandError(f'Unknown journal {journal!r}')
+
         self.stdout.write('Starting citation update...')
         
         try:
-            # Note: The tracker already forces refresh when called
-            result = citation_tracker.update_all_citations()
+            if options.get('scheduled'):
+                result = citation_scheduler.run(
+                    budget=options.get('budget'),
+                    concurrency=options.get('concurrency'),
+                    journal_path=journal,
+                )
+                self.stdout.write(
+                    f'{result["due"]} articles due, budget for {result["budget"]} lookups'
+                )
+            else:
+                result = citation_tracker.update_all_citations(
+                    force=options.get('force', False),
+                    concurrency=options.get('concurrency'),
+                    journal_path=journal,
+                    resume=options.get('resume', False),
+                )
             
             self.stdout.write(self.style.SUCCESS(
                 f'\nCitation update complete!'
             ))
             self.stdout.write(f'  Updated: {len(result.get("updated", []))} articles')
             self.stdout.write(f'  Failed: {len(result.get("failed", []))} articles')
+            if result.get("skipped"):
+                self.stdout.write(f'  Skipped (already done): {result["skipped"]} articles')
             self.stdout.write(f'  Total processed: {result.get("total", 0)}')
+            self.stdout.write(f'  Serper lookups: {result.get("lookups", 0)}')
             self.stdout.write(f'  Timestamp: {result.get("timestamp")}')
             
             if result.get("failed"):
@@ -0,0 +1,18 @@
+"""
+Parsing of Redis node lists.
+
+Kept free of Django and service imports so ``settings.py`` can use it as
+well as ``analytics.services.redis_connection``.
+"""
+
+from typing import List, Tuple
+
+
+def parse_nodes(value: str, default_port: int = 6379) -> List[Tuple[str, int]]:
+    """Parse ``host:port,host:port`` into a list of (host, port)."""
+    nodes = []
+    for item in (value or "").split(","):
+        host, _, port = item.strip().partition(":")
+        if host:
+            nodes.append((host, int(port or default_port)))
+    return nodes
@@ -55,6 +55,8 @@ class TrendingArticleSerializer(serializers.Serializer):
     """Serializer for trending articles."""
     article_id = serializers.CharField()
     score = serializers.IntegerField()
+    # Present when the response was hydrated; null for unknown articles
+    article = serializers.JSONField(required=False, allow_null=True)
 
 
 class GeoDataSerializer(serializers.Serializer):
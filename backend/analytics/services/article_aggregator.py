@@ -0,0 +1,241 @@
+"""
+Article-centric analytics joined across every source.
+
+A page showing analytics for N articles would otherwise make N Matomo
+calls, 2N counter reads, N citation reads and N OJS lookups. The
+aggregator batches each source instead:
+
+- one Redis pipeline reads the cached joined records, the realtime
+  counters and the citation hashes of every article;
+- one ``API.getBulkRequest`` fetches page metrics for the articles whose
+  cached Matomo data is stale;
+- article metadata comes from the shared metadata cache, which reads in
+  one pipeline and fills misses concurrently.
+
+Matomo and OJS data are cached in the joined record with the time each was
+fetched, so a source is only refetched once it is older than its max age.
+Counters and citations are always read live. Every record carries a
+``sources`` entry saying when each part was fetched and whether it is stale.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .article_metadata import article_metadata
+from .matomo_service import matomo_service
+from .redis_service import redis_service, article_key
+
+logger = logging.getLogger(__name__)
+
+# Sources cached in the joined record and refetched once stale
+CACHED_SOURCES = ("matomo", "article")
+
+
+def _age(fetched_at: Optional[str], now: datetime) -> Optional[float]:
+    if not fetched_at:
+        return None
+    try:
+        return (now - datetime.fromisoformat(fetched_at)).total_seconds()
+    except ValueError:
+        return None
+
+
+class ArticleAnalyticsAggregator:
+    """Join Matomo, realtime counters, citations and OJS metadata per article."""
+
+    @property
+    def max_age(self) -> Dict[str, int]:
+        return {
+            "matomo": getattr(settings, "ARTICLE_ANALYTICS_MATOMO_MAX_AGE", 300),
+            "article": getattr(settings, "ARTICLE_METADATA_TTL", 3600),
+        }
+
+    def record_key(self, article_id: str, period: str, date: str) -> str:
+        return article_key(article_id, "analytics", period, date)
+
+    def get_records(
+        self, article_ids: Iterable[str], period: str = "month", date: str = "today"
+    ) -> List[Dict[str, Any]]:
+        """Joined analytics records for the articles, in the order given."""
+        article_ids = list(dict.fromkeys(str(article_id) for article_id in article_ids))
+        if not article_ids:
+            return []
+
+        now = datetime.utcnow()
+        cached, live = self._read_redis(article_ids, period, date)
+
+        max_age = self.max_age
+        stale = {source: [] for source in CACHED_SOURCES}
+        for article_id in article_ids:
+            for source in CACHED_SOURCES:
+                age = _age(cached[article_id]["sources"].get(source, {}).get("fetched_at"), now)
+                if age is None or age > max_age[source]:
+                    stale[source].append(article_id)
+
+        fetched = self._fetch(stale, period, date)
+        refresh = {source: set(ids) for source, ids in stale.items()}
+        fetched_at = now.isoformat()
+
+        records, changed = [], {}
+        for article_id in article_ids:
+            record = cached[article_id]
+            for source in CACHED_SOURCES:
+                if article_id not in refresh[source]:
+                    record["sources"][source]["cached"] = True
+                    continue
+                if article_id in fetched[source]:
+                    record[source] = fetched[source][article_id]
+                    record["sources"][source] = {"fetched_at": fetched_at, "cached": False}
+                    changed[article_id] = record
+                else:
+                    # Keep whatever was cached and report it as stale
+                    record.setdefault(source, None)
+                    record["sources"][source] = {
+                        **record["sources"].get(source, {"fetched_at": None}),
+                        "cached": True,
+                        "stale": True,
+                    }
+
+            records.append({
+                "article_id": article_id,
+                "period": period,
+                "date": date,
+                "article": record.get("article"),
+                "matomo": record.get("matomo"),
+                **live[article_id],
+                "sources": {
+                    **record["sources"],
+                    "realtime": {"fetched_at": fetched_at, "cached": False},
+                    "citations": {
+                        "fetched_at": (live[article_id]["citations"] or {}).get("last_updated"),
+                        "cached": False,
+                    },
+                },
+            })
+
+        self._write_cache(changed, period, date)
+        return records
+
+    def _read_redis(self, article_ids: List[str], period: str, date: str):
+        """Cached records, counters and citations of every article in one pipeline."""
+        cached = {article_id: {"sources": {}} for article_id in article_ids}
+        live = {
+            article_id: {"realtime": {"views": 0, "downloads": 0}, "citations": None}
+            for article_id in article_ids
+        }
+        client = redis_service.client
+        if client is None:
+            return cached, live
+
+        locations = {
+            metric: [redis_service.article_counter_location(article_id, metric) for article_id in article_ids]
+            for metric in ("views", "downloads")
+        }
+        try:
+            pipe = client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.get(self.record_key(article_id, period, date))
+            for metric in ("views", "downloads"):
+                for key, field in locations[metric]:
+                    if field is None:
+                        pipe.get(key)
+                    else:
+                        pipe.hget(key, field)
+            for article_id in article_ids:
+                pipe.hmget(
+                    article_key(article_id, "citations"),
+                    ["citation_count", "total_results", "last_updated"],
+                )
+            replies = iter(pipe.execute())
+        except Exception as e:
+            logger.error(f"Failed to read article analytics from Redis: {e}")
+            return cached, live
+
+        for article_id in article_ids:
+            raw = next(replies)
+            if raw:
+                record = json.loads(raw)
+                record.setdefault("sources", {})
+                cached[article_id] = record
+        for metric in ("views", "downloads"):
+            for article_id in article_ids:
+                live[article_id]["realtime"][metric] = int(next(replies) or 0)
+        for article_id in article_ids:
+            count, total, last_updated = next(replies)
+            if last_updated is not None:
+                live[article_id]["citations"] = {
+                    "citation_count": int(count or 0),
+                    "total_results": int(total or 0),
+                    "last_updated": last_updated,
+                }
+        return cached, live
+
+    def _fetch(self, stale: Dict[str, List[str]], period: str, date: str) -> Dict[str, Dict[str, Any]]:
+        """Fetch the stale Matomo and OJS data concurrently, one batch per source."""
+        fetchers = {
+            "matomo": lambda ids: self._fetch_matomo(ids, period, date),
+            "article": self._fetch_articles,
+        }
+        fetched = {source: {} for source in CACHED_SOURCES}
+        pending = {source: ids for source, ids in stale.items() if ids}
+        if not pending:
+            return fetched
+
+        with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="article-join") as executor:
+            futures = {source: executor.submit(fetchers[source], ids) for source, ids in pending.items()}
+            for source, future in futures.items():
+                try:
+                    fetched[source] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to fetch {source} data for articles: {e}")
+        return fetched
+
+    def _fetch_matomo(self, article_ids: List[str], period: str, date: str) -> Dict[str, Any]:
+        results = matomo_service.get_article_metrics_bulk(
+            [f"/article/{article_id}" for article_id in article_ids], period, date
+        )
+        if results is None:
+            return {}
+        # A failed call inside the bulk request comes back as {"result": "error"}
+        return {
+            article_id: result
+            for article_id, result in zip(article_ids, results)
+            if not (isinstance(result, dict) and result.get("result") == "error")
+        }
+
+    def _fetch_articles(self, article_ids: List[str]) -> Dict[str, Any]:
+        return article_metadata.get_many(article_ids)
+
+    def _write_cache(self, records: Dict[str, Dict[str, Any]], period: str, date: str) -> None:
+        client = redis_service.client
+        if not records or client is None:
+            return
+        ttl = max(self.max_age.values())
+        try:
+            pipe = client.pipeline(transaction=False)
+            for article_id, record in records.items():
+                pipe.set(
+                    self.record_key(article_id, period, date),
+                    json.dumps({
+                        "matomo": record.get("matomo"),
+                        "article": record.get("article"),
+                        "sources": {
+                            source: {"fetched_at": record["sources"][source].get("fetched_at")}
+                            for source in CACHED_SOURCES
+                            if source in record["sources"]
+                        },
+                    }),
+                    ex=ttl,
+                )
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to cache article analytics: {e}")
+
+
+# Singleton instance
+article_aggregator = ArticleAnalyticsAggregator()
@@ -0,0 +1,141 @@
+"""
+Compact article metadata for hydrating leaderboards.
+
+Trending and top-N responses carry only article ids. Hydrating them on the
+server means a widget renders from one request instead of fetching each
+article from the OJS proxy. Metadata is cached per article with a bounded
+TTL; a batch is read with one pipeline and misses are filled concurrently,
+from the local catalog mirror when possible and from OJS otherwise.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .ojs_mirror import ojs_mirror, article_authors, localized
+from .ojs_service import ojs_service
+from .redis_service import redis_service, article_key
+
+logger = logging.getLogger(__name__)
+
+# Cached for unknown articles so they are not looked up on every request
+MISSING = {}
+
+# Returned by lookups that could not be attempted; not cached
+UNKNOWN = object()
+
+
+def article_summary(article: Dict[str, Any], journal_path: str) -> Dict[str, Any]:
+    """The few fields a leaderboard row shows."""
+    return {
+        "id": article.get("id"),
+        "title": localized(article.get("title")),
+        "authors": [
+            localized(author.get("fullName"))
+            or " ".join(filter(None, [
+                localized(author.get("givenName")), localized(author.get("familyName")),
+            ]))
+            for author in article_authors(article)
+        ],
+        "journal_path": journal_path,
+        "date_published": article.get("datePublished"),
+        "url": article.get("urlPublished"),
+    }
+
+
+class ArticleMetadataCache:
+    """Per-article metadata cache with pipelined reads and concurrent fills."""
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, "ARTICLE_METADATA_TTL", 3600)
+
+    @property
+    def missing_ttl(self) -> int:
+        return getattr(settings, "ARTICLE_METADATA_MISSING_TTL", 300)
+
+    def get_many(self, article_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Metadata for each article id; None where the article is unknown."""
+        article_ids = [str(article_id) for article_id in article_ids]
+        if not article_ids:
+            return {}
+
+        found = {}
+        client = redis_service.client
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for article_id in article_ids:
+                    pipe.get(article_key(article_id, "meta"))
+                for article_id, raw in zip(article_ids, pipe.execute()):
+                    if raw is not None:
+                        found[article_id] = json.loads(raw) or None
+            except Exception as e:
+                logger.error(f"Failed to read article metadata: {e}")
+
+        misses = [article_id for article_id in article_ids if article_id not in found]
+        if misses:
+            found.update(self._fill(misses))
+        return {article_id: found.get(article_id) for article_id in article_ids}
+
+    def hydrate(self, rows: List[Dict[str, Any]], id_field: str = "article_id") -> List[Dict[str, Any]]:
+        """Attach an ``article`` entry with metadata to each row."""
+        metadata = self.get_many(row[id_field] for row in rows)
+        return [{**row, "article": metadata.get(str(row[id_field]))} for row in rows]
+
+    def _fill(self, article_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Look up missed articles concurrently and cache the results."""
+        workers = min(len(article_ids), getattr(settings, "OJS_MAX_CONCURRENCY", 4))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="article-meta") as executor:
+            results = dict(zip(article_ids, executor.map(self._lookup, article_ids)))
+
+        client = redis_service.client
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for article_id, summary in results.items():
+                    if summary is UNKNOWN:
+                        continue
+                    pipe.set(
+                        article_key(article_id, "meta"),
+                        json.dumps(summary or MISSING),
+                        ex=self.ttl if summary else self.missing_ttl,
+                    )
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to cache article metadata: {e}")
+        return {
+            article_id: None if summary is UNKNOWN else summary
+            for article_id, summary in results.items()
+        }
+
+    def _lookup(self, article_id: str) -> Any:
+        """The article's summary, None if it does not exist, or ``UNKNOWN``."""
+        if not article_id.isdigit():
+            return None
+        try:
+            journal_path = ojs_mirror.journal_for_article(article_id)
+            if journal_path:
+                article = ojs_mirror.get_article(int(article_id), journal_path)
+                if article is None:
+                    article = ojs_service.get_article(journal_path, int(article_id))
+                return article_summary(article, journal_path) if article else None
+
+            # Not mirrored (yet), e.g. published since the last sync
+            if not ojs_service.is_configured:
+                return UNKNOWN
+            for journal in ojs_service.known_journals:
+                article = ojs_service.get_article(journal["path"], int(article_id))
+                if article:
+                    return article_summary(article, journal["path"])
+        except Exception as e:
+            logger.error(f"Failed to look up article {article_id}: {e}")
+            return UNKNOWN
+        return None
+
+
+# Singleton instance
+article_metadata = ArticleMetadataCache()
@@ -0,0 +1,225 @@
+"""
+Author-level metrics across journals.
+
+Authors are identified like in the catalog mirror: by ORCID when they have
+one, otherwise by normalized name, so an author's articles are grouped
+across every journal. Per author the index keeps:
+
+- ``authors:<key>``: name, ORCID, affiliation, total citations, h-index and
+  i10-index;
+- ``authors:<key>:articles``: a sorted set of the author's article ids
+  scored by citation count.
+
+Citation totals and indices are maintained incrementally when an article's
+citation count changes: the total moves by the difference and the h-index
+is re-checked with ``ZCOUNT`` around its previous value, which only moves
+by one per changed article, so no catalog scan is needed. Views and
+downloads are summed from the live article counters when an author is read.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from .ojs_mirror import article_authors, author_key, localized
+from .redis_service import redis_service, article_key
+
+logger = logging.getLogger(__name__)
+
+# Leaderboards: author key -> metric
+RANKINGS = {
+    "h_index": "authors:by_h_index",
+    "citations": "authors:by_citations",
+}
+
+
+def author_hash_key(key: str) -> str:
+    return f"authors:{key}"
+
+
+def author_articles_key(key: str) -> str:
+    return f"authors:{key}:articles"
+
+
+def article_authors_key(article_id: str) -> str:
+    return article_key(article_id, "authors")
+
+
+class AuthorIndex:
+    """Authors with their articles, citation totals and h-index."""
+
+    def __init__(self):
+        # Serializes index updates within a process so concurrent citation
+        # refreshes of one author's articles do not interleave
+        self._lock = threading.Lock()
+
+    def index_articles(self, articles: Iterable[Dict[str, Any]]) -> None:
+        """Add or update the authorship of OJS articles."""
+        client = redis_service.client
+        if client is None:
+            return
+        try:
+            with self._lock:
+                for article in articles:
+                    if article.get("id") is not None:
+                        self._index_article(client, str(article["id"]), article)
+        except Exception as e:
+            logger.error(f"Failed to index authors: {e}")
+
+    def remove_articles(self, article_ids: Iterable[str]) -> None:
+        """Drop deleted articles from their authors."""
+        client = redis_service.client
+        if client is None:
+            return
+        try:
+            with self._lock:
+                for article_id in article_ids:
+                    article_id = str(article_id)
+                    for key in client.smembers(article_authors_key(article_id)):
+                        self._unlink(client, key, article_id)
+                    client.delete(article_authors_key(article_id))
+        except Exception as e:
+            logger.error(f"Failed to remove articles from the author index: {e}")
+
+    def update_citations(self, article_id: str, citation_count: int) -> None:
+        """Apply an article's new citation count to each of its authors."""
+        client = redis_service.client
+        if client is None:
+            return
+        article_id = str(article_id)
+        try:
+            with self._lock:
+                for key in client.smembers(article_authors_key(article_id)):
+                    previous = client.zscore(author_articles_key(key), article_id) or 0
+                    if previous == citation_count:
+                        continue
+                    client.zadd(author_articles_key(key), {article_id: citation_count})
+                    self._refresh(client, key, citation_count - previous)
+        except Exception as e:
+            logger.error(f"Failed to update author citations of {article_id}: {e}")
+
+    def _index_article(self, client, article_id: str, article: Dict[str, Any]) -> None:
+        authors = {}
+        for author in article_authors(article):
+            key = author_key(author)
+            if key not in ("name:", "orcid:"):
+                authors[key] = author
+
+        current = set(client.smembers(article_authors_key(article_id)))
+        for key in current - set(authors):
+            self._unlink(client, key, article_id)
+
+        count = int(client.hget(article_key(article_id, "citations"), "citation_count") or 0)
+        pipe = client.pipeline(transaction=False)
+        pipe.delete(article_authors_key(article_id))
+        if authors:
+            pipe.sadd(article_authors_key(article_id), *authors)
+        for key, author in authors.items():
+            pipe.hset(author_hash_key(key), mapping={
+                "name": localized(author.get("fullName")) or key.split(":", 1)[1],
+                "orcid": author.get("orcid") or "",
+                "affiliation": localized(author.get("affiliation")),
+            })
+        pipe.execute()
+
+        for key in set(authors) - current:
+            client.zadd(author_articles_key(key), {article_id: count})
+            self._refresh(client, key, count)
+
+    def _unlink(self, client, key: str, article_id: str) -> None:
+        previous = client.zscore(author_articles_key(key), article_id)
+        if previous is None:
+            return
+        client.zrem(author_articles_key(key), article_id)
+        self._refresh(client, key, -previous)
+
+    def _refresh(self, client, key: str, citation_delta: float) -> None:
+        """Adjust an author's totals after one article changed."""
+        articles = author_articles_key(key)
+        h_index = int(client.hget(author_hash_key(key), "h_index") or 0)
+        # h moves by at most one per changed article; loop in case the
+        # stored value was stale
+        while client.zcount(articles, h_index + 1, "+inf") >= h_index + 1:
+            h_index += 1
+        while h_index > 0 and client.zcount(articles, h_index, "+inf") < h_index:
+            h_index -= 1
+
+        pipe = client.pipeline(transaction=False)
+        if citation_delta:
+            pipe.hincrby(author_hash_key(key), "citations", int(citation_delta))
+        pipe.hset(author_hash_key(key), mapping={
+            "h_index": h_index,
+            "i10_index": client.zcount(articles, 10, "+inf"),
+        })
+        pipe.zadd(RANKINGS["h_index"], {key: h_index})
+        if citation_delta:
+            pipe.zincrby(RANKINGS["citations"], citation_delta, key)
+        pipe.execute()
+
+    def get_author(self, key: str) -> Optional[Dict[str, Any]]:
+        """An author's metrics with their articles, most cited first."""
+        client = redis_service.client
+        if client is None:
+            return None
+        try:
+            info = client.hgetall(author_hash_key(key))
+            if not info:
+                return None
+            articles = client.zrevrange(author_articles_key(key), 0, -1, withscores=True)
+        except Exception as e:
+            logger.error(f"Failed to get author {key}: {e}")
+            return None
+
+        article_ids = [article_id for article_id, _ in articles]
+        views = redis_service.get_article_counters(article_ids, "views")
+        downloads = redis_service.get_article_counters(article_ids, "downloads")
+        return {
+            "key": key,
+            "name": info.get("name", ""),
+            "orcid": info.get("orcid", ""),
+            "affiliation": info.get("affiliation", ""),
+            "citations": int(info.get("citations", 0)),
+            "h_index": int(info.get("h_index", 0)),
+            "i10_index": int(info.get("i10_index", 0)),
+            "views": sum(views.values()),
+            "downloads": sum(downloads.values()),
+            "articles": [
+                {
+                    "article_id": article_id,
+                    "citations": int(score),
+                    "views": views[article_id],
+                    "downloads": downloads[article_id],
+                }
+                for article_id, score in articles
+            ],
+        }
+
+    def top_authors(self, by: str = "h_index", limit: int = 20) -> List[Dict[str, Any]]:
+        """Authors ranked by h-index or total citations."""
+        client = redis_service.client
+        if client is None or by not in RANKINGS:
+            return []
+        try:
+            ranked = client.zrevrange(RANKINGS[by], 0, limit - 1)
+            pipe = client.pipeline(transaction=False)
+            for key in ranked:
+                pipe.hgetall(author_hash_key(key))
+            rows = pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to rank authors: {e}")
+            return []
+        return [
+            {
+                "key": key,
+                "name": info.get("name", ""),
+                "orcid": info.get("orcid", ""),
+                "citations": int(info.get("citations", 0)),
+                "h_index": int(info.get("h_index", 0)),
+                "i10_index": int(info.get("i10_index", 0)),
+            }
+            for key, info in zip(ranked, rows)
+        ]
+
+
+# Singleton instance
+author_index = AuthorIndex()
@@ -0,0 +1,119 @@
+"""
+Binary codec for cached values.
+
+Cached API responses and stored citation results used to be plain JSON
+text. Encoded values are now a 3-byte header followed by the payload:
+
+- ``\\x00``: marker; JSON text never starts with a NUL byte, so entries
+  written before the codec existed are still read as JSON;
+- the format version (currently 1);
+- flags: bit 0 set for msgpack (otherwise JSON), bit 1 for zlib.
+
+Values are serialized with msgpack when it is installed (CACHE_CODEC=json
+turns it off) and zlib-compressed when the serialized payload is at least
+CACHE_COMPRESS_THRESHOLD bytes. Encoded values are binary, so they are read
+back through ``RedisService.raw_client``. ``python manage.py
+benchmark_cache_codec`` compares sizes and speeds of the formats.
+"""
+
+import json
+import logging
+import zlib
+from typing import Any, Optional, Union
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+MARKER = 0
+VERSION = 1
+HEADER_SIZE = 3
+
+FLAG_MSGPACK = 0x01
+FLAG_ZLIB = 0x02
+
+
+class CodecError(ValueError):
+    """A cached value could not be decoded."""
+
+
+class CacheCodec:
+    """Encodes cached values to versioned, optionally compressed bytes."""
+
+    def __init__(self, serializer: str = None, compress_threshold: int = None, compress_level: int = None):
+        self._serializer = serializer
+        self._compress_threshold = compress_threshold
+        self._compress_level = compress_level
+
+    @property
+    def serializer(self) -> str:
+        """``msgpack`` when configured and installed, else ``json``."""
+        name = self._serializer or getattr(settings, "CACHE_CODEC", "msgpack")
+        return "msgpack" if name == "msgpack" and msgpack is not None else "json"
+
+    @property
+    def compress_threshold(self) -> int:
+        if self._compress_threshold is not None:
+            return self._compress_threshold
+        return getattr(settings, "CACHE_COMPRESS_THRESHOLD", 1024)
+
+    @property
+    def compress_level(self) -> int:
+        if self._compress_level is not None:
+            return self._compress_level
+        return getattr(settings, "CACHE_COMPRESS_LEVEL", 1)
+
+    def encode(self, value: Any) -> bytes:
+        flags = 0
+        payload = None
+        if self.serializer == "msgpack":
+            try:
+                payload = msgpack.packb(value, use_bin_type=True)
+                flags |= FLAG_MSGPACK
+            except (TypeError, ValueError, OverflowError):
+                # e.g. integers beyond 64 bits; JSON still handles them
+                payload = None
+        if payload is None:
+            payload = json.dumps(value, separators=(",", ":")).encode()
+
+        if self.compress_threshold >= 0 and len(payload) >= self.compress_threshold:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_ZLIB
+        return bytes((MARKER, VERSION, flags)) + payload
+
+    def decode(self, raw: Optional[Union[bytes, str]]) -> Any:
+        """Decode an encoded value, or a legacy JSON one; None stays None."""
+        if raw is None:
+            return None
+        if isinstance(raw, str):
+            raw = raw.encode()
+        if not raw or raw[0] != MARKER:
+            return json.loads(raw)
+        if len(raw) < HEADER_SIZE or raw[1] != VERSION:
+            raise CodecError(f"Unsupported cache codec version {raw[1] if len(raw) > 1 else None}")
+
+        flags = raw[2]
+        payload = raw[HEADER_SIZE:]
+        try:
+            if flags & FLAG_ZLIB:
+                payload = zlib.decompress(payload)
+            if flags & FLAG_MSGPACK:
+                if msgpack is None:
+                    raise CodecError("msgpack is required to decode this value")
+                return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+            return json.loads(payload)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f"Corrupt cached value: {e}") from e
+
+
+# Singleton instance
+cache_codec = CacheCodec()
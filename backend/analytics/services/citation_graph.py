@@ -0,0 +1,232 @@
+"""
+Citation graph between citing works and our articles.
+
+Citing works are stored once, keyed by the same id as the citation history
+(their link, or else their normalized title), however many of our articles
+they cite. Edges are kept as sets in both directions:
+
+- ``article:<id>:citations:works``: the works citing an article, maintained
+  by the citation history;
+- ``citing:<work id>:cites``: the articles a work cites.
+
+Venue counts in ``citing:venues`` are adjusted per edge, so cited-by,
+co-citation and venue queries are set reads rather than scans over stored
+JSON results.
+
+Edges expire together: every refresh pushes back an article's deadline in
+``citing:expiry`` by CITATION_HISTORY_DAYS, and articles past it, like
+articles removed from OJS, are unlinked in both directions with their venue
+counts taken back. Works no article cites any more are dropped.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from .redis_service import redis_service, article_key
+
+logger = logging.getLogger(__name__)
+
+# work id -> citing work details
+WORKS_KEY = "citing:works"
+# work id -> venue
+WORK_VENUES_KEY = "citing:work_venues"
+# venue -> citations of our articles from that venue
+VENUES_KEY = "citing:venues"
+# article id -> epoch seconds when its edges expire
+EXPIRY_KEY = "citing:expiry"
+
+
+def cites_key(work_id: str) -> str:
+    return f"citing:{work_id}:cites"
+
+
+def article_works_key(article_id: str) -> str:
+    return article_key(article_id, "citations", "works")
+
+
+class CitationGraph:
+    """Citing works and their edges to our articles."""
+
+    def link(
+        self,
+        pipe,
+        article_id: str,
+        added: Dict[str, Dict[str, Any]],
+        removed: Iterable[str],
+        removed_venues: Dict[str, Optional[str]] = None,
+    ) -> None:
+        """
+        Queue the edge changes of one article on a pipeline.
+
+        ``added`` maps new citing work ids to their details; ``removed``
+        are the ids of works that no longer cite the article, with their
+        venues in ``removed_venues``.
+        """
+        for work_id, work in added.items():
+            pipe.hset(WORKS_KEY, work_id, json.dumps({"id": work_id, **work}))
+            pipe.sadd(cites_key(work_id), article_id)
+            venue = (work.get("venue") or "").strip()
+            if venue:
+                pipe.hset(WORK_VENUES_KEY, work_id, venue)
+                pipe.zincrby(VENUES_KEY, 1, venue)
+        for work_id in removed:
+            pipe.srem(cites_key(work_id), article_id)
+            venue = (removed_venues or {}).get(work_id)
+            if venue:
+                pipe.zincrby(VENUES_KEY, -1, venue)
+
+    def touch(self, pipe, article_id: str, expires_at: float) -> None:
+        """Queue pushing back when an article's edges expire."""
+        pipe.zadd(EXPIRY_KEY, {article_id: expires_at})
+
+    def expire(self, now: float = None, batch: int = 500) -> int:
+        """Unlink articles whose edges were not refreshed in time; returns how many."""
+        client = redis_service.client
+        if client is None:
+            return 0
+        now = time.time() if now is None else now
+        try:
+            stale = client.zrangebyscore(EXPIRY_KEY, "-inf", now, start=0, num=batch)
+        except Exception as e:
+            logger.error(f"Failed to find expired citation edges: {e}")
+            return 0
+        if stale:
+            self.unlink_articles(stale)
+        return len(stale)
+
+    def unlink_articles(self, article_ids: Iterable[str]) -> None:
+        """Drop every edge of the articles, e.g. removed or expired ones."""
+        client = redis_service.client
+        article_ids = [str(article_id) for article_id in article_ids]
+        if client is None or not article_ids:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.smembers(article_works_key(article_id))
+            citing = dict(zip(article_ids, pipe.execute()))
+            work_ids = sorted(set().union(*citing.values()))
+            venues = self.venues_of(work_ids)
+
+            pipe = client.pipeline(transaction=False)
+            for article_id, works in citing.items():
+                for work_id in works:
+                    pipe.srem(cites_key(work_id), article_id)
+                    if venues.get(work_id):
+                        pipe.zincrby(VENUES_KEY, -1, venues[work_id])
+                pipe.delete(article_works_key(article_id))
+            pipe.zrem(EXPIRY_KEY, *article_ids)
+            for work_id in work_ids:
+                pipe.scard(cites_key(work_id))
+            replies = pipe.execute()
+
+            counts = replies[len(replies) - len(work_ids):]
+            orphans = [work_id for work_id, count in zip(work_ids, counts) if not count]
+            if orphans:
+                pipe = client.pipeline(transaction=False)
+                pipe.hdel(WORKS_KEY, *orphans)
+                pipe.hdel(WORK_VENUES_KEY, *orphans)
+                pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to unlink articles from the citation graph: {e}")
+
+    def venues_of(self, work_ids: List[str]) -> Dict[str, Optional[str]]:
+        if not work_ids or redis_service.client is None:
+            return {}
+        return dict(zip(work_ids, redis_service.client.hmget(WORK_VENUES_KEY, work_ids)))
+
+    def get_works(self, work_ids: List[str]) -> List[Dict[str, Any]]:
+        """Details of citing works, most cited first."""
+        client = redis_service.client
+        if client is None or not work_ids:
+            return []
+        works = [json.loads(raw) for raw in client.hmget(WORKS_KEY, list(work_ids)) if raw]
+        return sorted(works, key=lambda work: (-(work.get("cited_by") or 0), work.get("title", "")))
+
+    def cited_by(self, article_id: str) -> List[Dict[str, Any]]:
+        """The works citing an article."""
+        try:
+            if redis_service.client is not None:
+                return self.get_works(sorted(redis_service.client.smembers(article_works_key(article_id))))
+        except Exception as e:
+            logger.error(f"Failed to get works citing {article_id}: {e}")
+        return []
+
+    def get_work(self, work_id: str) -> Optional[Dict[str, Any]]:
+        """A citing work with the ids of our articles it cites."""
+        client = redis_service.client
+        if client is None:
+            return None
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hget(WORKS_KEY, work_id)
+            pipe.smembers(cites_key(work_id))
+            raw, cites = pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to get citing work {work_id}: {e}")
+            return None
+        if not raw:
+            return None
+        return {**json.loads(raw), "cites": sorted(cites)}
+
+    def co_cited(self, article_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Articles cited together with an article, by number of shared citing works."""
+        client = redis_service.client
+        if client is None:
+            return []
+        article_id = str(article_id)
+        try:
+            work_ids = sorted(client.smembers(article_works_key(article_id)))
+            if not work_ids:
+                return []
+            pipe = client.pipeline(transaction=False)
+            for work_id in work_ids:
+                pipe.smembers(cites_key(work_id))
+            shared = Counter()
+            for cited in pipe.execute():
+                shared.update(cited)
+        except Exception as e:
+            logger.error(f"Failed to get articles co-cited with {article_id}: {e}")
+            return []
+        shared.pop(article_id, None)
+        ranked = sorted(shared.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"article_id": other, "shared_citing_works": count} for other, count in ranked]
+
+    def top_venues(self, article_ids: List[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Venues citing our articles most, overall or for the given articles.
+
+        Each citation of an article counts once.
+        """
+        client = redis_service.client
+        if client is None:
+            return []
+        try:
+            if not article_ids:
+                return [
+                    {"venue": venue, "citations": int(count)}
+                    for venue, count in client.zrevrange(VENUES_KEY, 0, limit - 1, withscores=True)
+                    if count > 0
+                ]
+            pipe = client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.smembers(article_works_key(article_id))
+            citing = Counter()
+            for work_ids in pipe.execute():
+                citing.update(work_ids)
+            venues = Counter()
+            for work_id, venue in self.venues_of(sorted(citing)).items():
+                if venue:
+                    venues[venue] += citing[work_id]
+        except Exception as e:
+            logger.error(f"Failed to get citing venues: {e}")
+            return []
+        ranked = sorted(venues.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"venue": venue, "citations": count} for venue, count in ranked]
+
+
+# Singleton instance
+citation_graph = CitationGraph()
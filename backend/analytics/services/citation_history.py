@@ -0,0 +1,199 @@
+"""
+Citation history per article.
+
+Each refresh of an article's citations records:
+
+- the day's citation count in ``article:<id>:citations:daily``, a small hash
+  of ``YYYY-MM-DD -> count`` that Redis stores as a compact listpack;
+- the ids of the citing works in ``article:<id>:citations:works``;
+- what changed since the previous refresh in ``article:<id>:citations:diffs``,
+  a hash of ``YYYY-MM-DD -> {"added": [...], "removed": [...]}`` holding the
+  added works' details and the removed works' ids.
+
+Citing works themselves live once in the citation graph; the result blob
+in ``article:<id>:citations`` keeps the rest of the search result, encoded
+with the cache codec, and is only rewritten when the set of citing works
+changed. Everything is kept for CITATION_HISTORY_DAYS; the citing-work ids
+expire through the citation graph, which also needs them to unlink the
+article.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+
+from .author_index import author_index
+from .cache_codec import cache_codec
+from .citation_graph import citation_graph
+from .redis_service import redis_service, article_key
+from .title_index import normalize_title
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+
+def citing_work_id(citation: Dict[str, Any]) -> str:
+    """Stable id of a citing work, from its link or else its normalized title."""
+    identity = citation.get("link") or normalize_title(citation.get("title", ""))
+    return hashlib.sha1(identity.encode()).hexdigest()[:12]
+
+
+def _work_details(citation: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": citing_work_id(citation),
+        "title": citation.get("title", ""),
+        "link": citation.get("link", ""),
+        "year": citation.get("year", ""),
+        "venue": citation.get("venue", ""),
+    }
+
+
+class CitationHistory:
+    """Daily citation counts and citing-work diffs per article."""
+
+    @property
+    def days(self) -> int:
+        return getattr(settings, "CITATION_HISTORY_DAYS", 365)
+
+    def record(
+        self, article_ids: Iterable[str], citation_result: Dict[str, Any], now: datetime = None
+    ) -> None:
+        """Store a citation result for the articles and append to their history."""
+        client = redis_service.client
+        article_ids = sorted({str(article_id) for article_id in article_ids})
+        if client is None or not article_ids:
+            return
+
+        now = now or datetime.utcnow()
+        day = now.strftime("%Y-%m-%d")
+        cutoff = (now - timedelta(days=self.days)).strftime("%Y-%m-%d")
+        ttl = self.days * DAY
+        timestamp = now.replace(tzinfo=timezone.utc).timestamp()
+        works = {citing_work_id(c): c for c in citation_result.get("citations", [])}
+
+        # Articles whose edges expired become a fresh baseline below
+        citation_graph.expire(timestamp)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.smembers(article_key(article_id, "citations", "works"))
+                pipe.hkeys(article_key(article_id, "citations", "daily"))
+                pipe.hget(article_key(article_id, "citations", "diffs"), day)
+            replies = iter(pipe.execute())
+
+            pipe = client.pipeline(transaction=False)
+            for article_id in article_ids:
+                previous, days, today = (next(replies) for _ in range(3))
+                # An empty set of citing works is not stored, so go by the series
+                seen = bool(days)
+                added = sorted(set(works) - set(previous))
+                removed = sorted(set(previous) - set(works))
+                changed = not seen or added or removed
+
+                key = article_key(article_id, "citations")
+                mapping = {
+                    "citation_count": citation_result.get("citation_count", 0),
+                    "total_results": citation_result.get("total_results", 0),
+                    "last_updated": now.isoformat(),
+                }
+                if changed:
+                    mapping["data"] = cache_codec.encode({
+                        k: v for k, v in citation_result.items() if k != "citations"
+                    })
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, ttl)
+
+                series = article_key(article_id, "citations", "daily")
+                pipe.hset(series, day, citation_result.get("citation_count", 0))
+                expired = [d for d in days if d < cutoff]
+                if expired:
+                    pipe.hdel(series, *expired)
+                pipe.expire(series, ttl)
+
+                citation_graph.touch(pipe, article_id, timestamp + ttl)
+                if changed:
+                    self._write_diff(pipe, article_id, day, works, added, removed, today, seen, ttl)
+                    citation_graph.link(
+                        pipe,
+                        article_id,
+                        {work_id: works[work_id] for work_id in added},
+                        removed,
+                        citation_graph.venues_of(removed),
+                    )
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record citation history: {e}")
+            return
+
+        for article_id in article_ids:
+            author_index.update_citations(article_id, citation_result.get("citation_count", 0))
+
+    def _write_diff(self, pipe, article_id, day, works, added, removed, today, seen, ttl) -> None:
+        works_key = article_key(article_id, "citations", "works")
+        if added:
+            pipe.sadd(works_key, *added)
+        if removed:
+            pipe.srem(works_key, *removed)
+        if not seen:
+            # The first refresh only establishes the baseline
+            return
+
+        diff = json.loads(today) if today else {"added": [], "removed": []}
+        # Merge with an earlier refresh of the same day
+        added_today = {work["id"]: work for work in diff["added"]}
+        for work_id in removed:
+            if added_today.pop(work_id, None) is None:
+                diff["removed"].append(work_id)
+        for work_id in added:
+            if work_id in diff["removed"]:
+                diff["removed"].remove(work_id)
+            else:
+                added_today[work_id] = _work_details(works[work_id])
+        diff["added"] = list(added_today.values())
+
+        diffs_key = article_key(article_id, "citations", "diffs")
+        pipe.hset(diffs_key, day, json.dumps(diff))
+        pipe.expire(diffs_key, ttl)
+
+    def get_trajectories(
+        self, article_ids: List[str], days: int = 90, now: datetime = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Daily citation counts of the articles over the last ``days`` days."""
+        result = {str(article_id): [] for article_id in article_ids}
+        client = redis_service.client
+        if client is None or not result:
+            return result
+
+        since = ((now or datetime.utcnow()) - timedelta(days=days)).strftime("%Y-%m-%d")
+        try:
+            pipe = client.pipeline(transaction=False)
+            for article_id in result:
+                pipe.hgetall(article_key(article_id, "citations", "daily"))
+            for article_id, series in zip(result, pipe.execute()):
+                result[article_id] = [
+                    {"date": day, "citation_count": int(count)}
+                    for day, count in sorted(series.items())
+                    if day >= since
+                ]
+        except Exception as e:
+            logger.error(f"Failed to get citation trajectories: {e}")
+        return result
+
+    def get_diffs(self, article_id: str) -> List[Dict[str, Any]]:
+        """Added and removed citing works per day, oldest first."""
+        try:
+            if redis_service.client is not None:
+                diffs = redis_service.client.hgetall(article_key(article_id, "citations", "diffs"))
+                return [{"date": day, **json.loads(diffs[day])} for day in sorted(diffs)]
+        except Exception as e:
+            logger.error(f"Failed to get citation diffs: {e}")
+        return []
+
+
+# Singleton instance
+citation_history = CitationHistory()
@@ -0,0 +1,254 @@
+"""
+Prioritized citation refresh scheduling.
+
+Refreshing every article every day spends the Serper quota evenly on
+dormant papers and popular new ones alike. The scheduler instead gives each
+article its own refresh interval and ranks the due articles by how overdue
+they are, how often they are viewed and how recently they were published.
+A run refreshes at most what is left of the daily budget, highest priority
+first.
+
+An article's interval starts at CITATION_REFRESH_INTERVAL_DAYS and doubles,
+up to CITATION_MAX_REFRESH_INTERVAL_DAYS, every time a refresh finds its
+citation count unchanged; a changed count resets it.
+"""
+
+import json
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .citation_service import citation_tracker, CitationTracker
+from .redis_service import redis_service
+from .title_index import title_index
+
+logger = logging.getLogger(__name__)
+
+# Due articles scored by priority, as of the last run
+QUEUE_KEY = "citations:queue"
+# article id -> {"refreshed_at", "interval", "citation_count"}
+STATE_KEY = "citations:schedule"
+# Serper lookups spent per UTC day
+BUDGET_PREFIX = "citations:budget"
+
+DAY = 86400
+
+# How overdue a never-refreshed article counts as
+NEVER_REFRESHED_OVERDUE = 10.0
+
+
+def published_at(item: Dict[str, Any]) -> Optional[datetime]:
+    """Publication date of a submission, from the submission or its latest publication."""
+    value = item.get("datePublished")
+    if not value:
+        dates = [p.get("datePublished") for p in item.get("publications") or [] if p.get("datePublished")]
+        value = dates[-1] if dates else None
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d") if value else None
+    except ValueError:
+        return None
+
+
+class CitationScheduler:
+    """Refresh the citations of the articles that need it most, within a daily budget."""
+
+    def __init__(self, tracker: CitationTracker = None):
+        self.tracker = tracker or citation_tracker
+
+    @property
+    def daily_budget(self) -> int:
+        return getattr(settings, "CITATION_DAILY_BUDGET", 500)
+
+    @property
+    def base_interval(self) -> int:
+        return getattr(settings, "CITATION_REFRESH_INTERVAL_DAYS", 1) * DAY
+
+    @property
+    def max_interval(self) -> int:
+        return getattr(settings, "CITATION_MAX_REFRESH_INTERVAL_DAYS", 30) * DAY
+
+    def budget_key(self, now: float) -> str:
+        return f"{BUDGET_PREFIX}:{datetime.utcfromtimestamp(now).strftime('%Y%m%d')}"
+
+    def priority(
+        self, state: Dict[str, Any], views: int, published: Optional[datetime], now: float
+    ) -> float:
+        """Refresh priority of an article; 0 while it is not yet due."""
+        refreshed_at = state.get("refreshed_at")
+        if refreshed_at is None:
+            overdue = NEVER_REFRESHED_OVERDUE
+        else:
+            overdue = (now - refreshed_at) / state.get("interval", self.base_interval)
+            if overdue < 1:
+                return 0.0
+
+        popularity = 1 + math.log1p(views)
+        recency = 1.0
+        if published is not None:
+            age_years = max(0.0, (now - published.timestamp()) / (365 * DAY))
+            recency += 1 / (1 + age_years)
+        return round(overdue * popularity * recency, 6)
+
+    def next_state(self, state: Dict[str, Any], citation_count: int, now: float) -> Dict[str, Any]:
+        """Schedule state after a refresh that found ``citation_count`` citations."""
+        if state.get("citation_count") == citation_count:
+            interval = min(state.get("interval", self.base_interval) * 2, self.max_interval)
+        else:
+            interval = self.base_interval
+        return {"refreshed_at": now, "interval": interval, "citation_count": citation_count}
+
+    def plan(
+        self, journal_path: str = None, now: float = None
+    ) -> List[Tuple[Dict[str, Any], str]]:
+        """Due ``(submission, journal_path)`` pairs, highest priority first."""
+        now = now or time.time()
+        items = {
+            str(item["id"]): (item, path)
+            for item, path in self.tracker.iter_published(journal_path)
+            if item.get("id")
+        }
+        states = self._load_states()
+        views = redis_service.get_article_counters(list(items), "views")
+
+        # One lookup serves every article of a work: queue only its most urgent one
+        works = title_index.article_works()
+        scores, by_work = {}, {}
+        for article_id, (item, _) in items.items():
+            score = self.priority(states.get(article_id, {}), views[article_id], published_at(item), now)
+            if score <= 0:
+                continue
+            work_id = works.get(article_id, article_id)
+            if work_id in by_work:
+                if scores[by_work[work_id]] >= score:
+                    continue
+                del scores[by_work[work_id]]
+            by_work[work_id] = article_id
+            scores[article_id] = score
+
+        client = redis_service.client
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.delete(QUEUE_KEY)
+                if scores:
+                    pipe.zadd(QUEUE_KEY, scores)
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to store citation queue: {e}")
+
+        return [items[article_id] for article_id in sorted(scores, key=scores.get, reverse=True)]
+
+    def remaining_budget(self, now: float = None, budget: int = None) -> int:
+        """Lookups left today out of ``budget`` (default: the daily budget)."""
+        budget = self.daily_budget if budget is None else budget
+        client = redis_service.client
+        used = 0
+        try:
+            if client is not None:
+                used = int(client.get(self.budget_key(now or time.time())) or 0)
+        except Exception as e:
+            logger.error(f"Failed to read citation budget: {e}")
+        return max(0, budget - used)
+
+    def run(
+        self, budget: int = None, concurrency: int = None, journal_path: str = None
+    ) -> Dict[str, Any]:
+        """Refresh the highest-priority due articles within the remaining budget."""
+        now = time.time()
+        budget = self.daily_budget if budget is None else budget
+        remaining = self.remaining_budget(now, budget)
+        queue = self.plan(journal_path, now)
+        states = self._load_states()
+
+        results = {
+            "updated": [],
+            "failed": [],
+            "total": 0,
+            "lookups": 0,
+            "due": len(queue),
+            "budget": remaining,
+        }
+
+        def record(item, citation_result):
+            # Failed lookups keep their state and stay due for the next run
+            if citation_result is None:
+                return
+            article_id = str(item["id"])
+            state = self.next_state(
+                states.get(article_id, {}), citation_result.get("citation_count", 0), now
+            )
+            linked = title_index.articles(citation_result["work_id"]) if citation_result.get("work_id") else []
+            for linked_id in {article_id, *linked}:
+                states[linked_id] = state
+                self._save_state(linked_id, state)
+
+        # Charge the budget up front so parallel runs cannot overrun it
+        reserved = self._reserve(min(len(queue), remaining), budget, now)
+        try:
+            self.tracker.process(
+                queue[:reserved], results, force=True, concurrency=concurrency, on_result=record
+            )
+        finally:
+            # Articles served by a lookup made earlier in the run cost nothing
+            self._spend(results["lookups"] - reserved, now)
+
+        results["timestamp"] = datetime.utcnow().isoformat()
+        return results
+
+    def _load_states(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if redis_service.client is not None:
+                return {
+                    article_id: json.loads(raw)
+                    for article_id, raw in redis_service.client.hgetall(STATE_KEY).items()
+                }
+        except Exception as e:
+            logger.error(f"Failed to load citation schedule: {e}")
+        return {}
+
+    def _save_state(self, article_id: str, state: Dict[str, Any]) -> None:
+        try:
+            if redis_service.client is not None:
+                redis_service.client.hset(STATE_KEY, article_id, json.dumps(state))
+        except Exception as e:
+            logger.error(f"Failed to save citation schedule of {article_id}: {e}")
+
+    def _reserve(self, lookups: int, budget: int, now: float) -> int:
+        """Charge up to ``lookups`` against the budget; returns how many were granted."""
+        if not lookups or redis_service.client is None:
+            return lookups
+        client = redis_service.client
+        key = self.budget_key(now)
+        try:
+            used = client.incrby(key, lookups)
+        except Exception as e:
+            logger.error(f"Failed to reserve citation budget: {e}")
+            return 0
+        try:
+            client.expire(key, 2 * DAY)
+        except Exception as e:
+            logger.error(f"Failed to set citation budget expiry: {e}")
+        granted = max(0, min(lookups, budget - (used - lookups)))
+        self._spend(granted - lookups, now)
+        return granted
+
+    def _spend(self, lookups: int, now: float) -> None:
+        """Adjust the lookups charged today; negative amounts refund a reservation."""
+        if not lookups or redis_service.client is None:
+            return
+        key = self.budget_key(now)
+        try:
+            pipe = redis_service.client.pipeline(transaction=False)
+            pipe.incrby(key, lookups)
+            pipe.expire(key, 2 * DAY)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record citation budget: {e}")
+
+
+# Singleton instance
+citation_scheduler = CitationScheduler()
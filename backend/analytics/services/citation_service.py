@@ -4,15 +4,64 @@ Citation service for tracking article citations using Serper API.
 
 import logging
 import requests
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, Callable
 from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, timedelta
 import hashlib
-import json
 
 logger = logging.getLogger(__name__)
 
+# Article ids already refreshed by the current citation update run
+CHECKPOINT_KEY = "citations:update:done"
+CHECKPOINT_TTL = 86400 * 2
+
+
+def _text(value: Any) -> Any:
+    """A raw Redis reply as text."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill at ``rate`` per second up to ``capacity``; ``acquire``
+    blocks until a token is available. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token if one is available, else return the seconds to wait."""
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            delay = self._reserve()
+            if not delay:
+                return
+            self._sleep(delay)
+
 
 class CitationService:
     """Service for tracking article citations using Serper API."""
@@ -22,6 +71,11 @@ class CitationService:
         self.base_url = "https://google.serper.dev/search"
         self.citations_url = "https://google.serper.dev/citations"
         self.cache_ttl = 86400  # 24 hours
+        # Serper quota, shared by every thread using this service
+        self.rate_limiter = TokenBucket(
+            getattr(settings, "SERPER_RATE_LIMIT", 5),
+            getattr(settings, "SERPER_RATE_BURST", 5),
+        )
 
     @property
     def is_configured(self) -> bool:
@@ -71,6 +125,7 @@ class CitationService:
         # Use citation-specific search
         query = " ".join(query_parts)
 
+        self.rate_limiter.acquire()
         try:
             # Use citations endpoint for scholarly results
             if use_citations:
@@ -164,45 +219,118 @@ class CitationService:
         author: str = None,
         journal: str = None,
         force_refresh: bool = False,
+        article_id: str = None,
+        fresh_after: datetime = None,
+        on_search: Callable[[], None] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Get citations for an article with caching.
+
+        Results are cached per canonical work, so articles whose titles
+        only differ in markup, case or punctuation share one lookup.
         
         Args:
             article_title: Title of the article
             author: Author name (optional)
             journal: Journal name (optional)
             force_refresh: Force cache refresh
+            article_id: Article to link to the title's work (optional)
+            fresh_after: With force_refresh, still reuse a result searched
+                after this time, e.g. by the same update run (optional)
+            on_search: Called when Serper is queried, i.e. the result did
+                not come from the cache (optional)
         """
         from .redis_service import redis_service
+        from .title_index import title_index
 
-        cache_key = self._cache_key(article_title)
+        work_id = title_index.resolve(article_title, article_id, author=author)
+        cache_key = f"citation_cache:work:{work_id}" if work_id else self._cache_key(article_title)
 
         # Check cache if not forcing refresh
-        if not force_refresh:
-            cached = redis_service.redis.get(cache_key)
-            if cached:
-                try:
-                    return json.loads(cached)
-                except:
-                    pass
+        if not force_refresh or fresh_after is not None:
+            cached = redis_service.cache_get(cache_key)
+            if cached and (
+                not force_refresh or cached.get("search_time", "") >= fresh_after.isoformat()
+            ):
+                return cached
 
         # Fetch fresh data
+        if on_search is not None and self.is_configured:
+            on_search()
         result = self.search_citations(article_title, author, journal)
 
         if result:
+            result["work_id"] = work_id
             # Cache the result
-            try:
-                redis_service.redis.setex(
-                    cache_key,
-                    self.cache_ttl,
-                    json.dumps(result),
-                )
-            except Exception as e:
-                logger.warning(f"Failed to cache citation result: {e}")
+            redis_service.cache_set(cache_key, result, self.cache_ttl)
 
         return result
 
+    def get_stored_citations(
+        self, article_ids: List[str], full: bool = False
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Stored citations of many articles, read with one pipeline of HMGETs.
+
+        Only what the tracker has stored is returned; articles without
+        stored citations map to None and are never looked up on Serper.
+        With ``full`` the citing works are included.
+        """
+        from .cache_codec import cache_codec
+        from .citation_graph import citation_graph, article_works_key
+        from .redis_service import redis_service, article_key
+
+        article_ids = list(dict.fromkeys(str(article_id) for article_id in article_ids))
+        found = {article_id: None for article_id in article_ids}
+        client = redis_service.client
+        if client is None or not article_ids:
+            return found
+
+        fields = ["citation_count", "total_results", "last_updated"]
+        try:
+            # With ``full`` the binary result blob comes along for results
+            # stored before the citation graph, so replies are raw bytes
+            pipe = (redis_service.raw_client if full else client).pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.hmget(article_key(article_id, "citations"), fields + ["data"] if full else fields)
+                if full:
+                    pipe.smembers(article_works_key(article_id))
+            replies = iter(pipe.execute())
+            citing, legacy = {}, {}
+            for article_id in article_ids:
+                values = next(replies)
+                if full:
+                    citing[article_id] = {_text(work_id) for work_id in next(replies)}
+                    values, raw = [_text(value) for value in values[:3]], values[3]
+                if values[2] is None:
+                    continue
+                found[article_id] = {
+                    "citation_count": int(values[0] or 0),
+                    "total_results": int(values[1] or 0),
+                    "last_updated": values[2],
+                }
+                if full and raw:
+                    legacy[article_id] = cache_codec.decode(raw).get("citations")
+
+            if full:
+                # Citing works are shared between articles: fetch each once
+                works = {
+                    work["id"]: work
+                    for work in citation_graph.get_works(sorted(set().union(*citing.values())))
+                }
+                for article_id, entry in found.items():
+                    if entry is None:
+                        continue
+                    entry["citations"] = legacy.get(article_id)
+                    if entry["citations"] is None:
+                        entry["citations"] = sorted(
+                            (works[w] for w in citing[article_id] if w in works),
+                            key=lambda work: (-(work.get("cited_by") or 0), work.get("title", "")),
+                        )
+        except Exception as e:
+            logger.error(f"Failed to read stored citations: {e}")
+        return found
+
     def get_citations_for_articles(
         self,
         articles: List[Dict[str, Any]],
@@ -242,83 +370,197 @@ class CitationService:
 class CitationTracker:
     """Daily citation tracking and updates."""
 
-    def __init__(self):
-        self.citation_service = CitationService()
+    def __init__(self, citation_service: CitationService = None):
+        self.citation_service = citation_service or CitationService()
 
-    def update_all_citations(self) -> Dict[str, Any]:
+    def update_all_citations(
+        self,
+        force: bool = False,
+        concurrency: int = None,
+        journal_path: str = None,
+        resume: bool = False,
+    ) -> Dict[str, Any]:
         """
         Update citations for all tracked articles.
         This should be run daily via cron or Celery beat.
-        """
-        from .ojs_service import ojs_service
-        from .redis_service import redis_service
 
+        Articles are refreshed by ``concurrency`` worker threads, with Serper
+        calls paced by the service's rate limiter. Each refreshed article is
+        checkpointed in Redis; with ``resume`` those of the previous,
+        interrupted run are skipped. Without ``force`` Serper results cached
+        within the last day are reused.
+        """
+        done = self._load_checkpoint() if resume else self._clear_checkpoint()
         results = {
             "updated": [],
             "failed": [],
+            "skipped": 0,
             "total": 0,
+            "lookups": 0,
         }
+        errors = []
+
+        def pending_items():
+            for item, path in self.iter_published(journal_path, errors):
+                if str(item.get("id")) in done:
+                    results["skipped"] += 1
+                    continue
+                yield item, path
+
+        self.process(pending_items(), results, force=force, concurrency=concurrency)
+
+        # A finished run starts from scratch next time
+        if not errors:
+            self._clear_checkpoint()
+
+        results["timestamp"] = datetime.utcnow().isoformat()
+        return results
+
+    def iter_published(
+        self, journal_path: str = None, errors: List[str] = None
+    ) -> Iterator[Tuple[Dict[str, Any], str]]:
+        """
+        Yield ``(submission, journal_path)`` for every published article.
+
+        A journal whose listing fails is logged and appended to ``errors``.
+        """
+        from .ojs_service import ojs_service, OJSCollectionError
 
-        # Get all known journals
-        journals = getattr(settings, 'OJS_JOURNALS', [
-            {'path': 'innovate-minds', 'id': 1},
-            {'path': 'bright-tomorrow', 'id': 2},
-        ])
+        journals = ojs_service.known_journals
+        if journal_path:
+            journals = [j for j in journals if j["path"] == journal_path]
 
         for journal in journals:
-            # Get published submissions
-            submissions = ojs_service.get_published_submissions(
-                journal['path'], items_per_page=50
-            )
+            try:
+                for item in ojs_service.iter_submissions(journal['path'], status="published"):
+                    yield item, journal['path']
+            except OJSCollectionError as e:
+                logger.error(f"Citation update stopped early for {journal['path']}: {e}")
+                if errors is not None:
+                    errors.append(journal['path'])
+
+    def process(
+        self,
+        items: Iterable[Tuple[Dict[str, Any], str]],
+        results: Dict[str, Any],
+        force: bool = True,
+        concurrency: int = None,
+        on_result: Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None] = None,
+    ) -> None:
+        """
+        Refresh ``(submission, journal_path)`` pairs on a bounded thread pool.
+
+        Outcomes are tallied into ``results``; ``on_result`` is called with
+        each submission and its citation result (None if the lookup failed).
+        """
+        concurrency = max(1, concurrency or getattr(settings, "CITATION_CONCURRENCY", 4))
+        # Articles of a work already searched during this run reuse its result
+        started = datetime.utcnow()
 
-            if not submissions or not submissions.get("items"):
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="citations") as executor:
+            pending = {}
+            try:
+                for item, journal_path in items:
+                    future = executor.submit(self._update_item, item, journal_path, force, started)
+                    pending[future] = item
+                    # Keep a bounded number of articles in flight
+                    if len(pending) >= concurrency * 2:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        self._collect(finished, pending, results, on_result)
+            finally:
+                self._collect(wait(pending)[0], pending, results, on_result)
+
+    def _collect(self, futures, pending, results, on_result) -> None:
+        for future in futures:
+            item = pending.pop(future)
+            try:
+                outcome = future.result()
+            except Exception as e:
+                logger.error(f"Citation update failed: {e}")
                 continue
+            if not outcome:
+                continue
+            article_title, citation_result, searched = outcome
+            results["updated" if citation_result else "failed"].append(article_title)
+            results["total"] += 1
+            results["lookups"] += int(searched)
+            if on_result is not None:
+                on_result(item, citation_result or None)
+
+    def _load_checkpoint(self) -> set:
+        from .redis_service import redis_service
 
-            for item in submissions["items"]:
-                article_title = item.get("title", {}).get("en", "")
-                if not article_title:
-                    continue
+        try:
+            if redis_service.client is not None:
+                return set(redis_service.client.smembers(CHECKPOINT_KEY))
+        except Exception as e:
+            logger.error(f"Failed to load citation checkpoint: {e}")
+        return set()
 
-                # Extract authors
-                authors = item.get("authors", [])
-                author_name = authors[0].get("fullName", "") if authors else None
+    def _clear_checkpoint(self) -> set:
+        from .redis_service import redis_service
 
-                # Get citation result
-                citation_result = self.citation_service.get_article_citations(
-                    article_title=article_title,
-                    author=author_name,
-                    journal=journal.get('path'),
-                    force_refresh=True,  # Force update
-                )
+        redis_service.cache_delete(CHECKPOINT_KEY)
+        return set()
 
-                if citation_result:
-                    # Store in Redis for quick access
-                    article_id = item.get("id")
-                    if article_id:
-                        redis_service.redis.hset(
-                            f"article:{article_id}:citations",
-                            mapping={
-                                "citation_count": citation_result.get("citation_count", 0),
-                                "total_results": citation_result.get("total_results", 0),
-                                "last_updated": datetime.utcnow().isoformat(),
-                                "data": json.dumps(citation_result),
-                            },
-                        )
-                        redis_service.redis.expire(
-                            f"article:{article_id}:citations", 
-                            86400 * 2  # 2 days TTL
-                        )
+    def _update_item(
+        self,
+        item: Dict[str, Any],
+        journal_path: str,
+        force: bool = True,
+        fresh_after: datetime = None,
+    ) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Refresh and store the citations of one submission.
 
-                    results["updated"].append(article_title)
-                else:
-                    results["failed"].append(article_title)
+        The result is also stored for every other article of the same
+        work. Returns ``(title, citation_result, searched)``, where
+        ``searched`` tells whether Serper was queried, or None for untitled
+        submissions.
+        """
+        from .citation_history import citation_history
+        from .redis_service import redis_service
+        from .title_index import title_index
 
-                results["total"] += 1
+        article_title = item.get("title", {}).get("en", "")
+        if not article_title:
+            return None
 
-        results["timestamp"] = datetime.utcnow().isoformat()
-        return results
+        # Extract authors
+        authors = item.get("authors", [])
+        author_name = authors[0].get("fullName", "") if authors else None
+
+        # Get citation result
+        searched = []
+        citation_result = self.citation_service.get_article_citations(
+            article_title=article_title,
+            author=author_name,
+            journal=journal_path,
+            force_refresh=force,
+            article_id=item.get("id"),
+            fresh_after=fresh_after,
+            on_search=lambda: searched.append(True),
+        )
+
+        if not citation_result:
+            return article_title, None, bool(searched)
+
+        # Store the result and its history, checkpointing the articles
+        article_id = item.get("id")
+        client = redis_service.client
+        if article_id and client is not None:
+            article_ids = {str(article_id)}
+            if citation_result.get("work_id"):
+                article_ids.update(title_index.articles(citation_result["work_id"]))
+            citation_history.record(article_ids, citation_result)
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(CHECKPOINT_KEY, *article_ids)
+            pipe.expire(CHECKPOINT_KEY, CHECKPOINT_TTL)
+            pipe.execute()
+
+        return article_title, citation_result, bool(searched)
 
 
 # Singleton instances
 citation_service = CitationService()
-citation_tracker = CitationTracker()
+citation_tracker = CitationTracker(citation_service)
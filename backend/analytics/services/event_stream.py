@@ -0,0 +1,297 @@
+"""
+Durable tracking event log on a capped Redis Stream.
+
+Tracking views append every event to the stream in addition to publishing
+it. Consumer-group workers read the stream in batches and derive hourly and
+daily time series, realtime broadcasts and (optionally) the article
+counters and trending set. Because the stream is durable, a worker that was
+down picks up where its group left off, and derived state can be rebuilt
+for a time range by replaying it.
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+
+from .redis_service import redis_service, article_key, EVENT_STREAM_KEY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP = "analytics-derive"
+
+# Event type -> metric name used in derived keys
+EVENT_METRICS = {"view": "views", "download": "downloads"}
+
+
+def _stream_time(entry_id: str) -> datetime:
+    """Timestamp encoded in a stream entry id (``<ms>-<seq>``)."""
+    millis = int(entry_id.split("-", 1)[0])
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+
+
+def _event_time(entry_id: str, event: Dict[str, Any]) -> datetime:
+    """When an event happened; spooled events were appended late and carry their own time."""
+    if event.get("spooled"):
+        try:
+            return datetime.fromisoformat(event["timestamp"]).replace(tzinfo=timezone.utc)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return _stream_time(entry_id)
+
+
+def hour_bucket(when: datetime) -> str:
+    """Bucket name for hourly time series."""
+    return when.strftime("%Y-%m-%dT%H")
+
+
+def day_bucket(when: datetime) -> str:
+    """Bucket name for daily time series."""
+    return when.strftime("%Y-%m-%d")
+
+
+class EventAggregate:
+    """Counts derived from a batch of tracking events."""
+
+    def __init__(self):
+        self.article_counts = Counter()  # (metric, article_id) -> n
+        self.journal_views = Counter()  # journal_id -> n
+        self.hourly = Counter()  # (metric, hour) -> n
+        self.article_daily = Counter()  # (metric, article_id, day) -> n
+        self.events: List[Dict[str, Any]] = []
+
+    def add(self, entry_id: str, event: Dict[str, Any]) -> None:
+        metric = EVENT_METRICS.get(event.get("type"))
+        article_id = event.get("article_id")
+        if not metric or not article_id:
+            return
+
+        when = _event_time(entry_id, event)
+        self.article_counts[(metric, article_id)] += 1
+        self.hourly[(metric, hour_bucket(when))] += 1
+        self.article_daily[(metric, article_id, day_bucket(when))] += 1
+        if metric == "views" and event.get("journal_id"):
+            self.journal_views[event["journal_id"]] += 1
+        self.events.append(event)
+
+    def write(self, pipe, derive_counters: bool, overwrite: bool = False) -> None:
+        """
+        Queue the derived writes on a pipeline.
+
+        With ``overwrite`` the aggregate replaces existing values instead of
+        being added to them, which is what a range replay needs.
+        """
+        put = pipe.hset if overwrite else pipe.hincrby
+
+        for (metric, hour), n in self.hourly.items():
+            put(f"timeseries:{metric}", hour, n)
+        for (metric, article_id, day), n in self.article_daily.items():
+            put(f"timeseries:{metric}:{article_key(article_id)}", day, n)
+
+        if not derive_counters:
+            return
+
+        trending_keys = set()
+        for (metric, article_id), n in self.article_counts.items():
+            key, field = redis_service.article_counter_location(article_id, metric)
+            if field is not None:
+                (pipe.hset if overwrite else pipe.hincrby)(key, field, n)
+            elif overwrite:
+                pipe.set(key, n)
+            else:
+                pipe.incrby(key, n)
+            if metric == "views":
+                trending_key = redis_service.trending_key(article_id)
+                trending_keys.add(trending_key)
+                if overwrite:
+                    pipe.zadd(trending_key, {article_id: n})
+                else:
+                    pipe.zincrby(trending_key, n, article_id)
+        for journal_id, n in self.journal_views.items():
+            key = f"journal:{journal_id}:views"
+            if overwrite:
+                pipe.set(key, n)
+            else:
+                pipe.incrby(key, n)
+        for trending_key in trending_keys:
+            pipe.zremrangebyrank(trending_key, 0, -101)
+
+
+def decode_entry(fields: Dict[str, str]) -> Dict[str, Any]:
+    """Decode the fields of a stream entry into an event dict."""
+    try:
+        return json.loads(fields.get("event", "{}"))
+    except ValueError:
+        logger.warning(f"Skipping malformed stream entry: {fields}")
+        return {}
+
+
+class EventStreamWorker:
+    """Consumer-group worker that derives state from the event stream."""
+
+    def __init__(
+        self,
+        group: str = DEFAULT_GROUP,
+        consumer: str = None,
+        batch_size: int = 500,
+        block_ms: int = 5000,
+        derive_counters: bool = None,
+        broadcast: bool = True,
+    ):
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        if derive_counters is None:
+            derive_counters = getattr(settings, "EVENT_STREAM_DERIVE_COUNTERS", False)
+        self.derive_counters = derive_counters
+        self.broadcast = broadcast
+
+    def ensure_group(self) -> None:
+        """Create the consumer group (and stream) if it does not exist."""
+        try:
+            redis_service.client.xgroup_create(
+                EVENT_STREAM_KEY, self.group, id="0", mkstream=True
+            )
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def process(self, entries: List[Tuple[str, Dict[str, str]]]) -> int:
+        """Apply a batch of entries and acknowledge them."""
+        if not entries:
+            return 0
+
+        aggregate = EventAggregate()
+        for entry_id, fields in entries:
+            aggregate.add(entry_id, decode_entry(fields))
+
+        client = redis_service.client
+        pipe = client.pipeline(transaction=False)
+        aggregate.write(pipe, self.derive_counters)
+        pipe.xack(EVENT_STREAM_KEY, self.group, *[entry_id for entry_id, _ in entries])
+        pipe.execute()
+
+        if self.broadcast:
+            self._broadcast(aggregate.events)
+        return len(entries)
+
+    def _broadcast(self, events: List[Dict[str, Any]]) -> None:
+        """Forward events to connected WebSocket clients."""
+        try:
+            from asgiref.sync import async_to_sync
+            from channels.layers import get_channel_layer
+
+            channel_layer = get_channel_layer()
+            if channel_layer is None:
+                return
+            for event in events:
+                async_to_sync(channel_layer.group_send)(
+                    "analytics", {"type": f"{event['type']}_event", "data": event}
+                )
+        except Exception as e:
+            logger.error(f"Failed to broadcast events: {e}")
+
+    def run_once(self) -> int:
+        """Read and process one batch of new entries."""
+        response = redis_service.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {EVENT_STREAM_KEY: ">"},
+            count=self.batch_size,
+            block=self.block_ms,
+        )
+        processed = 0
+        for _stream, entries in response or []:
+            processed += self.process(entries)
+        return processed
+
+    def claim_stale(self, min_idle_ms: int = 60000) -> int:
+        """
+        Take over and process entries that were delivered to a consumer of
+        this group but never acknowledged, e.g. because it crashed mid-batch.
+        """
+        start_id = "0-0"
+        processed = 0
+        while True:
+            result = redis_service.client.xautoclaim(
+                EVENT_STREAM_KEY,
+                self.group,
+                self.consumer,
+                min_idle_ms,
+                start_id=start_id,
+                count=self.batch_size,
+            )
+            start_id, entries = result[0], result[1]
+            # Entries trimmed from the stream come back without fields
+            processed += self.process([e for e in entries if e[1]])
+            if start_id == "0-0":
+                return processed
+
+    def run(self, stop_event=None) -> None:
+        """Process batches until ``stop_event`` is set."""
+        self.ensure_group()
+        self.claim_stale()
+
+        while stop_event is None or not stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Event stream worker error: {e}")
+                time.sleep(1)
+
+
+def replay_range(
+    start: datetime,
+    end: datetime,
+    derive_counters: bool = False,
+    chunk_size: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Rebuild derived state from the events that happened between ``start`` and ``end``.
+
+    Time series buckets touched by the range are recomputed and overwritten,
+    so replaying the same range twice is safe. Events are selected by the
+    same clock they are bucketed by: spooled events are appended after the
+    fact, so the stream is read from ``start`` to its end and only events
+    dated within the range are counted. With ``derive_counters`` the article
+    counters and trending set are overwritten too, which is only correct
+    when the range covers the whole retained stream.
+    """
+    client = redis_service.client
+    if client is None:
+        return {"events": 0, "error": "Redis is not connected"}
+
+    aggregate = EventAggregate()
+    cursor = f"{int(start.timestamp() * 1000)}-0"
+    total = 0
+
+    while True:
+        entries = client.xrange(EVENT_STREAM_KEY, min=cursor, max="+", count=chunk_size)
+        if not entries:
+            break
+        for entry_id, fields in entries:
+            event = decode_entry(fields)
+            if start <= _event_time(entry_id, event) <= end:
+                aggregate.add(entry_id, event)
+                total += 1
+        if len(entries) < chunk_size:
+            break
+        cursor = f"({entries[-1][0]}"
+
+    pipe = client.pipeline(transaction=False)
+    aggregate.write(pipe, derive_counters, overwrite=True)
+    pipe.execute()
+
+    return {
+        "events": total,
+        "articles": len({article_id for _, article_id in aggregate.article_counts}),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    }
@@ -0,0 +1,218 @@
+"""
+Impact-factor-style journal metrics.
+
+For a journal this computes, from the mirrored articles and the citation
+graph:
+
+- the impact factor of each year Y: citations made in Y to articles
+  published in Y-1 and Y-2, divided by the number of those articles;
+- the 5-year impact factor, over articles from Y-1 to Y-5;
+- citations per article for each section.
+
+A citation is one citing work in the citation graph, dated by the citing
+work's year. The data is loaded into NumPy arrays once and every metric is
+computed in vectorized passes, so the batch job (``compute_impact_metrics``)
+scales with the catalog. Results are stored per journal and returned by the
+journal metrics endpoint. NumPy is only needed by the batch job.
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .citation_graph import WORKS_KEY, article_works_key
+from .citation_scheduler import published_at
+from .ojs_mirror import ojs_mirror, localized
+from .redis_service import redis_service
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Section index of articles without a known section
+UNASSIGNED = "unassigned"
+
+
+class ImpactMetricsError(Exception):
+    """Impact metrics could not be computed."""
+
+
+def impact_key(journal_path: str) -> str:
+    return f"journal:{journal_path}:impact"
+
+
+def section_of(article: Dict[str, Any]) -> Optional[str]:
+    """Section id of a submission, from the submission or its latest publication."""
+    section_id = article.get("sectionId")
+    if section_id is None:
+        publications = article.get("publications") or []
+        section_id = publications[-1].get("sectionId") if publications else None
+    return None if section_id is None else str(section_id)
+
+
+def _year(value: Any) -> int:
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return 0
+
+
+class JournalImpactMetrics:
+    """Batch computation and storage of journal impact metrics."""
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def load(self, journal_path: str) -> Dict[str, Any]:
+        """Load a journal's articles and citation edges into arrays."""
+        if np is None:
+            raise ImpactMetricsError("NumPy is required to compute impact metrics")
+        articles = ojs_mirror.get_articles(journal_path)
+        if articles is None:
+            raise ImpactMetricsError(f"Journal {journal_path!r} is not in the OJS mirror")
+        client = redis_service.client
+        if client is None:
+            raise ImpactMetricsError("Redis is not available")
+
+        section_names = {
+            str(section.get("id")): localized(section.get("title"))
+            for section in ojs_mirror.get_sections(journal_path) or []
+        }
+        section_ids = sorted(section_names) + [UNASSIGNED]
+        section_index = {section_id: i for i, section_id in enumerate(section_ids)}
+
+        article_ids = [str(article["id"]) for article in articles]
+        published = [published_at(article) for article in articles]
+        pub_year = np.array([date.year if date else 0 for date in published], dtype=np.int32)
+        section = np.array(
+            [section_index.get(section_of(article), section_index[UNASSIGNED]) for article in articles],
+            dtype=np.int32,
+        )
+
+        pipe = client.pipeline(transaction=False)
+        for article_id in article_ids:
+            pipe.smembers(article_works_key(article_id))
+        citing = [sorted(works) for works in pipe.execute()]
+
+        work_ids = sorted(set().union(*citing)) if citing else []
+        work_years = {}
+        if work_ids:
+            for work_id, raw in zip(work_ids, client.hmget(WORKS_KEY, work_ids)):
+                work_years[work_id] = _year(json.loads(raw).get("year")) if raw else 0
+
+        edges_per_article = np.fromiter((len(works) for works in citing), dtype=np.int64, count=len(citing))
+        return {
+            "article_ids": article_ids,
+            "pub_year": pub_year,
+            "section": section,
+            "section_ids": section_ids,
+            "section_names": section_names,
+            "edge_article": np.repeat(np.arange(len(article_ids)), edges_per_article),
+            "edge_year": np.fromiter(
+                (work_years[w] for works in citing for w in works),
+                dtype=np.int32,
+                count=int(edges_per_article.sum()),
+            ),
+        }
+
+    def compute(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Every metric of a journal from its loaded arrays."""
+        pub_year, edge_article, edge_year = data["pub_year"], data["edge_article"], data["edge_year"]
+        n = len(pub_year)
+        per_article = np.bincount(edge_article, minlength=n)
+
+        return {
+            "articles": n,
+            "citations": int(per_article.sum()),
+            **self._impact_factors(pub_year, edge_article, edge_year),
+            "sections": self._sections(data, per_article),
+        }
+
+    def _impact_factors(self, pub_year, edge_article, edge_year) -> Dict[str, Dict[str, Any]]:
+        edge_pub_year = pub_year[edge_article]
+        valid = (edge_year > 0) & (edge_pub_year > 0)
+        known = pub_year > 0
+        years = np.concatenate([pub_year[known], edge_year[valid]])
+        if not len(years):
+            return {"impact_factor": {}, "five_year_impact_factor": {}}
+
+        first = int(years.min())
+        size = int(years.max()) - first + 1
+        # cites[Y, P]: citations made in year Y to articles published in year P
+        cites = np.zeros((size, size), dtype=np.int64)
+        np.add.at(cites, (edge_year[valid] - first, edge_pub_year[valid] - first), 1)
+        published = np.bincount(pub_year[known] - first, minlength=size)
+
+        def window(span: int) -> Dict[str, Dict[str, Any]]:
+            citations = np.zeros(size, dtype=np.int64)
+            items = np.zeros(size, dtype=np.int64)
+            for k in range(1, min(span, size - 1) + 1):
+                # Diagonal -k holds cites[Y, Y-k] for Y = first+k onwards
+                citations[k:] += np.diagonal(cites, offset=-k)
+                items[k:] += published[:size - k]
+            ratio = np.divide(citations, items, out=np.zeros(size), where=items > 0)
+            return {
+                str(first + i): {
+                    "citations": int(citations[i]),
+                    "citable_items": int(items[i]),
+                    "impact_factor": round(float(ratio[i]), 3),
+                }
+                for i in np.flatnonzero(items)
+            }
+
+        return {"impact_factor": window(2), "five_year_impact_factor": window(5)}
+
+    def _sections(self, data: Dict[str, Any], per_article) -> List[Dict[str, Any]]:
+        section, section_ids = data["section"], data["section_ids"]
+        m = len(section_ids)
+        articles = np.bincount(section, minlength=m)
+        citations = np.bincount(section, weights=per_article, minlength=m)
+        cited = np.bincount(section, weights=per_article > 0, minlength=m)
+        most = np.zeros(m, dtype=np.int64)
+        np.maximum.at(most, section, per_article)
+        per = np.divide(citations, articles, out=np.zeros(m), where=articles > 0)
+
+        return [
+            {
+                "section_id": None if section_ids[i] == UNASSIGNED else section_ids[i],
+                "title": data["section_names"].get(section_ids[i], ""),
+                "articles": int(articles[i]),
+                "citations": int(citations[i]),
+                "citations_per_article": round(float(per[i]), 3),
+                "cited_articles": int(cited[i]),
+                "max_citations": int(most[i]),
+            }
+            for i in np.flatnonzero(articles)
+        ]
+
+    def run(self, journal_path: str) -> Dict[str, Any]:
+        """Compute and store a journal's metrics."""
+        metrics = {
+            "journal_path": journal_path,
+            "computed_at": datetime.utcnow().isoformat(),
+            **self.compute(self.load(journal_path)),
+        }
+        client = redis_service.client
+        if client is None:
+            raise ImpactMetricsError("Redis is not available")
+        client.set(impact_key(journal_path), json.dumps(metrics))
+        return metrics
+
+    def get(self, journal_path: str) -> Optional[Dict[str, Any]]:
+        """Stored metrics of a journal, if the batch job has run."""
+        try:
+            if redis_service.client is not None:
+                raw = redis_service.client.get(impact_key(journal_path))
+                return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Failed to get impact metrics of {journal_path}: {e}")
+        return None
+
+
+# Singleton instance
+impact_metrics = JournalImpactMetrics()
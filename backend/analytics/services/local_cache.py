@@ -0,0 +1,157 @@
+"""
+In-process (L1) tier in front of the Redis cache.
+
+``RedisService.cache_get`` first looks in a small per-process LRU of decoded
+values, so hot keys skip both the Redis round trip and decoding. Entries
+live for at most CACHE_LOCAL_TTL seconds, which bounds how stale a worker
+can be, and at most CACHE_LOCAL_MAX_ENTRIES are kept (0 disables the tier).
+
+Writes and deletes through ``RedisService`` are broadcast on the
+``cache:invalidate`` channel; every other worker drops the keys from its
+own tier as soon as the message arrives. Values handed out by this tier
+are shared between callers and must not be mutated.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Returned by LocalCache.get for keys that are not cached
+MISSING = object()
+
+
+class LocalCache:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, "CACHE_LOCAL_MAX_ENTRIES", 1024)
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, "CACHE_LOCAL_TTL", 5)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Any:
+        """The cached value, or ``MISSING``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys: Iterable[str], invalidation: bool = False) -> None:
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None and invalidation:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class InvalidationListener:
+    """
+    Background subscriber dropping keys invalidated by other workers.
+
+    Messages are ``{"origin": ..., "keys": [...]}``; a process ignores its
+    own. After a lost subscription the whole local tier is cleared, since
+    invalidations may have been missed, and the listener resubscribes.
+    """
+
+    def __init__(self, cache: LocalCache, pubsub_factory: Callable[[], Any], origin: str = None):
+        self.cache = cache
+        self.pubsub_factory = pubsub_factory
+        self.origin = origin or uuid.uuid4().hex
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="cache-invalidation", daemon=True
+                )
+                self._thread.start()
+
+    def message(self, keys: Iterable[str]) -> str:
+        """Invalidation message for keys changed by this process."""
+        return json.dumps({"origin": self.origin, "keys": list(keys)})
+
+    def handle(self, data: Any) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") != self.origin:
+            self.cache.delete(message.get("keys", []), invalidation=True)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                pubsub = self.pubsub_factory()
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle(message["data"])
+            except Exception as e:
+                logger.error(f"Cache invalidation subscription lost: {e}")
+            self.cache.clear()
+            time.sleep(1)
@@ -4,12 +4,40 @@ Matomo API service for fetching analytics data.
 
 import logging
 import requests
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import urlencode
 from django.conf import settings
 
+from .redis_service import redis_service
+
 logger = logging.getLogger(__name__)
 
 
+def slice_report(
+    rows: Optional[List[Dict[str, Any]]],
+    limit: int,
+    offset: int = 0,
+    sort: str = None,
+    order: str = "desc",
+) -> List[Dict[str, Any]]:
+    """
+    One page of report rows, optionally sorted by a numeric column first.
+
+    Without ``sort`` the rows keep Matomo's order. Rows lacking the column
+    sort as 0.
+    """
+    rows = rows or []
+    if sort:
+        def value(row):
+            try:
+                return float(row.get(sort) or 0)
+            except (TypeError, ValueError):
+                return 0.0
+        rows = sorted(rows, key=value, reverse=order != "asc")
+    offset = max(0, offset)
+    return rows[offset:offset + limit] if limit >= 0 else rows[offset:]
+
+
 class MatomoService:
     """Service for Matomo Analytics API integration."""
 
@@ -63,6 +91,28 @@ class MatomoService:
             logger.error(f"Invalid JSON response from Matomo: {e}")
             return None
 
+    def bulk_request(
+        self, calls: List[Tuple[str, Dict[str, Any]]]
+    ) -> Optional[List[Any]]:
+        """
+        Run several API calls in one HTTP request with API.getBulkRequest.
+
+        Takes ``(method, params)`` pairs and returns their results in the
+        same order, or None if the bulk request failed.
+        """
+        if not calls:
+            return []
+        params = {
+            f"urls[{i}]": urlencode({"method": method, "idSite": self.site_id, **call_params})
+            for i, (method, call_params) in enumerate(calls)
+        }
+        result = self._make_request("API.getBulkRequest", params)
+        if isinstance(result, list) and len(result) == len(calls):
+            return result
+        if result is not None:
+            logger.error(f"Unexpected Matomo bulk response: {str(result)[:200]}")
+        return None
+
     # ============== KPI Endpoints ==============
 
     def get_kpi_summary(
@@ -85,16 +135,43 @@ class MatomoService:
     # ============== Content Analytics ==============
 
     def get_top_articles(
-        self, period: str = "week", date: str = "today", limit: int = 20
+        self,
+        period: str = "week",
+        date: str = "today",
+        limit: int = 20,
+        offset: int = 0,
+        sort: str = None,
+        order: str = "desc",
     ) -> Optional[List[Dict[str, Any]]]:
-        """Get top articles by page views."""
-        result = self._make_request(
-            "Actions.getPageTitles",
-            {"period": period, "date": date, "flat": "1", "filter_limit": limit},
-        )
-        if isinstance(result, list):
-            return result
-        return []
+        """Get top articles by page views, sliced from the cached full report."""
+        rows = self.get_report_rows("Actions.getPageTitles", period, date, {"flat": "1"})
+        return slice_report(rows, limit, offset, sort, order)
+
+    def get_report_rows(
+        self, method: str, period: str, date: str, params: Dict[str, Any] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Rows of a report for a period and date, fetched once and cached.
+
+        Up to MATOMO_REPORT_MAX_ROWS rows are fetched (-1 for all) in
+        Matomo's order, so every limit, offset and sort of the report is
+        served from the same cached copy. Returns None if Matomo failed.
+        """
+        params = dict(params or {})
+        key = ":".join([
+            "matomo:report", str(self.site_id), method, period, date, urlencode(sorted(params.items())),
+        ])
+
+        def fetch():
+            result = self._make_request(method, {
+                "period": period,
+                "date": date,
+                **params,
+                "filter_limit": getattr(settings, "MATOMO_REPORT_MAX_ROWS", 1000),
+            })
+            return result if isinstance(result, list) else None
+
+        return redis_service.cache_fill(key, fetch, ttl=getattr(settings, "MATOMO_CACHE_TTL", 300))
 
     def get_article_metrics(
         self, article_url: str, period: str = "month", date: str = "today"
@@ -105,17 +182,27 @@ class MatomoService:
             {"period": period, "date": date, "pageUrl": article_url},
         )
 
+    def get_article_metrics_bulk(
+        self, article_urls: List[str], period: str = "month", date: str = "today"
+    ) -> Optional[List[Any]]:
+        """Get ``get_article_metrics`` results for many articles in one request."""
+        return self.bulk_request([
+            ("Actions.getPageUrl", {"period": period, "date": date, "pageUrl": url})
+            for url in article_urls
+        ])
+
     def get_downloads(
-        self, period: str = "month", date: str = "today", limit: int = 20
+        self,
+        period: str = "month",
+        date: str = "today",
+        limit: int = 20,
+        offset: int = 0,
+        sort: str = None,
+        order: str = "desc",
     ) -> Optional[List[Dict[str, Any]]]:
-        """Get download statistics."""
-        result = self._make_request(
-            "Actions.getDownloads",
-            {"period": period, "date": date, "expanded": "1", "filter_limit": limit},
-        )
-        if isinstance(result, list):
-            return result
-        return []
+        """Get download statistics, sliced from the cached full report."""
+        rows = self.get_report_rows("Actions.getDownloads", period, date, {"expanded": "1"})
+        return slice_report(rows, limit, offset, sort, order)
 
     # ============== Geographic Data ==============
 
@@ -131,16 +218,17 @@ class MatomoService:
         return []
 
     def get_cities(
-        self, period: str = "month", date: str = "today", limit: int = 20
+        self,
+        period: str = "month",
+        date: str = "today",
+        limit: int = 20,
+        offset: int = 0,
+        sort: str = None,
+        order: str = "desc",
     ) -> Optional[List[Dict[str, Any]]]:
-        """Get visitor cities."""
-        result = self._make_request(
-            "UserCountry.getCity",
-            {"period": period, "date": date, "filter_limit": limit},
-        )
-        if isinstance(result, list):
-            return result
-        return []
+        """Get visitor cities, sliced from the cached full report."""
+        rows = self.get_report_rows("UserCountry.getCity", period, date)
+        return slice_report(rows, limit, offset, sort, order)
 
     # ============== Acquisition ==============
 
@@ -239,10 +327,24 @@ class MatomoService:
         period: str = "month",
         date: str = "today",
     ) -> Dict[str, Any]:
-        """Get all dashboard data in a single request."""
+        """
+        Get all dashboard data in a single request.
+
+        The reports are cached for MATOMO_CACHE_TTL seconds and refreshed by
+        one caller at a time; the realtime count is always fetched live.
+        """
+        reports = redis_service.cache_fill(
+            f"matomo:dashboard:{self.site_id}:{period}:{date}",
+            lambda: self._fetch_dashboard_reports(period, date),
+            ttl=getattr(settings, "MATOMO_CACHE_TTL", 300),
+            # Do not keep a failed fetch around for the whole TTL
+            cacheable=lambda reports: reports["kpi"] is not None,
+        )
+        return {**reports, "realtime_count": self.get_realtime_count()}
+
+    def _fetch_dashboard_reports(self, period: str, date: str) -> Dict[str, Any]:
         return {
             "kpi": self.get_kpi_summary(period, date),
-            "realtime_count": self.get_realtime_count(),
             "top_articles": self.get_top_articles(period, date, 10),
             "downloads": self.get_downloads(period, date, 10),
             "countries": self.get_countries(period, date),
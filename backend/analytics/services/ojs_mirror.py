@@ -0,0 +1,539 @@
+"""
+Local mirror of the OJS catalog.
+
+Journals, issues, sections, published articles and their authors are copied
+into the analytics store so the OJS proxy views do not have to call OJS on
+every request. Articles are synced incrementally: each sync asks OJS for
+submissions ordered by ``lastModified`` and stops at the watermark of the
+previous sync. Journals, issues and sections are small and are refetched
+whole.
+
+Reads follow stale-while-revalidate: a mirror older than OJS_MIRROR_MAX_AGE
+is still served while a background thread refreshes it. Only a journal that
+was never synced falls through to a live OJS call.
+
+The mirror also keeps a global article id -> journal path index, so callers
+that only know an article id can find its journal.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from .oai_harvester import OAIHarvestError
+from .ojs_service import ojs_service, OJSCollectionError
+from .redis_service import redis_service, hash_tags_enabled, article_key
+
+logger = logging.getLogger(__name__)
+
+MIRROR_PREFIX = "ojs:mirror"
+
+# Global article id -> journal path index
+ARTICLE_JOURNAL_KEY = f"{MIRROR_PREFIX}:article_journal"
+JOURNALS_KEY = f"{MIRROR_PREFIX}:journals"
+
+
+def mirror_key(journal_path: str, *parts: str) -> str:
+    """Key for mirrored data of one journal, e.g. ``ojs:mirror:{jp}:articles``."""
+    tag = f"{{{journal_path}}}" if hash_tags_enabled() else journal_path
+    return ":".join([MIRROR_PREFIX, tag, *parts])
+
+
+def localized(value: Any) -> str:
+    """First non-empty string of an OJS localized field."""
+    if isinstance(value, dict):
+        return value.get("en") or next((v for v in value.values() if v), "")
+    return value or ""
+
+
+def _timestamp(value: Optional[str]) -> float:
+    """Epoch seconds for an OJS date (``YYYY-MM-DD[ HH:MM:SS]``), 0 if unknown."""
+    if not value:
+        return 0.0
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value[:19], fmt).timestamp()
+        except ValueError:
+            continue
+    return 0.0
+
+
+def article_authors(article: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Authors of a submission, from the submission or its current publication."""
+    authors = article.get("authors")
+    if authors:
+        return authors
+    publications = article.get("publications") or []
+    if publications:
+        return publications[-1].get("authors") or []
+    return []
+
+
+def published_issues(issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Issues OJS reports as published; the only ones the mirror keeps."""
+    return [issue for issue in issues if issue.get("isPublished")]
+
+
+def author_key(author: Dict[str, Any]) -> str:
+    """Stable identity of an author: ORCID when present, else normalized name."""
+    orcid = (author.get("orcid") or "").rstrip("/").rsplit("/", 1)[-1]
+    if orcid:
+        return f"orcid:{orcid}"
+    name = localized(author.get("fullName")) or " ".join(
+        filter(None, [localized(author.get("givenName") or author.get("firstName")),
+                      localized(author.get("familyName") or author.get("lastName"))])
+    )
+    return "name:" + re.sub(r"\s+", " ", name).strip().lower()
+
+
+class OJSCatalogMirror:
+    """OJS catalog copy in the analytics store with incremental sync."""
+
+    def __init__(self):
+        self._syncing = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, "OJS_MIRROR_ENABLED", True)
+
+    @property
+    def max_age(self) -> int:
+        return getattr(settings, "OJS_MIRROR_MAX_AGE", 300)
+
+    # ============== Sync ==============
+
+    def sync_journal(self, journal_path: str, context_id: int, full: bool = False) -> Dict[str, Any]:
+        """
+        Refresh the mirror of one journal from OJS.
+
+        Articles modified since the last sync are fetched newest first and
+        paging stops at the previous watermark. A ``full`` sync fetches every
+        published article and drops mirrored articles OJS no longer lists,
+        which is the only way unpublished or deleted articles disappear.
+        """
+        client = redis_service.client
+        if client is None:
+            return {"journal": journal_path, "error": "Redis is not connected"}
+
+        context = ojs_service.get_journal_context(journal_path, context_id)
+        if context is None:
+            return {"journal": journal_path, "error": "Failed to fetch journal from OJS"}
+
+        issues = self._fetch_issues(journal_path)
+        if issues is not None:
+            issues = published_issues(issues)
+        sections = ojs_service.get_sections(journal_path)
+
+        state = client.hgetall(mirror_key(journal_path, "state")) or {}
+        watermark = "" if full else state.get("watermark", "")
+        articles, new_watermark = self._fetch_articles(journal_path, watermark)
+        if articles is None:
+            return {"journal": journal_path, "error": "Failed to fetch articles from OJS"}
+
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(JOURNALS_KEY, journal_path, json.dumps(context))
+        if issues is not None:
+            pipe.delete(mirror_key(journal_path, "issues"))
+            if issues:
+                pipe.hset(mirror_key(journal_path, "issues"), mapping={
+                    str(issue.get("id")): json.dumps(issue) for issue in issues
+                })
+        pipe.delete(mirror_key(journal_path, "sections"))
+        if sections:
+            pipe.hset(mirror_key(journal_path, "sections"), mapping={
+                str(section.get("id")): json.dumps(section) for section in sections
+            })
+        self._write_articles(pipe, journal_path, articles)
+        pipe.execute()
+
+        removed = self._prune_articles(client, journal_path, articles) if full else 0
+        self._update_authors(client, journal_path, articles)
+
+        client.hset(mirror_key(journal_path, "state"), mapping={
+            "synced_at": time.time(),
+            "watermark": new_watermark,
+        })
+        return {
+            "journal": journal_path,
+            "articles": len(articles),
+            "issues": len(issues or []),
+            "removed": removed,
+            "full": full,
+        }
+
+    def sync_all(self, full: bool = False) -> List[Dict[str, Any]]:
+        """Sync every configured journal."""
+        return [
+            self.sync_journal(journal["path"], journal["id"], full=full)
+            for journal in ojs_service.known_journals
+        ]
+
+    def _fetch_issues(self, journal_path: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            return list(ojs_service.iter_issues(journal_path))
+        except OJSCollectionError as e:
+            logger.error(f"OJS mirror: {e}")
+            return None
+
+    def _fetch_articles(self, journal_path: str, watermark: str):
+        """Published articles modified after ``watermark``, and the new watermark."""
+        articles = []
+        newest = watermark
+        items = ojs_service.iter_submissions(
+            journal_path,
+            status="published",
+            order_by="lastModified",
+            order_direction="DESC",
+        )
+        try:
+            for item in items:
+                modified = item.get("lastModified") or ""
+                if watermark and modified and modified <= watermark:
+                    break
+                articles.append(item)
+                newest = max(newest, modified)
+        except OJSCollectionError as e:
+            # A partial fetch would move the watermark past missed articles
+            logger.error(f"OJS mirror: {e}")
+            return None, watermark
+        finally:
+            items.close()
+        return articles, newest
+
+    def _write_articles(self, pipe, journal_path: str, articles: List[Dict[str, Any]]) -> None:
+        if not articles:
+            return
+        pipe.hset(mirror_key(journal_path, "articles"), mapping={
+            str(a["id"]): json.dumps(a) for a in articles if a.get("id") is not None
+        })
+        pipe.zadd(mirror_key(journal_path, "published"), {
+            str(a["id"]): _timestamp(a.get("datePublished"))
+            for a in articles if a.get("id") is not None
+        })
+        pipe.hset(ARTICLE_JOURNAL_KEY, mapping={
+            str(a["id"]): journal_path for a in articles if a.get("id") is not None
+        })
+        # Drop cached leaderboard metadata of changed articles
+        for article in articles:
+            if article.get("id") is not None:
+                pipe.delete(article_key(article["id"], "meta"))
+
+    def _prune_articles(self, client, journal_path: str, articles: List[Dict[str, Any]]) -> int:
+        seen = {str(a.get("id")) for a in articles}
+        stale = [
+            article_id
+            for article_id in client.hkeys(mirror_key(journal_path, "articles"))
+            if article_id not in seen
+        ]
+        if not stale:
+            return 0
+        pipe = client.pipeline(transaction=False)
+        pipe.hdel(mirror_key(journal_path, "articles"), *stale)
+        pipe.zrem(mirror_key(journal_path, "published"), *stale)
+        pipe.hdel(ARTICLE_JOURNAL_KEY, *stale)
+        pipe.delete(mirror_key(journal_path, "authors"))
+        pipe.execute()
+        from .author_index import author_index
+        from .citation_graph import citation_graph
+        author_index.remove_articles(stale)
+        citation_graph.unlink_articles(stale)
+        # Author entries may reference pruned articles; rebuild them all
+        self._update_authors(client, journal_path, self._all_articles(client, journal_path))
+        return len(stale)
+
+    def _update_authors(self, client, journal_path: str, articles: List[Dict[str, Any]]) -> None:
+        """Merge the authors of ``articles`` into the journal's author index."""
+        from .author_index import author_index
+
+        author_index.index_articles(articles)
+        touched: Dict[str, Dict[str, Any]] = {}
+        for article in articles:
+            for author in article_authors(article):
+                key = author_key(author)
+                if key in ("name:", "orcid:"):
+                    continue
+                entry = touched.setdefault(key, {
+                    "name": localized(author.get("fullName")) or key.split(":", 1)[1],
+                    "orcid": author.get("orcid") or "",
+                    "affiliation": localized(author.get("affiliation")),
+                    "article_ids": [],
+                })
+                entry["article_ids"].append(article.get("id"))
+        if not touched:
+            return
+
+        authors_key = mirror_key(journal_path, "authors")
+        keys = list(touched)
+        for key, raw in zip(keys, client.hmget(authors_key, keys)):
+            existing = json.loads(raw).get("article_ids", []) if raw else []
+            touched[key]["article_ids"] = sorted(
+                set(existing) | set(touched[key]["article_ids"])
+            )
+        client.hset(authors_key, mapping={k: json.dumps(v) for k, v in touched.items()})
+
+    def _all_articles(self, client, journal_path: str) -> List[Dict[str, Any]]:
+        return [json.loads(raw) for raw in client.hgetall(mirror_key(journal_path, "articles")).values()]
+
+    # ============== OAI-PMH Ingest ==============
+
+    def harvest_journal(
+        self, journal_path: str, full: bool = False, until: str = None, batch_size: int = 500
+    ) -> Dict[str, Any]:
+        """
+        Ingest article metadata harvested over OAI-PMH into the mirror.
+
+        Incremental by default: only records changed since the previous
+        harvest's newest datestamp are requested. Records are written in
+        pipelined batches as they stream in. Harvested fields are merged
+        over existing REST payloads, which carry more detail, and deleted
+        records are removed.
+        """
+        client = redis_service.client
+        if client is None:
+            return {"journal": journal_path, "error": "Redis is not connected"}
+
+        state_key = mirror_key(journal_path, "state")
+        watermark = None if full else client.hget(state_key, "oai_watermark")
+        newest = watermark or ""
+        harvested = deleted = 0
+        batch = []
+
+        try:
+            for record in ojs_service.iter_oai_records(journal_path, from_=watermark, until=until):
+                newest = max(newest, record.get("lastModified") or "")
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    deleted += self._ingest_records(client, journal_path, batch)
+                    harvested += len(batch)
+                    batch = []
+            if batch:
+                deleted += self._ingest_records(client, journal_path, batch)
+                harvested += len(batch)
+        except OAIHarvestError as e:
+            # Applied batches are kept; the watermark only moves on success
+            logger.error(f"OAI-PMH harvest of {journal_path} failed: {e}")
+            return {"journal": journal_path, "records": harvested, "error": str(e)}
+
+        if newest:
+            client.hset(state_key, "oai_watermark", newest)
+        return {"journal": journal_path, "records": harvested, "deleted": deleted, "from": watermark}
+
+    def _ingest_records(self, client, journal_path: str, records: List[Dict[str, Any]]) -> int:
+        """Merge a batch of harvested records; returns how many were deletions."""
+        articles_key = mirror_key(journal_path, "articles")
+        removed = [str(r["id"]) for r in records if r.get("deleted")]
+        updates = [r for r in records if not r.get("deleted")]
+
+        articles = []
+        if updates:
+            existing = client.hmget(articles_key, [str(r["id"]) for r in updates])
+            for record, raw in zip(updates, existing):
+                merged = json.loads(raw) if raw else {}
+                # REST author entries carry ids, ORCIDs and affiliations
+                skip = {"authors"} if merged.get("authors") else set()
+                merged.update({
+                    k: v for k, v in record.items()
+                    if k not in skip and v not in (None, "", {}, [])
+                })
+                articles.append(merged)
+
+        pipe = client.pipeline(transaction=False)
+        self._write_articles(pipe, journal_path, articles)
+        if removed:
+            pipe.hdel(articles_key, *removed)
+            pipe.zrem(mirror_key(journal_path, "published"), *removed)
+            pipe.hdel(ARTICLE_JOURNAL_KEY, *removed)
+        pipe.execute()
+        if removed:
+            from .author_index import author_index
+            from .citation_graph import citation_graph
+            author_index.remove_articles(removed)
+            citation_graph.unlink_articles(removed)
+        self._update_authors(client, journal_path, articles)
+        return len(removed)
+
+    # ============== Freshness ==============
+
+    def synced_at(self, journal_path: str) -> Optional[float]:
+        """When the journal was last synced, or None if it never was."""
+        client = redis_service.client
+        if client is None:
+            return None
+        try:
+            value = client.hget(mirror_key(journal_path, "state"), "synced_at")
+            return float(value) if value else None
+        except Exception as e:
+            logger.error(f"Failed to read mirror state: {e}")
+            return None
+
+    def ensure_fresh(self, journal_path: str) -> bool:
+        """
+        Whether the journal can be served from the mirror.
+
+        A stale mirror is still served but a background refresh is started.
+        A journal that was never synced returns False and is synced in the
+        background so the next request can use it.
+        """
+        if not self.enabled or redis_service.client is None:
+            return False
+        synced_at = self.synced_at(journal_path)
+        if synced_at is None or time.time() - synced_at > self.max_age:
+            self.refresh_async(journal_path)
+        return synced_at is not None
+
+    def refresh_async(self, journal_path: str) -> None:
+        """Sync a journal on a background thread unless a sync is running."""
+        journal = next(
+            (j for j in ojs_service.known_journals if j["path"] == journal_path), None
+        )
+        if journal is None:
+            return
+        with self._lock:
+            if journal_path in self._syncing:
+                return
+            self._syncing.add(journal_path)
+
+        def run():
+            try:
+                if self._acquire_sync_lock(journal_path):
+                    self.sync_journal(journal["path"], journal["id"])
+            except Exception as e:
+                logger.error(f"Background OJS mirror sync failed for {journal_path}: {e}")
+            finally:
+                with self._lock:
+                    self._syncing.discard(journal_path)
+
+        threading.Thread(target=run, name=f"ojs-mirror-{journal_path}", daemon=True).start()
+
+    def _acquire_sync_lock(self, journal_path: str) -> bool:
+        """Let only one process refresh a journal per max-age window."""
+        client = redis_service.client
+        if client is None:
+            return False
+        return bool(client.set(
+            mirror_key(journal_path, "sync_lock"), "1", nx=True, ex=max(self.max_age, 30)
+        ))
+
+    # ============== Reads ==============
+
+    def get_journals(self) -> Optional[Dict[str, Any]]:
+        """Mirrored journal contexts in OJS_JOURNALS order, like ``get_journals``."""
+        known = ojs_service.known_journals
+        fresh = [self.ensure_fresh(j["path"]) for j in known]
+        if not known or not all(fresh):
+            return None
+        raw = redis_service.client.hmget(JOURNALS_KEY, [j["path"] for j in known])
+        journals = [json.loads(r) for r in raw if r]
+        return {"itemsMax": len(journals), "items": journals}
+
+    def get_issues(
+        self, journal_path: str, status: str = None, page: int = 1, per_page: int = 20
+    ) -> Optional[Dict[str, Any]]:
+        """
+        A page of mirrored published issues, newest first.
+
+        The mirror only holds published issues, so any other status
+        (including none) returns None and is left to OJS, as does a failed
+        read.
+        """
+        if status != "published" or not self.ensure_fresh(journal_path):
+            return None
+        try:
+            issues = [
+                json.loads(raw)
+                for raw in redis_service.client.hgetall(mirror_key(journal_path, "issues")).values()
+            ]
+        except Exception as e:
+            logger.error(f"Failed to read mirrored issues of {journal_path}: {e}")
+            return None
+        issues = published_issues(issues)
+        issues.sort(key=lambda i: (i.get("datePublished") or "", i.get("id") or 0), reverse=True)
+        start = (max(page, 1) - 1) * per_page
+        return {"itemsMax": len(issues), "items": issues[start:start + per_page]}
+
+    def get_submissions(
+        self, journal_path: str, status: str = None, page: int = 1, items_per_page: int = 20
+    ) -> Optional[Dict[str, Any]]:
+        """
+        A page of mirrored articles, most recently published first.
+
+        The mirror only holds published articles, so any other status
+        (including none) returns None and is left to OJS, as does a failed
+        read.
+        """
+        if status != "published" or not self.ensure_fresh(journal_path):
+            return None
+        client = redis_service.client
+        start = (max(page, 1) - 1) * items_per_page
+        try:
+            ids = client.zrevrange(mirror_key(journal_path, "published"), start, start + items_per_page - 1)
+            items = []
+            if ids:
+                raw = client.hmget(mirror_key(journal_path, "articles"), ids)
+                items = [json.loads(r) for r in raw if r]
+            total = client.zcard(mirror_key(journal_path, "published"))
+        except Exception as e:
+            logger.error(f"Failed to read mirrored submissions of {journal_path}: {e}")
+            return None
+        return {"itemsMax": total, "items": items}
+
+    def get_article(self, article_id: int, journal_path: str = None) -> Optional[Dict[str, Any]]:
+        """A mirrored article, looked up through the article index if needed."""
+        journal_path = journal_path or self.journal_for_article(article_id)
+        if not journal_path or not self.ensure_fresh(journal_path):
+            return None
+        raw = redis_service.client.hget(mirror_key(journal_path, "articles"), str(article_id))
+        return json.loads(raw) if raw else None
+
+    def journal_for_article(self, article_id: int) -> Optional[str]:
+        """Journal path of a mirrored article."""
+        client = redis_service.client
+        if client is None:
+            return None
+        try:
+            return client.hget(ARTICLE_JOURNAL_KEY, str(article_id))
+        except Exception as e:
+            logger.error(f"Failed to read article index: {e}")
+            return None
+
+    def get_articles(self, journal_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Every mirrored published article of a journal."""
+        if not self.ensure_fresh(journal_path):
+            return None
+        return self._all_articles(redis_service.client, journal_path)
+
+    def get_sections(self, journal_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Mirrored sections of a journal."""
+        if not self.ensure_fresh(journal_path):
+            return None
+        raw = redis_service.client.hgetall(mirror_key(journal_path, "sections"))
+        return [json.loads(r) for r in raw.values()]
+
+    def get_authors(self, journal_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Mirrored authors of a journal with the ids of their articles."""
+        if not self.ensure_fresh(journal_path):
+            return None
+        raw = redis_service.client.hgetall(mirror_key(journal_path, "authors"))
+        return [{"key": key, **json.loads(value)} for key, value in raw.items()]
+
+    def get_journal_stats(self, journal_path: str) -> Optional[Dict[str, Any]]:
+        """Article and issue totals, like ``OJSService.get_journal_stats``."""
+        if not self.ensure_fresh(journal_path):
+            return None
+        client = redis_service.client
+        return {
+            "total_articles": client.zcard(mirror_key(journal_path, "published")),
+            "total_issues": client.hlen(mirror_key(journal_path, "issues")),
+            "journal_path": journal_path,
+        }
+
+
+# Singleton instance
+ojs_mirror = OJSCatalogMirror()
@@ -0,0 +1,147 @@
+"""
+Field projection and locale selection for OJS proxy responses.
+
+OJS payloads carry every locale of every title, abstract and biography plus
+many fields the dashboard never reads. The proxy views trim them before
+serialization:
+
+- ``fields=id,title,authors.fullName`` keeps only the listed (dotted) paths;
+  ``fields=all`` keeps the whole payload. Without ``fields`` a compact
+  default shape is used for articles and issues.
+- ``locale=fr_CA`` narrows localized fields to that locale, falling back to
+  English and then to the first non-empty value; ``locale=all`` keeps
+  every locale. Localized fields stay ``{locale: value}`` objects so
+  clients reading ``title.en_US`` keep working.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+# Locale codes such as "en", "en_US", "pt-BR", "sr_RS@latin"
+LOCALE_KEY = re.compile(r"^[a-z]{2,3}(?:[_-][A-Za-z]{2,4})?(?:@[a-z]+)?$")
+
+FALLBACK_LOCALES = ("en_US", "en")
+
+# OJS fields that hold {locale: value} objects
+LOCALIZED_FIELDS = {
+    "title", "subtitle", "fullTitle", "prefix", "abstract", "keywords",
+    "subjects", "disciplines", "description", "name", "acronym", "abbreviation",
+    "givenName", "familyName", "preferredPublicName", "affiliation", "biography",
+    "coverage", "rights", "source", "copyrightHolder", "supportingAgencies",
+}
+
+_AUTHOR_FIELDS = (
+    "id", "fullName", "givenName", "familyName", "firstName", "lastName",
+    "affiliation", "orcid", "seq",
+)
+
+_PUBLICATION_FIELDS = (
+    "id", "title", "subtitle", "abstract", "keywords", "datePublished",
+    "status", "sectionId", "issueId", "pages", "doiObject.doi", "pub-id::doi",
+    "urlPublished",
+) + tuple(f"authors.{field}" for field in _AUTHOR_FIELDS)
+
+# Default shapes: what the dashboard and the public pages read
+DEFAULT_FIELDS = {
+    "article": (
+        "id", "submissionId", "title", "subtitle", "abstract", "keywords",
+        "datePublished", "lastModified", "status", "sectionId", "issueId",
+        "urlPublished", "currentPublicationId", "section.id", "section.title",
+        "galleys.id", "galleys.label", "galleys.urlPublished",
+    )
+    + tuple(f"authors.{field}" for field in _AUTHOR_FIELDS)
+    + tuple(f"publications.{field}" for field in _PUBLICATION_FIELDS),
+    "issue": (
+        "id", "journalId", "volume", "number", "year", "title", "description",
+        "datePublished", "isPublished", "coverImageUrl", "identification",
+        "urlPublished",
+    ),
+}
+
+
+def parse_fields(value: Optional[str]) -> List[str]:
+    """Split a ``fields`` query parameter into dotted paths."""
+    return [field.strip() for field in (value or "").split(",") if field.strip()]
+
+
+def _field_tree(fields: Iterable[str]) -> Dict[str, Any]:
+    """Turn dotted paths into a nested dict, e.g. {"authors": {"fullName": {}}}."""
+    tree: Dict[str, Any] = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value: Any, tree: Dict[str, Any]) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: _project(value[key], subtree)
+        for key, subtree in tree.items()
+        if key in value
+    }
+
+
+def is_localized(value: Any) -> bool:
+    """Whether a value is an OJS ``{locale: value}`` object."""
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and all(isinstance(key, str) and LOCALE_KEY.match(key) for key in value)
+        and all(v is None or isinstance(v, (str, list)) for v in value.values())
+    )
+
+
+def select_locale(value: Dict[str, Any], locale: Optional[str]) -> Dict[str, Any]:
+    """Narrow a localized object to one locale, keeping its key."""
+    for candidate in (locale, *FALLBACK_LOCALES):
+        if candidate and value.get(candidate):
+            return {candidate: value[candidate]}
+    for key, text in value.items():
+        if text:
+            return {key: text}
+    return {}
+
+
+def localize(value: Any, locale: Optional[str]) -> Any:
+    """Apply ``select_locale`` to the localized fields of a payload."""
+    if isinstance(value, list):
+        return [localize(item, locale) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: select_locale(item, locale)
+            if key in LOCALIZED_FIELDS and is_localized(item)
+            else localize(item, locale)
+            for key, item in value.items()
+        }
+    return value
+
+
+def shape_response(
+    payload: Any, kind: str, fields: Optional[str] = None, locale: Optional[str] = None
+) -> Any:
+    """
+    Project and localize an OJS payload of ``kind`` ("article" or "issue").
+
+    Collection responses (``{"items": [...], "itemsMax": n}``) are shaped
+    item by item and keep their other keys.
+    """
+    if fields == "all":
+        tree = {}
+    else:
+        tree = _field_tree(parse_fields(fields) or DEFAULT_FIELDS[kind])
+
+    if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        shaped = {**payload, "items": [_project(item, tree) for item in payload["items"]]}
+    else:
+        shaped = _project(payload, tree)
+
+    if locale == "all":
+        return shaped
+    return localize(shaped, locale)
@@ -2,15 +2,127 @@
 OJS API service for fetching content metadata.
 """
 
+import contextvars
+import functools
+import json
 import logging
+import math
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import requests
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
+from urllib.parse import urlencode
 from django.conf import settings
 
+from .oai_harvester import OAIHarvester
+from .redis_service import redis_service
+
 logger = logging.getLogger(__name__)
 
 
+class OJSCollectionError(Exception):
+    """A page of an OJS collection could not be fetched."""
+
+
+# Responses memoized for the current request scope, keyed by endpoint and params
+_request_memo: contextvars.ContextVar = contextvars.ContextVar("ojs_request_memo", default=None)
+
+# Recent submissions shown in journal metrics. get_journal_stats fetches the
+# same page, so metrics reuse its response instead of asking for 10 items.
+RECENT_ARTICLES = 10
+
+
+def request_scoped(method):
+    """Run an OJSService method inside a request scope."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.request_scope():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ValidatorCache:
+    """
+    LRU of response validators (ETag / Last-Modified) and raw bodies.
+
+    Lets OJS answer repeated GETs with 304 Not Modified, in which case the
+    body downloaded last time is parsed again instead of downloading it
+    anew, so every caller gets its own copy. Bounded by entry count and by
+    the total size of the stored bodies.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    def headers_for(self, key: str) -> Dict[str, str]:
+        """Conditional request headers for a cached URL."""
+        with self._lock:
+            self.requests += 1
+            entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def reuse(self, key: str) -> Optional[Any]:
+        """Freshly parsed body of a cached URL after OJS answered 304."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.not_modified += 1
+            body = entry["body"]
+        return json.loads(body)
+
+    def store(self, key: str, response) -> None:
+        """Remember the validators and raw body of a full response, if it has validators."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        body = response.content
+        with self._lock:
+            self._remove(key)
+            if (not etag and not last_modified) or len(body) > self.max_bytes:
+                return
+            self._entries[key] = {"etag": etag, "last_modified": last_modified, "body": body}
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry["body"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "requests": self.requests,
+                "not_modified": self.not_modified,
+                "hit_rate": round(self.not_modified / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+def collection_total(result: Dict[str, Any]) -> int:
+    """Total number of items reported by an OJS collection response."""
+    return result.get("itemsMax", result.get("itemsTotalCount", 0)) or 0
+
+
 class OJSService:
     """Service for OJS REST API integration."""
 
@@ -22,6 +134,10 @@ class OJSService:
             self.base_url = self.base_url.rstrip('/') + '/index.php'
         # base_url should NOT have trailing slash for endpoint concatenation
         self.base_url = self.base_url.rstrip('/')
+        self.validators = ValidatorCache(
+            getattr(settings, "OJS_CONDITIONAL_CACHE_SIZE", 512),
+            getattr(settings, "OJS_CONDITIONAL_CACHE_BYTES", 32 * 1024 * 1024),
+        )
 
     @property
     def is_configured(self) -> bool:
@@ -32,6 +148,24 @@ class OJSService:
         """Get headers for OJS API requests."""
         return {"Accept": "application/json"}
 
+    @contextmanager
+    def request_scope(self):
+        """
+        Memoize OJS GET requests made inside the block.
+
+        Identical calls (same endpoint and params) within one composite
+        request hit OJS once. Nested scopes share the outermost memo, and
+        failed requests are not memoized.
+        """
+        if _request_memo.get() is not None:
+            yield
+            return
+        token = _request_memo.set({})
+        try:
+            yield
+        finally:
+            _request_memo.reset(token)
+
     def _make_request(
         self, method: str, endpoint: str, params: Dict[str, Any] = None
     ) -> Optional[Any]:
@@ -43,6 +177,11 @@ class OJSService:
         if params is None:
             params = {}
 
+        memo = _request_memo.get() if method.upper() == "GET" else None
+        memo_key = (endpoint, tuple(sorted(params.items())))
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+
         # Add API token to params
         params["apiToken"] = self.api_key
 
@@ -52,17 +191,29 @@ class OJSService:
         if "/index.php/index.php/" in url:
             url = url.replace("/index.php/index.php/", "/index.php/")
 
+        # Validators are per URL; the API token is left out of the key
+        cache_key = f"{url}?{urlencode(memo_key[1])}"
+
         try:
             if method.upper() == "GET":
+                headers = {**self._get_headers(), **self.validators.headers_for(cache_key)}
                 response = requests.get(
-                    url, params=params, headers=self._get_headers(), timeout=30
+                    url, params=params, headers=headers, timeout=30
                 )
             else:
                 response = requests.request(
                     method, url, params=params, headers=self._get_headers(), timeout=30
                 )
-            response.raise_for_status()
-            return response.json()
+            if response.status_code == 304:
+                result = self.validators.reuse(cache_key)
+                if result is None:
+                    logger.error(f"OJS returned 304 for an uncached response: {endpoint}")
+                    return None
+            else:
+                response.raise_for_status()
+                result = response.json()
+                if method.upper() == "GET":
+                    self.validators.store(cache_key, response)
         except requests.exceptions.Timeout:
             logger.error(f"OJS request timed out: {endpoint}")
             return None
@@ -73,22 +224,86 @@ class OJSService:
             logger.error(f"Invalid JSON response from OJS: {e}")
             return None
 
+        if memo is not None:
+            memo[memo_key] = result
+        return result
+
+    def iter_collection(
+        self,
+        endpoint: str,
+        params: Dict[str, Any] = None,
+        items_per_page: int = 100,
+        max_workers: int = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every item of a paginated OJS collection.
+
+        The first page tells how many pages there are; the rest are fetched
+        concurrently, keeping at most ``max_workers`` requests in flight,
+        and items are yielded in page order as pages arrive. Closing the
+        generator early cancels the pages not yet requested.
+
+        Raises OJSCollectionError if a page cannot be fetched, after the
+        items of earlier pages have been yielded.
+        """
+        params = dict(params or {})
+        max_workers = max_workers or getattr(settings, "OJS_MAX_CONCURRENCY", 4)
+
+        def fetch(page: int) -> Optional[Any]:
+            return self._make_request(
+                "GET", endpoint, {**params, "page": page, "itemsPerPage": items_per_page}
+            )
+
+        first = fetch(1)
+        if not isinstance(first, dict):
+            raise OJSCollectionError(f"Failed to fetch {endpoint}")
+        items = first.get("items") or []
+        total = collection_total(first)
+        if not items or len(items) >= total:
+            yield from items
+            return
+
+        # OJS may cap the page size below what was asked for
+        pages = math.ceil(total / len(items))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ojs-page")
+        pending = deque()
+        next_page = 2
+        try:
+            while next_page <= pages and len(pending) < max_workers:
+                pending.append((next_page, executor.submit(fetch, next_page)))
+                next_page += 1
+            yield from items
+
+            while pending:
+                page, future = pending.popleft()
+                if next_page <= pages:
+                    pending.append((next_page, executor.submit(fetch, next_page)))
+                    next_page += 1
+                result = future.result()
+                if not isinstance(result, dict):
+                    raise OJSCollectionError(f"Failed to fetch page {page} of {endpoint}")
+                yield from result.get("items") or []
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
 # ============== Journals ==============
 
+    @property
+    def known_journals(self) -> List[Dict[str, Any]]:
+        """Journals configured in OJS_JOURNALS as ``{'path', 'id'}`` dicts."""
+        return getattr(settings, 'OJS_JOURNALS', [
+            {'path': 'innovative-minds', 'id': 1},
+            {'path': 'bright-tomorrow', 'id': 2},
+        ])
+
     def get_journals(self) -> Optional[List[Dict[str, Any]]]:
         """Get all journals (contexts) from OJS.
         
         Since there's no system-wide API, we iterate through known journals
         and fetch their context details individually.
         """
-        # Get list of known journals from settings or use defaults
-        known_journals = getattr(settings, 'OJS_JOURNALS', [
-            {'path': 'innovative-minds', 'id': 1},
-            {'path': 'bright-tomorrow', 'id': 2},
-        ])
-        
         journals = []
-        for journal in known_journals:
+        for journal in self.known_journals:
             context = self.get_journal_context(journal['path'], journal['id'])
             if context:
                 journals.append(context)
@@ -126,6 +341,13 @@ class OJSService:
             "GET", f"/index.php/{journal_path}/api/v1/issues", params
         )
 
+    def iter_issues(
+        self, journal_path: str, status: str = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield every issue of a journal."""
+        params = {"status": status} if status else {}
+        return self.iter_collection(f"/index.php/{journal_path}/api/v1/issues", params)
+
     def get_issue(self, journal_path: str, issue_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific issue."""
         return self._make_request(
@@ -140,15 +362,38 @@ class OJSService:
         status: str = None,
         page: int = 1,
         items_per_page: int = 20,
+        order_by: str = None,
+        order_direction: str = None,
     ) -> Optional[Dict[str, Any]]:
         """Get submissions/articles for a journal."""
         params = {"page": page, "itemsPerPage": items_per_page}
         if status:
             params["status"] = status
+        if order_by:
+            params["orderBy"] = order_by
+        if order_direction:
+            params["orderDirection"] = order_direction
         return self._make_request(
             "GET", f"/index.php/{journal_path}/api/v1/submissions", params
         )
 
+    def iter_submissions(
+        self,
+        journal_path: str,
+        status: str = None,
+        order_by: str = None,
+        order_direction: str = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield every submission of a journal, across all pages."""
+        params = {}
+        if status:
+            params["status"] = status
+        if order_by:
+            params["orderBy"] = order_by
+        if order_direction:
+            params["orderDirection"] = order_direction
+        return self.iter_collection(f"/index.php/{journal_path}/api/v1/submissions", params)
+
     def get_published_submissions(
         self, journal_path: str, page: int = 1, items_per_page: int = 20
     ) -> Optional[Dict[str, Any]]:
@@ -189,6 +434,18 @@ class OJSService:
             "GET", f"/index.php/{journal_path}/api/v1/articles/{article_id}"
         )
 
+    def iter_oai_records(
+        self, journal_path: str, from_: str = None, until: str = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield article metadata harvested over OAI-PMH.
+
+        Needs no API token and streams whole repositories in large pages;
+        ``from_``/``until`` are OAI datestamps for incremental harvests.
+        Raises OAIHarvestError if a page fails.
+        """
+        return OAIHarvester(self.base_url).iter_records(journal_path, from_, until)
+
     # ============== Authors ==============
 
     def get_authors(
@@ -227,7 +484,7 @@ class OJSService:
     def get_journal_stats(self, journal_path: str) -> Dict[str, Any]:
         """Get aggregated stats for a journal."""
         submissions = self.get_published_submissions(journal_path)
-        issues = self.get_issues(journal_path)
+        issues = self.get_issues(journal_path, status="published")
 
         stats = {
             "total_articles": 0,
@@ -236,9 +493,9 @@ class OJSService:
         }
 
         if submissions and isinstance(submissions, dict):
-            stats["total_articles"] = submissions.get("itemsTotalCount", 0)
+            stats["total_articles"] = collection_total(submissions)
         if issues and isinstance(issues, dict):
-            stats["total_issues"] = issues.get("itemsTotalCount", 0)
+            stats["total_issues"] = collection_total(issues)
 
         return stats
 
@@ -286,15 +543,14 @@ class OJSService:
 
         return metrics
 
+    @request_scoped
     def get_journal_metrics(self, journal_path: str) -> Dict[str, Any]:
         """Get comprehensive metrics for a journal including all OJS data."""
         # Get basic stats
         stats = self.get_journal_stats(journal_path)
         
-        # Get recent submissions
-        recent_submissions = self.get_published_submissions(journal_path, page=1, items_per_page=10)
-        
-        # Get issues
+        # Get recent submissions and issues (memoized from the stats calls)
+        recent_submissions = self.get_published_submissions(journal_path)
         issues = self.get_issues(journal_path, status="published")
         
         # Get sections
@@ -323,12 +579,12 @@ class OJSService:
                         for a in item.get("authors", [])[:3]
                     ],
                 }
-                for item in items
+                for item in items[:RECENT_ARTICLES]
             ]
         
         # Process issues
         if issues and isinstance(issues, dict):
-            metrics["published_issues"] = issues.get("itemsTotalCount", 0)
+            metrics["published_issues"] = collection_total(issues)
         
         # Process sections
         if sections:
@@ -343,11 +599,23 @@ class OJSService:
         return metrics
 
     def get_all_metrics(self) -> Dict[str, Any]:
-        """Get metrics for all journals."""
-        known_journals = getattr(settings, 'OJS_JOURNALS', [
-            {'path': 'innovate-minds', 'id': 1},
-            {'path': 'bright-tomorrow', 'id': 2},
-        ])
+        """
+        Get metrics for all journals.
+
+        Cached for OJS_METRICS_CACHE_TTL seconds and recomputed by one
+        caller at a time.
+        """
+        return redis_service.cache_fill(
+            "ojs:all_metrics",
+            self._compute_all_metrics,
+            ttl=getattr(settings, "OJS_METRICS_CACHE_TTL", 300),
+            # Zero articles usually means OJS could not be reached
+            cacheable=lambda metrics: metrics["total_articles"] > 0,
+        )
+
+    @request_scoped
+    def _compute_all_metrics(self) -> Dict[str, Any]:
+        known_journals = self.known_journals
         
         all_metrics = {
             "journals": [],
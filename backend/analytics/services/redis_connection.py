@@ -0,0 +1,75 @@
+"""
+Redis client construction for standalone, Sentinel and Cluster deployments.
+
+REDIS_MODE selects the topology:
+- ``standalone``: a single server at REDIS_HOST:REDIS_PORT
+- ``sentinel``: the master of REDIS_SENTINEL_MASTER, discovered through
+  REDIS_SENTINELS, with automatic failover
+- ``cluster``: a Redis Cluster reached through REDIS_CLUSTER_NODES
+"""
+
+import logging
+from django.conf import settings
+
+from ..redis_nodes import parse_nodes
+
+try:
+    import redis
+    from redis.cluster import ClusterNode, RedisCluster
+    from redis.sentinel import Sentinel
+except ImportError:
+    redis = None
+
+try:
+    from django_redis.pool import ConnectionFactory
+except ImportError:
+    ConnectionFactory = object
+
+logger = logging.getLogger(__name__)
+
+
+def redis_mode() -> str:
+    """Configured Redis topology."""
+    return getattr(settings, "REDIS_MODE", "standalone")
+
+
+def build_redis_client(decode_responses: bool = True):
+    """Create a redis-py client for the configured topology."""
+    options = {
+        "decode_responses": decode_responses,
+        "socket_connect_timeout": 5,
+        "socket_timeout": 5,
+    }
+    mode = redis_mode()
+
+    if mode == "sentinel":
+        sentinel = Sentinel(
+            parse_nodes(settings.REDIS_SENTINELS, 26379),
+            socket_timeout=options["socket_timeout"],
+        )
+        return sentinel.master_for(
+            settings.REDIS_SENTINEL_MASTER, db=settings.REDIS_DB, **options
+        )
+
+    if mode == "cluster":
+        return RedisCluster(
+            startup_nodes=[
+                ClusterNode(host, port)
+                for host, port in parse_nodes(settings.REDIS_CLUSTER_NODES)
+            ],
+            **options,
+        )
+
+    return redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        **options,
+    )
+
+
+class ClusterConnectionFactory(ConnectionFactory):
+    """django-redis connection factory returning RedisCluster clients."""
+
+    def connect(self, url: str):
+        return RedisCluster.from_url(url)
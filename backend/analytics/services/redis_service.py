@@ -4,9 +4,19 @@ Redis service for real-time analytics counters and pub/sub.
 
 import json
 import logging
-from typing import Optional, List, Dict, Any
+import threading
+import time
+import uuid
+import zlib
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from django.conf import settings
 
+from .cache_codec import cache_codec
+from .local_cache import LocalCache, InvalidationListener, INVALIDATION_CHANNEL, MISSING
+from .single_flight import KeyedLocks, should_refresh_early
+from .storage_backends import InMemoryBackend, RedisBackend
+from .redis_connection import build_redis_client, redis_mode
+
 try:
     import redis
 except ImportError:
@@ -14,50 +24,149 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Capped Redis Stream holding every tracking event
+EVENT_STREAM_KEY = "analytics:events"
+
+# Field suffixes for article counters in the hash counter layout
+COUNTER_FIELDS = {"views": "v", "downloads": "d"}
+
+TRENDING_KEY = "trending:articles"
+
+
+def hash_tags_enabled() -> bool:
+    """Whether per-article keys carry a Redis Cluster hash tag."""
+    return getattr(settings, "REDIS_HASH_TAGS", redis_mode() == "cluster")
+
+
+def article_key(article_id: str, *parts: str) -> str:
+    """
+    Key for per-article data, e.g. ``article:{42}:views``.
+
+    With hash tags enabled the article id is wrapped in braces so every key
+    of one article hashes to the same cluster slot, keeping multi-key
+    operations on an article on a single node.
+    """
+    tag = f"{{{article_id}}}" if hash_tags_enabled() else str(article_id)
+    return ":".join(["article", tag, *parts])
+
+
+def article_id_from_key(key: str) -> str:
+    """Extract the article id from a key built by ``article_key``."""
+    return key.split(":", 2)[1].strip("{}")
+
+
+def counter_bucket_key(article_id: str, bucket_size: int, prefix: str = "counters") -> str:
+    """
+    Hash holding the packed counters of an article.
+
+    Numeric ids are bucketed by range so neighbouring articles share a hash;
+    other ids are spread over a fixed number of buckets by checksum.
+    """
+    article_id = str(article_id)
+    if article_id.isdigit():
+        return f"{prefix}:{int(article_id) // bucket_size}"
+    return f"{prefix}:h{zlib.crc32(article_id.encode()) % 4096}"
+
 
 class RedisService:
-    """Service for Redis operations - counters, caching, and pub/sub."""
+    """Service for Redis operations - counters, caching, and pub/sub.
+
+    Commands go through a storage backend: Redis by default, or an
+    in-process store when ANALYTICS_STORAGE_BACKEND is ``memory``.
+    """
 
     def __init__(self):
         self._client = None
         self._pubsub = None
+        self._circuit_open_until = 0.0
+        # In-process tier in front of cache_get, kept coherent over pub/sub
+        self.local_cache = LocalCache()
+        self._invalidations = InvalidationListener(self.local_cache, self._invalidation_pubsub)
+        self._stats_lock = threading.Lock()
+        self._redis_hits = 0
+        self._redis_misses = 0
+        self._fill_locks = KeyedLocks()
 
     @property
     def client(self):
-        """Lazy initialization of Redis client."""
+        """Lazy initialization of the storage backend."""
+        if self.circuit_open:
+            return None
+        if self._client is None and self.backend_name == "memory":
+            self._client = InMemoryBackend()
         if self._client is None and redis:
             try:
-                self._client = redis.Redis(
-                    host=settings.REDIS_HOST,
-                    port=settings.REDIS_PORT,
-                    db=settings.REDIS_DB,
-                    decode_responses=True,
-                    socket_connect_timeout=5,
-                    socket_timeout=5,
+                self._client = RedisBackend(
+                    build_redis_client(),
+                    raw_factory=lambda: build_redis_client(decode_responses=False),
                 )
                 # Test connection
                 self._client.ping()
             except Exception as e:
                 logger.error(f"Failed to connect to Redis: {e}")
                 self._client = None
+                self._trip_circuit()
         return self._client
 
+    @property
+    def raw_client(self):
+        """The storage backend without response decoding, for binary values."""
+        client = self.client
+        return client.raw() if client is not None else None
+
+    @property
+    def backend_name(self) -> str:
+        """Configured storage backend: ``redis`` or ``memory``."""
+        return getattr(settings, "ANALYTICS_STORAGE_BACKEND", "redis")
+
+    @property
+    def cluster_mode(self) -> bool:
+        """Whether keys are spread over the slots of a Redis Cluster."""
+        return self.backend_name == "redis" and redis_mode() == "cluster"
+
     def is_connected(self) -> bool:
         """Check if Redis is connected."""
         try:
             return self.client is not None and self.client.ping()
         except:
+            self._trip_circuit()
+            return False
+
+    # ============== Circuit Breaker ==============
+
+    @property
+    def circuit_open(self) -> bool:
+        """True while Redis calls are being skipped after a failure."""
+        return time.monotonic() < self._circuit_open_until
+
+    def _trip_circuit(self) -> None:
+        """Skip Redis calls for a cooldown period so requests fail fast."""
+        cooldown = getattr(settings, "REDIS_CIRCUIT_COOLDOWN", 10)
+        self._circuit_open_until = time.monotonic() + cooldown
+
+    def _spool(self, op: str, *args) -> bool:
+        """Record a tracking write locally so it can be replayed later."""
+        if redis is None or not getattr(settings, "TRACKING_SPOOL_ENABLED", True):
             return False
+        from .spool_service import tracking_spool
+
+        return tracking_spool.append(op, *args)
 
     # ============== Counter Operations ==============
 
     def increment_counter(self, key: str, amount: int = 1) -> int:
-        """Increment a counter and return the new value."""
+        """Increment a counter and return the new value.
+
+        If Redis is unreachable the increment is spooled locally and 0 is
+        returned; the spool replayer applies it once Redis recovers.
+        """
         try:
             if self.client:
                 return self.client.incrby(key, amount)
         except Exception as e:
             logger.error(f"Failed to increment counter {key}: {e}")
+            self._trip_circuit()
+        self._spool("incrby", key, amount)
         return 0
 
     def get_counter(self, key: str) -> int:
@@ -80,23 +189,100 @@ class RedisService:
             logger.error(f"Failed to set counter {key}: {e}")
         return False
 
+    def get_hash_counter(self, key: str, field: str) -> int:
+        """Get current value of a counter stored in a hash field."""
+        try:
+            if self.client:
+                value = self.client.hget(key, field)
+                return int(value) if value else 0
+        except Exception as e:
+            logger.error(f"Failed to get counter {key}/{field}: {e}")
+        return 0
+
+    def increment_hash_counter(self, key: str, field: str, amount: int = 1) -> int:
+        """Increment a counter stored in a hash field and return the new value."""
+        try:
+            if self.client:
+                return self.client.hincrby(key, field, amount)
+        except Exception as e:
+            logger.error(f"Failed to increment counter {key}/{field}: {e}")
+            self._trip_circuit()
+        self._spool("hincrby", key, field, amount)
+        return 0
+
+    # ============== Counter Layout ==============
+
+    @property
+    def counter_layout(self) -> str:
+        """Storage layout for article counters: ``keys`` or ``hash``."""
+        return getattr(settings, "REDIS_COUNTER_LAYOUT", "keys")
+
+    def article_counter_location(
+        self, article_id: str, metric: str, layout: str = None
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Return ``(key, field)`` holding an article counter.
+
+        ``field`` is None in the ``keys`` layout, where every counter is its
+        own string key. In the ``hash`` layout counters are packed into small
+        hashes so Redis can store them with its compact listpack encoding.
+        """
+        if (layout or self.counter_layout) == "hash":
+            bucket_size = getattr(settings, "REDIS_COUNTER_BUCKET_SIZE", 64)
+            return (
+                counter_bucket_key(article_id, bucket_size),
+                f"{article_id}:{COUNTER_FIELDS[metric]}",
+            )
+        return article_key(article_id, metric), None
+
+    def _get_article_counter(self, article_id: str, metric: str) -> int:
+        key, field = self.article_counter_location(article_id, metric)
+        if field is None:
+            return self.get_counter(key)
+        return self.get_hash_counter(key, field)
+
+    def _increment_article_counter(self, article_id: str, metric: str) -> int:
+        key, field = self.article_counter_location(article_id, metric)
+        if field is None:
+            return self.increment_counter(key)
+        return self.increment_hash_counter(key, field)
+
     # ============== Article/Journal Counters ==============
 
     def get_article_views(self, article_id: str) -> int:
         """Get view count for an article."""
-        return self.get_counter(f"article:{article_id}:views")
+        return self._get_article_counter(article_id, "views")
 
     def increment_article_views(self, article_id: str) -> int:
         """Increment view count for an article."""
-        return self.increment_counter(f"article:{article_id}:views")
+        return self._increment_article_counter(article_id, "views")
 
     def get_article_downloads(self, article_id: str) -> int:
         """Get download count for an article."""
-        return self.get_counter(f"article:{article_id}:downloads")
+        return self._get_article_counter(article_id, "downloads")
 
     def increment_article_downloads(self, article_id: str) -> int:
         """Increment download count for an article."""
-        return self.increment_counter(f"article:{article_id}:downloads")
+        return self._increment_article_counter(article_id, "downloads")
+
+    def get_article_counters(self, article_ids: List[str], metric: str) -> Dict[str, int]:
+        """Read one counter of many articles in a single pipeline."""
+        counts = {str(article_id): 0 for article_id in article_ids}
+        if not counts or self.client is None:
+            return counts
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for article_id in counts:
+                key, field = self.article_counter_location(article_id, metric)
+                if field is None:
+                    pipe.get(key)
+                else:
+                    pipe.hget(key, field)
+            for article_id, value in zip(counts, pipe.execute()):
+                counts[article_id] = int(value or 0)
+        except Exception as e:
+            logger.error(f"Failed to get article {metric}: {e}")
+        return counts
 
     def get_journal_views(self, journal_id: str) -> int:
         """Get view count for a journal."""
@@ -108,25 +294,63 @@ class RedisService:
 
     # ============== Trending Content ==============
 
+    @property
+    def trending_shards(self) -> int:
+        """Number of sorted sets the trending scores are spread over."""
+        return getattr(settings, "REDIS_TRENDING_SHARDS", 1)
+
+    def trending_key(self, article_id: str) -> str:
+        """
+        Sorted set holding an article's trending score.
+
+        With one shard this is the single ``trending:articles`` set. In a
+        cluster the scores can be sharded over several sets on different
+        slots so trending writes do not all land on one node; readers merge
+        the per-shard top lists.
+        """
+        if self.trending_shards <= 1:
+            return TRENDING_KEY
+        shard = zlib.crc32(str(article_id).encode()) % self.trending_shards
+        return f"{TRENDING_KEY}:{{{shard}}}"
+
+    def trending_keys(self) -> List[str]:
+        """All trending shards."""
+        if self.trending_shards <= 1:
+            return [TRENDING_KEY]
+        return [f"{TRENDING_KEY}:{{{shard}}}" for shard in range(self.trending_shards)]
+
     def update_trending(self, article_id: str, score: float = 1.0) -> bool:
         """Update trending score for an article using sorted set."""
+        key = self.trending_key(article_id)
         try:
             if self.client:
-                self.client.zincrby("trending:articles", score, article_id)
+                self.client.zincrby(key, score, article_id)
                 # Keep only top 100 articles
-                self.client.zremrangebyrank("trending:articles", 0, -101)
+                self.client.zremrangebyrank(key, 0, -101)
                 return True
         except Exception as e:
             logger.error(f"Failed to update trending: {e}")
+            self._trip_circuit()
+        self._spool("zincrby", key, score, article_id)
         return False
 
     def get_trending_articles(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top trending articles."""
         try:
             if self.client:
-                results = self.client.zrevrange(
-                    "trending:articles", 0, limit - 1, withscores=True
-                )
+                keys = self.trending_keys()
+                if len(keys) == 1:
+                    results = self.client.zrevrange(
+                        keys[0], 0, limit - 1, withscores=True
+                    )
+                else:
+                    # Each shard's top-N contains that shard's share of the
+                    # global top-N, so merging them client-side is exact.
+                    pipe = self.client.pipeline(transaction=False)
+                    for key in keys:
+                        pipe.zrevrange(key, 0, limit - 1, withscores=True)
+                    merged = [item for shard in pipe.execute() for item in shard]
+                    results = sorted(merged, key=lambda item: item[1], reverse=True)[:limit]
                 return [
                     {"article_id": article_id, "score": int(score)}
                     for article_id, score in results
@@ -145,6 +369,8 @@ class RedisService:
                 return True
         except Exception as e:
             logger.error(f"Failed to update geo count: {e}")
+            self._trip_circuit()
+        self._spool("hincrby", "geo:countries", country_code, 1)
         return False
 
     def get_geo_data(self) -> Dict[str, int]:
@@ -160,22 +386,34 @@ class RedisService:
     # ============== Caching ==============
 
     def cache_set(self, key: str, value: Any, ttl: int = 300) -> bool:
-        """Set cached value with TTL."""
+        """Set cached value with TTL, encoded with the cache codec."""
         try:
             if self.client:
-                self.client.setex(key, ttl, json.dumps(value))
+                self.client.setex(key, ttl, cache_codec.encode(value))
+                self._invalidate([key])
+                if self._use_local():
+                    self.local_cache.set(key, value, ttl)
                 return True
         except Exception as e:
             logger.error(f"Failed to cache set: {e}")
         return False
 
     def cache_get(self, key: str) -> Optional[Any]:
-        """Get cached value."""
+        """Get cached value, from the in-process tier when it holds the key."""
+        local = self._use_local()
+        if local:
+            value = self.local_cache.get(key)
+            if value is not MISSING:
+                return value
         try:
             if self.client:
-                value = self.client.get(key)
+                value = self.raw_client.get(key)
+                self._count_redis_lookup(bool(value))
                 if value:
-                    return json.loads(value)
+                    value = cache_codec.decode(value)
+                    if local:
+                        self.local_cache.set(key, value)
+                    return value
         except Exception as e:
             logger.error(f"Failed to cache get: {e}")
         return None
@@ -185,11 +423,160 @@ class RedisService:
         try:
             if self.client:
                 self.client.delete(key)
+                self._invalidate([key])
                 return True
         except Exception as e:
             logger.error(f"Failed to cache delete: {e}")
         return False
 
+    def cache_fill(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: int = 300,
+        cacheable: Callable[[Any], bool] = None,
+    ) -> Any:
+        """
+        Cached value of ``key``, computing it with ``compute`` when needed.
+
+        Only one caller per key computes at a time, across threads and
+        worker processes; the others wait for its result, or keep the
+        current value while it is refreshed ahead of expiry. Results that
+        are None, or rejected by ``cacheable``, are returned but not cached.
+        """
+        entry = self._fill_entry(key)
+        if entry is not None and not should_refresh_early(entry, self.fill_beta):
+            return entry["value"]
+
+        # A live entry is refreshed by whoever gets there first; on a miss
+        # everybody queues up behind the one caller that computes
+        with self._fill_locks.hold(key, blocking=entry is None) as held:
+            if not held:
+                return entry["value"]
+            current = self._fill_entry(key)
+            if current is not None and (entry is None or current["expires"] > entry["expires"]):
+                return current["value"]
+
+            token = self._acquire_fill_lock(key)
+            if token is None:
+                if entry is not None:
+                    return entry["value"]
+                current = self._wait_for_fill(key)
+                if current is not None:
+                    return current["value"]
+                # The other process gave up or is too slow: compute anyway
+            try:
+                started = time.monotonic()
+                value = compute()
+                delta = time.monotonic() - started
+                if value is not None and (cacheable is None or cacheable(value)):
+                    self.cache_set(key, {
+                        "value": value,
+                        "delta": round(delta, 4),
+                        "expires": time.time() + ttl,
+                    }, ttl)
+                return value
+            finally:
+                self._release_fill_lock(key, token)
+
+    @property
+    def fill_beta(self) -> float:
+        return getattr(settings, "CACHE_FILL_BETA", 1.0)
+
+    @property
+    def fill_lock_timeout(self) -> float:
+        return getattr(settings, "CACHE_FILL_LOCK_TIMEOUT", 30)
+
+    def _fill_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.cache_get(key)
+        if isinstance(entry, dict) and "value" in entry and "expires" in entry:
+            return entry
+        return None
+
+    def _acquire_fill_lock(self, key: str) -> Optional[str]:
+        """Token of the cross-process fill lock, or None if someone else holds it."""
+        token = uuid.uuid4().hex
+        try:
+            client = self.client
+            if client is None:
+                # Without Redis, in-process single-flight is all there is
+                return token
+            acquired = client.set(
+                f"{key}:fill_lock", token, nx=True, px=int(self.fill_lock_timeout * 1000)
+            )
+            return token if acquired else None
+        except Exception as e:
+            logger.error(f"Failed to take fill lock of {key}: {e}")
+            return token
+
+    def _release_fill_lock(self, key: str, token: Optional[str]) -> None:
+        if token is None:
+            return
+        try:
+            client = self.client
+            # Not atomic, but the lock expires anyway if a stale holder
+            # deletes a successor's lock in between
+            if client is not None and client.get(f"{key}:fill_lock") == token:
+                client.delete(f"{key}:fill_lock")
+        except Exception as e:
+            logger.error(f"Failed to release fill lock of {key}: {e}")
+
+    def _wait_for_fill(self, key: str) -> Optional[Dict[str, Any]]:
+        """Wait for another process to fill ``key``, up to the lock timeout."""
+        deadline = time.monotonic() + self.fill_lock_timeout
+        delay = 0.02
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            entry = self._fill_entry(key)
+            if entry is not None:
+                return entry
+            try:
+                if self.client is None or not self.client.exists(f"{key}:fill_lock"):
+                    return None
+            except Exception:
+                return None
+        return None
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit ratios of the in-process and Redis cache tiers."""
+        with self._stats_lock:
+            lookups = self._redis_hits + self._redis_misses
+            redis_stats = {
+                "hits": self._redis_hits,
+                "misses": self._redis_misses,
+                "hit_ratio": round(self._redis_hits / lookups, 4) if lookups else 0.0,
+            }
+        return {"local": self.local_cache.stats(), "redis": redis_stats}
+
+    def _use_local(self) -> bool:
+        """Whether the in-process tier is on; starts its invalidation listener."""
+        if not self.local_cache.enabled:
+            return False
+        # Other workers only hear about changes through Redis pub/sub
+        if isinstance(self._client, RedisBackend):
+            self._invalidations.start()
+        return True
+
+    def _invalidation_pubsub(self):
+        client = self.client
+        if client is None:
+            raise ConnectionError("Redis is not available")
+        return client.pubsub()
+
+    def _invalidate(self, keys: List[str]) -> None:
+        """Drop keys from this worker's tier and tell the other workers."""
+        self.local_cache.delete(keys)
+        if isinstance(self._client, RedisBackend) and self.local_cache.enabled:
+            self._client.publish(INVALIDATION_CHANNEL, self._invalidations.message(keys))
+
+    def _count_redis_lookup(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self._redis_hits += 1
+            else:
+                self._redis_misses += 1
+
     # ============== Pub/Sub for Real-time ==============
 
     def publish_event(self, channel: str, event: Dict[str, Any]) -> bool:
@@ -202,6 +589,47 @@ class RedisService:
             logger.error(f"Failed to publish event: {e}")
         return False
 
+    def append_event(self, event: Dict[str, Any]) -> Optional[str]:
+        """Append event to the durable event stream and return its entry id.
+
+        If Redis is unreachable the event is spooled and None is returned;
+        the spool replayer appends it once Redis recovers, marked as
+        ``spooled`` so workers date it by its own timestamp.
+        """
+        if not getattr(settings, "EVENT_STREAM_ENABLED", True):
+            return None
+        maxlen = getattr(settings, "EVENT_STREAM_MAXLEN", 1000000)
+        try:
+            if self.client:
+                return self.client.xadd(
+                    EVENT_STREAM_KEY,
+                    {"event": json.dumps(event)},
+                    maxlen=maxlen,
+                    approximate=True,
+                )
+        except Exception as e:
+            logger.error(f"Failed to append event to stream: {e}")
+            self._trip_circuit()
+        self._spool("xadd", EVENT_STREAM_KEY, {"event": json.dumps({**event, "spooled": True})}, maxlen)
+        return None
+
+    def get_time_series(
+        self, metric: str, buckets: List[str], article_id: str = None
+    ) -> Dict[str, int]:
+        """Get derived time series counts for the given buckets."""
+        key = (
+            f"timeseries:{metric}:{article_key(article_id)}"
+            if article_id
+            else f"timeseries:{metric}"
+        )
+        try:
+            if self.client and buckets:
+                values = self.client.hmget(key, buckets)
+                return {b: int(v) if v else 0 for b, v in zip(buckets, values)}
+        except Exception as e:
+            logger.error(f"Failed to get time series {key}: {e}")
+        return {b: 0 for b in buckets}
+
     def subscribe(self, channel: str):
         """Subscribe to a channel."""
         try:
@@ -215,16 +643,37 @@ class RedisService:
 
     # ============== Stats ==============
 
+    def _sum_packed_counters(self, metric: str) -> int:
+        """Sum an article metric across all counter hashes."""
+        suffix = f":{COUNTER_FIELDS[metric]}"
+        total = 0
+        for key in self.client.scan_iter(match="counters:*", count=500):
+            for field, value in self.client.hgetall(key).items():
+                if field.endswith(suffix):
+                    total += int(value)
+        return total
+
+    def _sum_counter_keys(self, pattern: str) -> int:
+        """Sum the string counters matching a key pattern."""
+        # KEYS fans out to every primary in cluster mode
+        keys = self.client.keys(pattern)
+        if self.cluster_mode:
+            # The keys live on many slots: fetch values grouped per slot
+            values = self.client.mget_nonatomic(keys) if keys else []
+            return sum(int(value) for value in values if value)
+        total = 0
+        for key in keys:
+            value = self.client.get(key)
+            total += int(value) if value else 0
+        return total
+
     def get_total_views(self) -> int:
         """Get total views across all articles."""
         try:
             if self.client:
-                keys = self.client.keys("article:*:views")
-                total = 0
-                for key in keys:
-                    value = self.client.get(key)
-                    total += int(value) if value else 0
-                return total
+                if self.counter_layout == "hash":
+                    return self._sum_packed_counters("views")
+                return self._sum_counter_keys("article:*:views")
         except Exception as e:
             logger.error(f"Failed to get total views: {e}")
         return 0
@@ -233,12 +682,9 @@ class RedisService:
         """Get total downloads across all articles."""
         try:
             if self.client:
-                keys = self.client.keys("article:*:downloads")
-                total = 0
-                for key in keys:
-                    value = self.client.get(key)
-                    total += int(value) if value else 0
-                return total
+                if self.counter_layout == "hash":
+                    return self._sum_packed_counters("downloads")
+                return self._sum_counter_keys("article:*:downloads")
         except Exception as e:
             logger.error(f"Failed to get total downloads: {e}")
         return 0
@@ -0,0 +1,61 @@
+"""
+Helpers for ``RedisService.cache_fill``: per-key locks and early refresh.
+
+When a popular entry expires every concurrent request would otherwise miss
+together and recompute it against Matomo or OJS. ``cache_fill`` prevents
+that stampede in two ways:
+
+- single-flight: one caller per key computes a missing value, serialized by
+  a per-key lock within the process and a ``SET NX`` lock in Redis across
+  processes, while the others wait for the result;
+- probabilistic early refresh ("XFetch"): each read of a live entry
+  recomputes it early with a probability that rises as expiry approaches,
+  scaled by how long the value took to compute. The one caller that wins
+  the locks refreshes it; everyone else keeps getting the current value.
+"""
+
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class KeyedLocks:
+    """One lock per key, dropped again once nobody holds or waits on it."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, list] = {}
+
+    @contextmanager
+    def hold(self, key: str, blocking: bool = True) -> Iterator[bool]:
+        """Hold the key's lock; yields False if ``blocking`` is off and it is taken."""
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+def should_refresh_early(entry: Dict[str, Any], beta: float, now: float = None, rand: float = None) -> bool:
+    """
+    Whether to recompute a live entry ahead of its expiry.
+
+    ``entry`` holds ``delta`` (seconds its value took to compute) and
+    ``expires`` (epoch seconds). Larger ``beta`` refreshes earlier; 0 never
+    refreshes early.
+    """
+    now = time.time() if now is None else now
+    # 1 - random() is in (0, 1], so the logarithm is defined
+    rand = 1.0 - random.random() if rand is None else rand
+    return now - entry.get("delta", 0) * beta * math.log(rand) >= entry.get("expires", 0)
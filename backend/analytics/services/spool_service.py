@@ -0,0 +1,283 @@
+"""
+Local write-ahead spool for tracking writes made while Redis is unavailable.
+
+Each process appends the Redis operations it could not apply to its own
+append-only file, one JSON line per operation. Writes are fsynced in batches
+(every N records or T seconds, whichever comes first). A background replayer
+rotates the active spool into a segment and drains segments into Redis with
+pipelines once Redis is reachable again.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, List
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Only additive operations are spooled: replaying them later yields the same
+# totals as applying them at the time of the request. Stream appends are
+# spooled as ``xadd`` so events (and the counters derived from them) are
+# not lost either.
+SPOOLABLE_OPS = {"incrby", "hincrby", "zincrby", "xadd"}
+
+
+class TrackingSpool:
+    """Append-only spool with batched fsync and a bulk replayer."""
+
+    def __init__(
+        self,
+        directory: str = None,
+        fsync_batch: int = None,
+        fsync_interval: float = None,
+        replay_batch: int = 500,
+    ):
+        self.directory = Path(
+            directory or getattr(settings, "TRACKING_SPOOL_DIR", "spool")
+        )
+        self.fsync_batch = fsync_batch or getattr(
+            settings, "TRACKING_SPOOL_FSYNC_BATCH", 100
+        )
+        self.fsync_interval = fsync_interval or getattr(
+            settings, "TRACKING_SPOOL_FSYNC_INTERVAL", 1.0
+        )
+        self.replay_batch = replay_batch
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._replayer = None
+        self._stop = threading.Event()
+
+    @property
+    def active_path(self) -> Path:
+        """Path of this process's active spool file."""
+        return self.directory / f"tracking-{os.getpid()}.spool"
+
+    # ============== Writing ==============
+
+    def append(self, op: str, *args: Any) -> bool:
+        """Append an operation to the spool. Never touches the network."""
+        if op not in SPOOLABLE_OPS:
+            logger.warning(f"Refusing to spool unsupported operation: {op}")
+            return False
+
+        line = json.dumps([op, *args]) + "\n"
+        try:
+            with self._lock:
+                if self._file is None:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    self._file = open(self.active_path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._unsynced += 1
+                if (
+                    self._unsynced >= self.fsync_batch
+                    or time.monotonic() - self._last_sync >= self.fsync_interval
+                ):
+                    self._sync_locked()
+        except OSError as e:
+            logger.error(f"Failed to write tracking spool: {e}")
+            return False
+
+        self.start_replayer()
+        return True
+
+    def flush(self) -> None:
+        """Force buffered records to disk."""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate(self) -> None:
+        """Close the active spool and turn it into a replayable segment."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._sync_locked()
+            self._file.close()
+            self._file = None
+            path = self.active_path
+            if path.exists() and path.stat().st_size:
+                path.rename(
+                    self.directory / f"tracking-{os.getpid()}-{time.time_ns()}.segment"
+                )
+
+    def _adopt_orphans(self) -> None:
+        """Turn spools left behind by dead processes into segments."""
+        for path in self.directory.glob("tracking-*.spool"):
+            try:
+                pid = int(path.stem.split("-", 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            path.rename(path.with_name(f"tracking-{pid}-{time.time_ns()}.segment"))
+
+    def segments(self) -> List[Path]:
+        """Segments waiting to be replayed, oldest first."""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("tracking-*.segment"))
+
+    def has_pending(self) -> bool:
+        """Whether any spooled operations are waiting to be replayed."""
+        if self.segments():
+            return True
+        path = self.active_path
+        return path.exists() and path.stat().st_size > 0
+
+    # ============== Replay ==============
+
+    def replay(self, client) -> int:
+        """
+        Drain all spooled operations into Redis using pipelines.
+
+        Returns the number of operations applied. Delivery is at least
+        once: progress is checkpointed after every pipeline, so an
+        interrupted replay resumes at the last checkpoint, but a batch whose
+        pipeline ran before the interruption and whose checkpoint was not
+        yet written is applied again, so counters and stream events can be
+        duplicated by at most one batch (``replay_batch`` operations) per
+        interruption.
+        """
+        if client is None or not self.directory.exists():
+            return 0
+
+        self._rotate()
+        self._adopt_orphans()
+
+        applied = 0
+        for segment in self.segments():
+            applied += self._replay_segment(client, segment)
+        return applied
+
+    def _replay_segment(self, client, segment: Path) -> int:
+        offset_path = segment.with_suffix(".offset")
+        applied = 0
+        try:
+            handle = open(segment, "rb")
+        except FileNotFoundError:
+            return 0
+
+        with handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another process is already replaying this segment
+                return 0
+            if os.fstat(handle.fileno()).st_nlink == 0:
+                # Drained and removed by another process while we waited
+                return 0
+
+            offset = _read_offset(offset_path)
+            handle.seek(offset)
+            batch = []
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    # Torn final record from a crash mid-write
+                    break
+                batch.append(raw)
+                offset += len(raw)
+                if len(batch) >= self.replay_batch:
+                    self._apply(client, batch)
+                    _write_offset(offset_path, offset)
+                    applied += len(batch)
+                    batch = []
+            if batch:
+                self._apply(client, batch)
+                _write_offset(offset_path, offset)
+                applied += len(batch)
+
+            # Remove while still holding the lock so nobody replays it twice
+            segment.unlink(missing_ok=True)
+            offset_path.unlink(missing_ok=True)
+
+        logger.info(f"Replayed {applied} spooled operations from {segment.name}")
+        return applied
+
+    def _apply(self, client, lines: List[bytes]) -> None:
+        pipe = client.pipeline(transaction=False)
+        for line in lines:
+            try:
+                op, *args = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping corrupt spool record: {line!r}")
+                continue
+            if op == "xadd":
+                key, fields, maxlen = args
+                pipe.xadd(key, fields, maxlen=maxlen, approximate=True)
+            elif op in SPOOLABLE_OPS:
+                getattr(pipe, op)(*args)
+        pipe.execute()
+
+    # ============== Background Replayer ==============
+
+    def start_replayer(self) -> None:
+        """Start the background replayer thread if it is not running."""
+        if self._replayer is not None and self._replayer.is_alive():
+            return
+        with self._lock:
+            if self._replayer is not None and self._replayer.is_alive():
+                return
+            self._stop.clear()
+            self._replayer = threading.Thread(
+                target=self._replay_loop, name="tracking-spool-replayer", daemon=True
+            )
+            self._replayer.start()
+
+    def stop_replayer(self) -> None:
+        """Stop the background replayer thread."""
+        self._stop.set()
+
+    def _replay_loop(self) -> None:
+        from .redis_service import redis_service
+
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.flush()
+                if not self.has_pending():
+                    continue
+                if redis_service.is_connected():
+                    self.replay(redis_service.client)
+            except Exception as e:
+                logger.error(f"Tracking spool replay failed: {e}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_offset(path: Path) -> int:
+    try:
+        return int(path.read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_offset(path: Path, offset: int) -> None:
+    tmp = path.with_suffix(".offset.tmp")
+    tmp.write_text(str(offset))
+    os.replace(tmp, path)
+
+
+# Singleton instance
+tracking_spool = TrackingSpool()
@@ -0,0 +1,996 @@
+"""
+Storage backends behind RedisService.
+
+``StorageBackend`` is the abstract subset of Redis commands the analytics
+services use: string counters, hashes, sorted sets, streams with consumer
+groups, pub/sub and pipelines.
+``RedisBackend`` forwards them to a redis-py client; ``InMemoryBackend``
+implements them in-process for single-node installs and tests, mirroring
+redis-py's ``decode_responses=True`` behaviour (values come back as str).
+Binary values, such as encoded cache entries, are read through ``raw()``,
+a view of the same data whose string and hash replies are bytes.
+"""
+
+import fnmatch
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Stored string values: text, or bytes that are not valid UTF-8
+STRING = (str, bytes)
+
+
+class StorageBackend(ABC):
+    """Interface for the key-value store used by the analytics services."""
+
+    # ============== Connection ==============
+
+    @abstractmethod
+    def ping(self) -> bool:
+        ...
+
+    @abstractmethod
+    def raw(self) -> "StorageBackend":
+        """The same store with undecoded (bytes) replies."""
+
+    # ============== Keys and Strings ==============
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ex: int = None, nx: bool = False, px: int = None):
+        ...
+
+    @abstractmethod
+    def setex(self, key: str, ttl: int, value: Any) -> bool:
+        ...
+
+    @abstractmethod
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        ...
+
+    @abstractmethod
+    def mget_nonatomic(self, keys: List[str]) -> List[Optional[str]]:
+        """MGET of keys that may live in different cluster slots."""
+
+    @abstractmethod
+    def incrby(self, key: str, amount: int = 1) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> int:
+        ...
+
+    @abstractmethod
+    def exists(self, *keys: str) -> int:
+        ...
+
+    @abstractmethod
+    def expire(self, key: str, ttl: int) -> bool:
+        ...
+
+    @abstractmethod
+    def ttl(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def keys(self, pattern: str = "*") -> List[str]:
+        ...
+
+    @abstractmethod
+    def scan_iter(self, match: str = None, count: int = None) -> Iterator[str]:
+        ...
+
+    # ============== Hashes ==============
+
+    @abstractmethod
+    def hget(self, key: str, field: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def hset(self, key: str, field: str = None, value: Any = None, mapping: Dict = None) -> int:
+        ...
+
+    @abstractmethod
+    def hmget(self, key: str, fields: List[str]) -> List[Optional[str]]:
+        ...
+
+    @abstractmethod
+    def hgetall(self, key: str) -> Dict[str, str]:
+        ...
+
+    @abstractmethod
+    def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        ...
+
+    @abstractmethod
+    def hkeys(self, key: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def hlen(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def hdel(self, key: str, *fields: str) -> int:
+        ...
+
+    # ============== Sets ==============
+
+    @abstractmethod
+    def sadd(self, key: str, *members: Any) -> int:
+        ...
+
+    @abstractmethod
+    def srem(self, key: str, *members: Any) -> int:
+        ...
+
+    @abstractmethod
+    def smembers(self, key: str) -> set:
+        ...
+
+    @abstractmethod
+    def sismember(self, key: str, member: Any) -> bool:
+        ...
+
+    @abstractmethod
+    def scard(self, key: str) -> int:
+        ...
+
+    # ============== Sorted Sets ==============
+
+    @abstractmethod
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        ...
+
+    @abstractmethod
+    def zincrby(self, key: str, amount: float, member: str) -> float:
+        ...
+
+    @abstractmethod
+    def zscore(self, key: str, member: str) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def zrem(self, key: str, *members: str) -> int:
+        ...
+
+    @abstractmethod
+    def zcard(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def zcount(self, key: str, min: Any, max: Any) -> int:
+        ...
+
+    @abstractmethod
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False):
+        ...
+
+    @abstractmethod
+    def zrangebyscore(self, key: str, min: Any, max: Any, start: int = None,
+                      num: int = None, withscores: bool = False):
+        ...
+
+    @abstractmethod
+    def zremrangebyrank(self, key: str, start: int, end: int) -> int:
+        ...
+
+    # ============== Streams ==============
+
+    @abstractmethod
+    def xadd(self, key: str, fields: Dict[str, Any], maxlen: int = None,
+             approximate: bool = True) -> str:
+        ...
+
+    @abstractmethod
+    def xrange(self, key: str, min: str = "-", max: str = "+", count: int = None):
+        ...
+
+    @abstractmethod
+    def xgroup_create(self, name: str, groupname: str, id: str = "$",
+                      mkstream: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    def xreadgroup(self, groupname: str, consumername: str, streams: Dict[str, str],
+                   count: int = None, block: int = None, noack: bool = False):
+        ...
+
+    @abstractmethod
+    def xack(self, name: str, groupname: str, *ids: str) -> int:
+        ...
+
+    @abstractmethod
+    def xautoclaim(self, name: str, groupname: str, consumername: str, min_idle_time: int,
+                   start_id: str = "0-0", count: int = None):
+        ...
+
+    # ============== Pub/Sub ==============
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> int:
+        ...
+
+    @abstractmethod
+    def pubsub(self):
+        ...
+
+    # ============== Pipelines ==============
+
+    @abstractmethod
+    def pipeline(self, transaction: bool = True):
+        ...
+
+
+class RedisBackend(StorageBackend):
+    """Backend backed by a redis-py client."""
+
+    def __init__(self, client, raw_factory: Callable[[], Any] = None):
+        self.redis = client
+        # Builds a client without decode_responses for binary values
+        self._raw_factory = raw_factory
+        self._raw = None
+
+    def __getattr__(self, name: str):
+        # Redis-only commands (scripts, INFO, ...)
+        # are passed straight through to the client.
+        return getattr(self.redis, name)
+
+    def ping(self):
+        return self.redis.ping()
+
+    def raw(self):
+        if self._raw_factory is None:
+            return self
+        if self._raw is None:
+            self._raw = RedisBackend(self._raw_factory())
+        return self._raw
+
+    def get(self, key):
+        return self.redis.get(key)
+
+    def set(self, key, value, ex=None, nx=False, px=None):
+        return self.redis.set(key, value, ex=ex, nx=nx, px=px)
+
+    def setex(self, key, ttl, value):
+        return self.redis.setex(key, ttl, value)
+
+    def mget(self, keys):
+        return self.redis.mget(keys)
+
+    def mget_nonatomic(self, keys):
+        # Only RedisCluster splits MGET per slot; a single node takes one MGET
+        mget = getattr(self.redis, "mget_nonatomic", self.redis.mget)
+        return mget(keys)
+
+    def incrby(self, key, amount=1):
+        return self.redis.incrby(key, amount)
+
+    def delete(self, *keys):
+        return self.redis.delete(*keys)
+
+    def exists(self, *keys):
+        return self.redis.exists(*keys)
+
+    def expire(self, key, ttl):
+        return self.redis.expire(key, ttl)
+
+    def ttl(self, key):
+        return self.redis.ttl(key)
+
+    def keys(self, pattern="*"):
+        return self.redis.keys(pattern)
+
+    def scan_iter(self, match=None, count=None):
+        return self.redis.scan_iter(match=match, count=count)
+
+    def hget(self, key, field):
+        return self.redis.hget(key, field)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        return self.redis.hset(key, field, value, mapping=mapping)
+
+    def hmget(self, key, fields):
+        return self.redis.hmget(key, fields)
+
+    def hgetall(self, key):
+        return self.redis.hgetall(key)
+
+    def hincrby(self, key, field, amount=1):
+        return self.redis.hincrby(key, field, amount)
+
+    def hkeys(self, key):
+        return self.redis.hkeys(key)
+
+    def hlen(self, key):
+        return self.redis.hlen(key)
+
+    def hdel(self, key, *fields):
+        return self.redis.hdel(key, *fields)
+
+    def sadd(self, key, *members):
+        return self.redis.sadd(key, *members)
+
+    def srem(self, key, *members):
+        return self.redis.srem(key, *members)
+
+    def smembers(self, key):
+        return self.redis.smembers(key)
+
+    def sismember(self, key, member):
+        return self.redis.sismember(key, member)
+
+    def scard(self, key):
+        return self.redis.scard(key)
+
+    def zadd(self, key, mapping):
+        return self.redis.zadd(key, mapping)
+
+    def zincrby(self, key, amount, member):
+        return self.redis.zincrby(key, amount, member)
+
+    def zscore(self, key, member):
+        return self.redis.zscore(key, member)
+
+    def zrem(self, key, *members):
+        return self.redis.zrem(key, *members)
+
+    def zcard(self, key):
+        return self.redis.zcard(key)
+
+    def zcount(self, key, min, max):
+        return self.redis.zcount(key, min, max)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        return self.redis.zrevrange(key, start, end, withscores=withscores)
+
+    def zrangebyscore(self, key, min, max, start=None, num=None, withscores=False):
+        return self.redis.zrangebyscore(
+            key, min, max, start=start, num=num, withscores=withscores
+        )
+
+    def zremrangebyrank(self, key, start, end):
+        return self.redis.zremrangebyrank(key, start, end)
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        return self.redis.xadd(key, fields, maxlen=maxlen, approximate=approximate)
+
+    def xrange(self, key, min="-", max="+", count=None):
+        return self.redis.xrange(key, min=min, max=max, count=count)
+
+    def xgroup_create(self, name, groupname, id="$", mkstream=False):
+        return self.redis.xgroup_create(name, groupname, id=id, mkstream=mkstream)
+
+    def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        return self.redis.xreadgroup(
+            groupname, consumername, streams, count=count, block=block, noack=noack
+        )
+
+    def xack(self, name, groupname, *ids):
+        return self.redis.xack(name, groupname, *ids)
+
+    def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id="0-0", count=None):
+        return self.redis.xautoclaim(
+            name, groupname, consumername, min_idle_time, start_id=start_id, count=count
+        )
+
+    def publish(self, channel, message):
+        return self.redis.publish(channel, message)
+
+    def pubsub(self):
+        return self.redis.pubsub()
+
+    def pipeline(self, transaction=True):
+        return self.redis.pipeline(transaction=transaction)
+
+
+class InMemoryBackend(StorageBackend):
+    """
+    Thread-safe in-process backend with TTL support.
+
+    Data lives only as long as the process, and is not shared between
+    workers; it suits single-process installs and tests.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._subscribers: Dict[str, List["InMemoryPubSub"]] = {}
+        self._last_stream_ms = 0
+        self._stream_seq = 0
+        # Wakes XREADGROUP calls blocked on new entries
+        self._stream_added = threading.Condition(self._lock)
+
+    # ============== Internals ==============
+
+    def _alive(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            return False
+        return key in self._data
+
+    def _read(self, key: str, kind: type, default=None):
+        if not self._alive(key):
+            return default
+        value = self._data[key]
+        if not isinstance(value, kind):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _write(self, key: str, kind: type):
+        value = self._read(key, kind)
+        if value is None:
+            value = self._data[key] = kind()
+        return value
+
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        if isinstance(value, bytes):
+            try:
+                return value.decode()
+            except UnicodeDecodeError:
+                # Binary values are kept as bytes
+                return value
+        if isinstance(value, float):
+            return repr(value)
+        return str(value)
+
+    # ============== Connection ==============
+
+    def ping(self):
+        return True
+
+    def raw(self):
+        return InMemoryRawView(self)
+
+    # ============== Keys and Strings ==============
+
+    def get(self, key):
+        with self._lock:
+            return self._read(key, STRING)
+
+    def set(self, key, value, ex=None, nx=False, px=None):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = self._encode(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + ex
+            elif px is not None:
+                self._expires[key] = time.monotonic() + px / 1000
+            return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._read(key, STRING) for key in keys]
+
+    def mget_nonatomic(self, keys):
+        return self.mget(keys)
+
+    def incrby(self, key, amount=1):
+        with self._lock:
+            value = int(self._read(key, str, "0")) + int(amount)
+            self._data[key] = str(value)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key, ttl):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + ttl
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            if not self._alive(key):
+                return -2
+            expires = self._expires.get(key)
+            if expires is None:
+                return -1
+            return max(0, int(round(expires - time.monotonic())))
+
+    def keys(self, pattern="*"):
+        with self._lock:
+            return [
+                key for key in list(self._data)
+                if self._alive(key) and fnmatch.fnmatchcase(key, pattern)
+            ]
+
+    def scan_iter(self, match=None, count=None):
+        return iter(self.keys(match or "*"))
+
+    # ============== Hashes ==============
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._read(key, dict, {}).get(str(field))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            data = self._write(key, dict)
+            added = 0
+            for f, v in items.items():
+                added += str(f) not in data
+                data[str(f)] = self._encode(v)
+            return added
+
+    def hmget(self, key, fields):
+        with self._lock:
+            data = self._read(key, dict, {})
+            return [data.get(str(f)) for f in fields]
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._read(key, dict, {}))
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            data = self._write(key, dict)
+            value = int(data.get(str(field), 0)) + int(amount)
+            data[str(field)] = str(value)
+            return value
+
+    def hkeys(self, key):
+        with self._lock:
+            return list(self._read(key, dict, {}))
+
+    def hlen(self, key):
+        with self._lock:
+            return len(self._read(key, dict, {}))
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            data = self._read(key, dict, {})
+            removed = sum(1 for f in fields if data.pop(str(f), None) is not None)
+            if not data:
+                self._data.pop(key, None)
+            return removed
+
+    # ============== Sets ==============
+
+    def sadd(self, key, *members):
+        with self._lock:
+            data = self._write(key, set)
+            before = len(data)
+            data.update(self._encode(m) for m in members)
+            return len(data) - before
+
+    def srem(self, key, *members):
+        with self._lock:
+            data = self._read(key, set, set())
+            before = len(data)
+            data.difference_update(self._encode(m) for m in members)
+            if not data:
+                self._data.pop(key, None)
+            return before - len(data)
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._read(key, set, set()))
+
+    def sismember(self, key, member):
+        with self._lock:
+            return self._encode(member) in self._read(key, set, set())
+
+    def scard(self, key):
+        with self._lock:
+            return len(self._read(key, set, set()))
+
+    # ============== Sorted Sets ==============
+
+    @staticmethod
+    def _score_bound(bound: Any) -> Tuple[float, bool]:
+        """Parse a ZRANGEBYSCORE bound into (value, exclusive)."""
+        if isinstance(bound, str) and bound.startswith("("):
+            return float(bound[1:]), True
+        return float(bound), False
+
+    def _ascending(self, key: str) -> List[Tuple[str, float]]:
+        data = self._read(key, ZSet, ZSet())
+        return sorted(data.items(), key=lambda item: (item[1], item[0]))
+
+    def _in_range(self, score: float, min: Any, max: Any) -> bool:
+        low, low_exclusive = self._score_bound(min)
+        high, high_exclusive = self._score_bound(max)
+        above = score > low if low_exclusive else score >= low
+        below = score < high if high_exclusive else score <= high
+        return above and below
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            data = self._write(key, ZSet)
+            added = 0
+            for member, score in mapping.items():
+                member = self._encode(member)
+                added += member not in data
+                data[member] = float(score)
+            return added
+
+    def zincrby(self, key, amount, member):
+        with self._lock:
+            data = self._write(key, ZSet)
+            member = self._encode(member)
+            data[member] = data.get(member, 0.0) + float(amount)
+            return data[member]
+
+    def zscore(self, key, member):
+        with self._lock:
+            return self._read(key, ZSet, ZSet()).get(self._encode(member))
+
+    def zrem(self, key, *members):
+        with self._lock:
+            data = self._read(key, ZSet, ZSet())
+            removed = sum(1 for m in members if data.pop(self._encode(m), None) is not None)
+            if not data:
+                self._data.pop(key, None)
+            return removed
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._read(key, ZSet, ZSet()))
+
+    def zcount(self, key, min, max):
+        with self._lock:
+            return sum(
+                1 for score in self._read(key, ZSet, ZSet()).values()
+                if self._in_range(score, min, max)
+            )
+
+    def zrevrange(self, key, start, end, withscores=False):
+        with self._lock:
+            items = list(reversed(self._ascending(key)))
+        items = _slice_inclusive(items, start, end)
+        return items if withscores else [member for member, _ in items]
+
+    def zrangebyscore(self, key, min, max, start=None, num=None, withscores=False):
+        with self._lock:
+            items = [item for item in self._ascending(key) if self._in_range(item[1], min, max)]
+        if start is not None and num is not None:
+            items = items[start:start + num] if num >= 0 else items[start:]
+        return items if withscores else [member for member, _ in items]
+
+    def zremrangebyrank(self, key, start, end):
+        with self._lock:
+            doomed = _slice_inclusive(self._ascending(key), start, end)
+            data = self._read(key, ZSet, ZSet())
+            for member, _ in doomed:
+                data.pop(member, None)
+            if not data:
+                self._data.pop(key, None)
+            return len(doomed)
+
+    # ============== Streams ==============
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        with self._lock:
+            entries = self._write(key, Stream)
+            now_ms = int(time.time() * 1000)
+            if now_ms <= self._last_stream_ms:
+                self._stream_seq += 1
+            else:
+                self._last_stream_ms, self._stream_seq = now_ms, 0
+            entry_id = f"{self._last_stream_ms}-{self._stream_seq}"
+            entries.append((entry_id, {str(k): self._encode(v) for k, v in fields.items()}))
+            if maxlen is not None and len(entries) > maxlen:
+                del entries[:len(entries) - maxlen]
+            self._stream_added.notify_all()
+            return entry_id
+
+    def xrange(self, key, min="-", max="+", count=None):
+        low_exclusive = min.startswith("(")
+        low = _stream_id(min.lstrip("("), default=(0, 0))
+        high = _stream_id(max, default=(float("inf"), float("inf")))
+        with self._lock:
+            entries = list(self._read(key, Stream, Stream()))
+        result = []
+        for entry_id, fields in entries:
+            current = _stream_id(entry_id)
+            if current < low or (low_exclusive and current == low) or current > high:
+                continue
+            result.append((entry_id, dict(fields)))
+            if count is not None and len(result) >= count:
+                break
+        return result
+
+    def _group(self, name: str, groupname: str) -> "StreamGroup":
+        group = self._read(name, Stream, Stream()).groups.get(groupname)
+        if group is None:
+            raise ValueError(f"NOGROUP No such key '{name}' or consumer group '{groupname}'")
+        return group
+
+    def xgroup_create(self, name, groupname, id="$", mkstream=False):
+        with self._lock:
+            entries = self._read(name, Stream)
+            if entries is None:
+                if not mkstream:
+                    raise ValueError("The XGROUP subcommand requires the key to exist")
+                entries = self._write(name, Stream)
+            if groupname in entries.groups:
+                raise ValueError("BUSYGROUP Consumer Group name already exists")
+            if id == "$":
+                id = entries[-1][0] if entries else "0-0"
+            entries.groups[groupname] = StreamGroup(id)
+            return True
+
+    def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        deadline = None if block is None else time.monotonic() + block / 1000
+        with self._lock:
+            while True:
+                response = []
+                for name, last_id in streams.items():
+                    delivered = self._deliver(name, groupname, consumername, last_id, count, noack)
+                    if delivered or last_id != ">":
+                        response.append([name, delivered])
+                found = any(entries for _, entries in response)
+                # Like Redis, only reads of new entries (">") block
+                if found or deadline is None or ">" not in streams.values():
+                    return response
+                remaining = deadline - time.monotonic()
+                if block and remaining <= 0:
+                    return response
+                self._stream_added.wait(remaining if block else None)
+
+    def _deliver(self, name, groupname, consumername, last_id, count, noack):
+        group = self._group(name, groupname)
+        entries = self._read(name, Stream, Stream())
+        if last_id != ">":
+            # History of this consumer: its pending entries after last_id
+            after = _stream_id(last_id)
+            ids = {
+                entry_id for entry_id, (consumer, _, _) in group.pending.items()
+                if consumer == consumername and _stream_id(entry_id) > after
+            }
+            found = [(entry_id, dict(fields)) for entry_id, fields in entries if entry_id in ids]
+            return found[:count] if count else found
+        after = _stream_id(group.last_id)
+        delivered = []
+        now_ms = int(time.time() * 1000)
+        for entry_id, fields in entries:
+            if _stream_id(entry_id) <= after:
+                continue
+            delivered.append((entry_id, dict(fields)))
+            group.last_id = entry_id
+            if not noack:
+                group.pending[entry_id] = [consumername, now_ms, 1]
+            if count and len(delivered) >= count:
+                break
+        return delivered
+
+    def xack(self, name, groupname, *ids):
+        with self._lock:
+            group = self._group(name, groupname)
+            return sum(1 for entry_id in ids if group.pending.pop(entry_id, None) is not None)
+
+    def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id="0-0", count=None):
+        count = count or 100
+        with self._lock:
+            group = self._group(name, groupname)
+            fields_by_id = dict(self._read(name, Stream, Stream()))
+            start = _stream_id(start_id)
+            candidates = sorted(
+                (entry_id for entry_id in group.pending if _stream_id(entry_id) >= start),
+                key=_stream_id,
+            )
+            now_ms = int(time.time() * 1000)
+            claimed, deleted, next_id = [], [], "0-0"
+            for entry_id in candidates:
+                if len(claimed) + len(deleted) >= count:
+                    next_id = entry_id
+                    break
+                _, delivered_ms, deliveries = group.pending[entry_id]
+                if now_ms - delivered_ms < min_idle_time:
+                    continue
+                if entry_id not in fields_by_id:
+                    # Trimmed from the stream: dropped from the PEL, as Redis 7 does
+                    del group.pending[entry_id]
+                    deleted.append(entry_id)
+                    continue
+                group.pending[entry_id] = [consumername, now_ms, deliveries + 1]
+                claimed.append((entry_id, dict(fields_by_id[entry_id])))
+            return [next_id, claimed, deleted]
+
+    # ============== Pub/Sub ==============
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, []))
+        for subscriber in subscribers:
+            subscriber._deliver(channel, self._encode(message))
+        return len(subscribers)
+
+    def pubsub(self):
+        return InMemoryPubSub(self)
+
+    # ============== Pipelines ==============
+
+    def pipeline(self, transaction=True):
+        return InMemoryPipeline(self)
+
+
+class ZSet(dict):
+    """Sorted set storage: member -> score."""
+
+
+class Stream(list):
+    """Stream storage: list of (entry id, fields) and its consumer groups."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.groups: Dict[str, StreamGroup] = {}
+
+
+class StreamGroup:
+    """Consumer group state: last delivered id and pending entries."""
+
+    def __init__(self, last_id: str):
+        self.last_id = last_id
+        # entry id -> [consumer, delivery time (ms), delivery count]
+        self.pending: Dict[str, list] = {}
+
+
+def _slice_inclusive(items: List, start: int, end: int) -> List:
+    """Apply Redis-style inclusive start/end indices (negative from the end)."""
+    size = len(items)
+    if start < 0:
+        start = max(size + start, 0)
+    if end < 0:
+        end = size + end
+    if start > end or start >= size:
+        return []
+    return items[start:end + 1]
+
+
+def _stream_id(value: str, default: Tuple = (0, 0)) -> Tuple:
+    if value in ("-", "+"):
+        return default
+    millis, _, seq = value.partition("-")
+    return (int(millis), int(seq) if seq else 0)
+
+
+class InMemoryRawView:
+    """An in-memory backend whose string and hash replies are bytes."""
+
+    def __init__(self, backend: InMemoryBackend):
+        self._backend = backend
+
+    def __getattr__(self, name: str):
+        return getattr(self._backend, name)
+
+    @staticmethod
+    def _bytes(value: Any) -> Optional[bytes]:
+        return value.encode() if isinstance(value, str) else value
+
+    def raw(self):
+        return self
+
+    def get(self, key):
+        return self._bytes(self._backend.get(key))
+
+    def mget(self, keys):
+        return [self._bytes(value) for value in self._backend.mget(keys)]
+
+    def hget(self, key, field):
+        return self._bytes(self._backend.hget(key, field))
+
+    def hmget(self, key, fields):
+        return [self._bytes(value) for value in self._backend.hmget(key, fields)]
+
+    def hgetall(self, key):
+        return {
+            field.encode(): self._bytes(value)
+            for field, value in self._backend.hgetall(key).items()
+        }
+
+    def smembers(self, key):
+        return {self._bytes(member) for member in self._backend.smembers(key)}
+
+    def pipeline(self, transaction=True):
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline:
+    """Buffers commands and applies them together, like a Redis pipeline."""
+
+    def __init__(self, backend: InMemoryBackend):
+        self._backend = backend
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        if not hasattr(self._backend, name):
+            raise AttributeError(name)
+
+        def queue_command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue_command
+
+    def execute(self) -> List[Any]:
+        with self._backend._lock:
+            results = [
+                getattr(self._backend, name)(*args, **kwargs)
+                for name, args, kwargs in self._commands
+            ]
+        self._commands = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._commands = []
+
+
+class InMemoryPubSub:
+    """In-process subscription to InMemoryBackend channels."""
+
+    def __init__(self, backend: InMemoryBackend):
+        self._backend = backend
+        self._channels: List[str] = []
+        self._messages: "queue.Queue" = queue.Queue()
+
+    def _deliver(self, channel: str, data: str) -> None:
+        self._messages.put({"type": "message", "channel": channel, "data": data, "pattern": None})
+
+    def subscribe(self, *channels: str) -> None:
+        with self._backend._lock:
+            for channel in channels:
+                self._backend._subscribers.setdefault(channel, []).append(self)
+                self._channels.append(channel)
+                self._messages.put({"type": "subscribe", "channel": channel, "data": 1, "pattern": None})
+
+    def unsubscribe(self, *channels: str) -> None:
+        with self._backend._lock:
+            for channel in channels or list(self._channels):
+                subscribers = self._backend._subscribers.get(channel, [])
+                if self in subscribers:
+                    subscribers.remove(self)
+                if channel in self._channels:
+                    self._channels.remove(channel)
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        while True:
+            try:
+                message = self._messages.get(timeout=timeout) if timeout else self._messages.get_nowait()
+            except queue.Empty:
+                return None
+            if ignore_subscribe_messages and message["type"] != "message":
+                continue
+            return message
+
+    def listen(self):
+        while True:
+            yield self._messages.get()
+
+    def close(self) -> None:
+        self.unsubscribe()
@@ -0,0 +1,275 @@
+"""
+Canonical works for article titles.
+
+The same paper shows up under slightly different titles: OJS titles carry
+HTML markup and entities, case and punctuation vary between journals, and
+one work may be indexed in several of them. Citation lookups are keyed by
+the canonical work instead of the raw title so each work is paid for once.
+
+Titles are normalized (entities decoded, tags stripped, accents folded,
+case-folded, punctuation removed) and fingerprinted; equal fingerprints are
+the same work. Near-duplicates are found with MinHash signatures over
+character shingles, bucketed by locality-sensitive hashing so a lookup only
+compares against works sharing a band, and accepted above
+TITLE_SIMILARITY_THRESHOLD estimated Jaccard similarity. A near-duplicate
+is still a different paper when the titles differ in a number, year or
+roman numeral ("Part I" and "Part II"), or when the first authors differ,
+so such matches are never merged. First authors are checked on exact
+fingerprint matches too: generic titles ("Editorial") by different authors
+get a work each, keyed by the fingerprint scoped to the author's surname.
+"""
+
+import hashlib
+import html
+import logging
+import random
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+# Normalized title fingerprint -> work id
+FINGERPRINT_PREFIX = "works:fp"
+# work id -> MinHash signature
+SIGNATURES_KEY = "works:signatures"
+# work id -> normalized title the work was created from
+TITLES_KEY = "works:titles"
+# work id -> normalized surname of the first author, where known
+AUTHORS_KEY = "works:authors"
+# article id -> work id
+ARTICLE_WORKS_KEY = "works:articles"
+# works:lsh:<band>:<band hash> -> work ids
+LSH_PREFIX = "works:lsh"
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures must agree across processes and restarts
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_TAGS = re.compile(r"<[^>]+>")
+_NON_WORD = re.compile(r"[\W_]+")
+# Tokens telling apart otherwise identical titles: numbers, years and small
+# roman numerals as used for parts and volumes
+_DISTINGUISHING = re.compile(r"^(\d+|[ivx]{1,5})$")
+
+
+def normalize_title(title: str) -> str:
+    """Canonical form of a title for comparison."""
+    text = _TAGS.sub(" ", html.unescape(title or ""))
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+
+def title_fingerprint(title: str) -> Optional[str]:
+    """Fingerprint of a title's normalized form; None for empty titles."""
+    normalized = normalize_title(title)
+    if not normalized:
+        return None
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def distinguishing_tokens(normalized: str) -> List[str]:
+    """Numbers, years and roman numerals of a normalized title."""
+    return sorted(token for token in normalized.split() if _DISTINGUISHING.match(token))
+
+
+def author_surname(author: Optional[str]) -> str:
+    """Normalized surname of an author name; empty when unknown."""
+    tokens = normalize_title(author or "").split()
+    return tokens[-1] if tokens else ""
+
+
+def author_fingerprint(fingerprint: str, surname: str) -> str:
+    """Fingerprint of a title scoped to its first author's surname."""
+    return hashlib.sha1(f"{fingerprint}:{surname}".encode()).hexdigest()[:16]
+
+
+def minhash(normalized: str) -> List[int]:
+    """MinHash signature of a normalized title's character shingles."""
+    padded = f" {normalized} "
+    shingles = {
+        zlib.crc32(padded[i:i + SHINGLE_SIZE].encode())
+        for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))
+    }
+    return [
+        min(((a * value + b) % _PRIME) & _MAX_HASH for value in shingles)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(signature: List[int], other: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def _band_keys(signature: List[int]) -> List[str]:
+    keys = []
+    for band in range(BANDS):
+        rows = ",".join(map(str, signature[band * ROWS:(band + 1) * ROWS]))
+        keys.append(f"{LSH_PREFIX}:{band}:{hashlib.sha1(rows.encode()).hexdigest()[:12]}")
+    return keys
+
+
+def work_articles_key(work_id: str) -> str:
+    return f"works:{work_id}:articles"
+
+
+class TitleIndex:
+    """Maps titles and articles to canonical works."""
+
+    @property
+    def threshold(self) -> float:
+        return getattr(settings, "TITLE_SIMILARITY_THRESHOLD", 0.8)
+
+    def find(self, title: str, author: str = None) -> Optional[str]:
+        """Work id of a title already indexed, or None."""
+        fingerprint = title_fingerprint(title)
+        client = redis_service.client
+        if fingerprint is None or client is None:
+            return None
+        try:
+            surname = author_surname(author)
+            _, work_id = self._lookup(client, fingerprint, surname)
+            if work_id:
+                return work_id
+            return self._find_similar(normalize_title(title), surname)
+        except Exception as e:
+            logger.error(f"Failed to look up title: {e}")
+            return None
+
+    def resolve(self, title: str, article_id: str = None, author: str = None) -> Optional[str]:
+        """
+        Work id for a title, creating the work if none matches.
+
+        The article, if given, is linked to the work, and moved off the
+        work it was linked to before if its title changed. ``author`` is
+        the first author, used to keep apart different papers with similar
+        titles. Without Redis the fingerprint itself is returned, so exact
+        duplicates still match.
+        """
+        fingerprint = title_fingerprint(title)
+        client = redis_service.client
+        if fingerprint is None or client is None:
+            return fingerprint
+
+        try:
+            surname = author_surname(author)
+            fingerprint, work_id = self._lookup(client, fingerprint, surname)
+            if not work_id:
+                fingerprint_key = f"{FINGERPRINT_PREFIX}:{fingerprint}"
+                normalized = normalize_title(title)
+                candidate = self._find_similar(normalized, surname) or fingerprint
+                # First writer wins if two workers see the same new title
+                client.set(fingerprint_key, candidate, nx=True)
+                work_id = client.get(fingerprint_key)
+                if work_id == fingerprint and candidate == fingerprint:
+                    self._add_work(fingerprint, normalized, surname)
+
+            if article_id is not None:
+                self._link(client, str(article_id), work_id)
+            return work_id
+        except Exception as e:
+            logger.error(f"Failed to resolve title: {e}")
+            return fingerprint
+
+    def articles(self, work_id: str) -> List[str]:
+        """Ids of the articles linked to a work."""
+        try:
+            if redis_service.client is not None:
+                return sorted(redis_service.client.smembers(work_articles_key(work_id)))
+        except Exception as e:
+            logger.error(f"Failed to get articles of work {work_id}: {e}")
+        return []
+
+    def article_works(self) -> Dict[str, str]:
+        """Every linked article id with its work id."""
+        try:
+            if redis_service.client is not None:
+                return redis_service.client.hgetall(ARTICLE_WORKS_KEY)
+        except Exception as e:
+            logger.error(f"Failed to get article works: {e}")
+        return {}
+
+    def _link(self, client, article_id: str, work_id: str) -> None:
+        previous = client.hget(ARTICLE_WORKS_KEY, article_id)
+        pipe = client.pipeline(transaction=False)
+        if previous and previous != work_id:
+            # Retitled in OJS: the article no longer belongs to its old work
+            pipe.srem(work_articles_key(previous), article_id)
+        pipe.hset(ARTICLE_WORKS_KEY, article_id, work_id)
+        pipe.sadd(work_articles_key(work_id), article_id)
+        pipe.execute()
+
+    def _lookup(self, client, fingerprint: str, surname: str):
+        """
+        Fingerprint and work id of an exact title match by the same author.
+
+        When the title's work belongs to another first author, the
+        author-scoped fingerprint is looked up instead; its work id is None
+        if that author has no work with this title yet.
+        """
+        work_id = client.get(f"{FINGERPRINT_PREFIX}:{fingerprint}")
+        if not work_id or not surname:
+            return fingerprint, work_id
+        other_surname = client.hget(AUTHORS_KEY, work_id)
+        if not other_surname or other_surname == surname:
+            return fingerprint, work_id
+        fingerprint = author_fingerprint(fingerprint, surname)
+        return fingerprint, client.get(f"{FINGERPRINT_PREFIX}:{fingerprint}")
+
+    def _find_similar(self, normalized: str, surname: str = "") -> Optional[str]:
+        client = redis_service.client
+        signature = minhash(normalized)
+        pipe = client.pipeline(transaction=False)
+        for key in _band_keys(signature):
+            pipe.smembers(key)
+        candidates = sorted(set().union(*pipe.execute()))
+        if not candidates:
+            return None
+
+        pipe = client.pipeline(transaction=False)
+        pipe.hmget(SIGNATURES_KEY, candidates)
+        pipe.hmget(TITLES_KEY, candidates)
+        pipe.hmget(AUTHORS_KEY, candidates)
+        signatures, titles, authors = pipe.execute()
+
+        tokens = distinguishing_tokens(normalized)
+        best, best_score = None, self.threshold
+        for work_id, raw, title, other_surname in zip(candidates, signatures, titles, authors):
+            # Works without a stored title cannot be checked: never merge them
+            if not raw or not title or distinguishing_tokens(title) != tokens:
+                continue
+            if surname and other_surname and surname != other_surname:
+                continue
+            score = similarity(signature, [int(v) for v in raw.split(",")])
+            if score >= best_score:
+                best, best_score = work_id, score
+        return best
+
+    def _add_work(self, work_id: str, normalized: str, surname: str = "") -> None:
+        signature = minhash(normalized)
+        pipe = redis_service.client.pipeline(transaction=False)
+        pipe.hset(SIGNATURES_KEY, work_id, ",".join(map(str, signature)))
+        pipe.hset(TITLES_KEY, work_id, normalized)
+        if surname:
+            pipe.hset(AUTHORS_KEY, work_id, surname)
+        for key in _band_keys(signature):
+            pipe.sadd(key, work_id)
+        pipe.execute()
+
+
+# Singleton instance
+title_index = TitleIndex()
@@ -0,0 +1,16 @@
+"""
+Shared fixtures for the analytics tests.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def memory_service():
+    """RedisService running on the in-process backend."""
+    from analytics.services.redis_service import RedisService
+    from analytics.services.storage_backends import InMemoryBackend
+
+    service = RedisService()
+    service._client = InMemoryBackend()
+    return service
@@ -220,3 +220,59 @@ class TestMatomoService:
             result = service.get_realtime_count()
 
             assert result == 15
+
+    @responses.activate
+    def test_get_article_metrics_bulk(self):
+        """Test article metrics for several pages come from one bulk request."""
+        from urllib.parse import parse_qs
+        from analytics.services.matomo_service import MatomoService
+
+        responses.add(
+            responses.POST,
+            "http://matomo:8085/index.php",
+            json=[[{"nb_hits": 4}], []],
+            status=200,
+        )
+
+        with patch('analytics.services.matomo_service.settings') as mock_settings:
+            mock_settings.MATOMO_TOKEN = "test_token"
+            mock_settings.MATOMO_BASE_URL = "http://matomo:8085/index.php"
+            mock_settings.MATOMO_SITE_ID = 1
+
+            service = MatomoService()
+            result = service.get_article_metrics_bulk(["/article/1", "/article/2"], "day", "today")
+
+            assert result == [[{"nb_hits": 4}], []]
+            assert len(responses.calls) == 1
+            body = parse_qs(responses.calls[0].request.body)
+            assert body["method"] == ["API.getBulkRequest"]
+            assert parse_qs(body["urls[1]"][0])["pageUrl"] == ["/article/2"]
+
+    @responses.activate
+    def test_report_slices_share_one_request(self, memory_service):
+        """Test different limits, offsets and sorts reuse one cached report."""
+        from analytics.services.matomo_service import MatomoService
+
+        rows = [{"label": f"Article {i}", "nb_hits": i * 10, "nb_visits": 100 - i} for i in range(1, 31)]
+        responses.add(responses.POST, "http://matomo:8085/index.php", json=rows, status=200)
+
+        with patch('analytics.services.matomo_service.settings') as mock_settings, \
+                patch('analytics.services.matomo_service.redis_service', memory_service):
+            mock_settings.MATOMO_TOKEN = "test_token"
+            mock_settings.MATOMO_BASE_URL = "http://matomo:8085/index.php"
+            mock_settings.MATOMO_SITE_ID = 1
+            mock_settings.MATOMO_CACHE_TTL = 300
+            mock_settings.MATOMO_REPORT_MAX_ROWS = 500
+
+            service = MatomoService()
+            top10 = service.get_top_articles("week", "today", 10)
+            page2 = service.get_top_articles("week", "today", 10, offset=10)
+            by_hits = service.get_top_articles("week", "today", 3, sort="nb_hits")
+            ascending = service.get_top_articles("week", "today", 2, sort="nb_hits", order="asc")
+
+        assert len(responses.calls) == 1
+        assert "filter_limit=500" in responses.calls[0].request.body
+        assert [r["label"] for r in top10] == [f"Article {i}" for i in range(1, 11)]
+        assert page2[0]["label"] == "Article 11"
+        assert [r["nb_hits"] for r in by_hits] == [300, 290, 280]
+        assert [r["nb_hits"] for r in ascending] == [10, 20]
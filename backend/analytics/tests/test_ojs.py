@@ -0,0 +1,519 @@
+"""
+Tests for OJS service and catalog mirror.
+"""
+
+import json
+import time
+import pytest
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs, urlparse
+import responses
+
+SUBMISSIONS_URL = "http://ojs:8080/index.php/jp/api/v1/submissions"
+
+
+def _article(article_id, modified, published="2024-01-01", author="Ada Lovelace"):
+    return {
+        "id": article_id,
+        "title": {"en": f"Article {article_id}"},
+        "lastModified": modified,
+        "datePublished": published,
+        "authors": [{"fullName": author, "orcid": ""}],
+    }
+
+
+def _collection(*items, error=None):
+    """Generator standing in for OJSService.iter_collection."""
+    def generate(*args, **kwargs):
+        yield from items
+        if error:
+            raise error
+    return generate
+
+
+def _paged_callback(total, page_size, fail_page=None):
+    """responses callback serving ``total`` items in pages of ``page_size``."""
+    def callback(request):
+        page = int(parse_qs(urlparse(request.url).query)["page"][0])
+        if page == fail_page:
+            return (500, {}, "")
+        start = (page - 1) * page_size
+        items = [{"id": i} for i in range(start, min(start + page_size, total))]
+        return (200, {}, json.dumps({"itemsMax": total, "items": items}))
+    return callback
+
+
+@pytest.fixture
+def ojs():
+    """OJSService pointed at a fake OJS."""
+    from analytics.services.ojs_service import OJSService
+
+    with patch('analytics.services.ojs_service.settings') as mock_settings:
+        mock_settings.OJS_BASE_URL = "http://ojs:8080"
+        mock_settings.OJS_API_KEY = "token"
+        mock_settings.OJS_MAX_CONCURRENCY = 3
+        mock_settings.OJS_CONDITIONAL_CACHE_SIZE = 16
+        mock_settings.OJS_CONDITIONAL_CACHE_BYTES = 4096
+        mock_settings.OJS_JOURNALS = [{"path": "jp", "id": 1}]
+        yield OJSService()
+
+
+class TestOJSService:
+    """Tests for OJSService pagination."""
+
+    @responses.activate
+    def test_iter_collection_fetches_every_page(self, ojs):
+        """Test all pages are fetched and items come back in page order."""
+        responses.add_callback(
+            responses.GET, SUBMISSIONS_URL, callback=_paged_callback(250, 100)
+        )
+
+        items = list(ojs.iter_submissions("jp", status="published"))
+
+        assert [item["id"] for item in items] == list(range(250))
+        assert len(responses.calls) == 3
+        assert "status=published" in responses.calls[0].request.url
+
+    @responses.activate
+    def test_iter_collection_uses_server_page_size(self, ojs):
+        """Test the page count follows the size OJS actually returned."""
+        responses.add_callback(
+            responses.GET, SUBMISSIONS_URL, callback=_paged_callback(45, 20)
+        )
+
+        assert len(list(ojs.iter_submissions("jp"))) == 45
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_iter_collection_raises_on_failed_page(self, ojs):
+        """Test a failed page raises after earlier items were yielded."""
+        from analytics.services.ojs_service import OJSCollectionError
+
+        responses.add_callback(
+            responses.GET, SUBMISSIONS_URL, callback=_paged_callback(250, 100, fail_page=2)
+        )
+
+        seen = []
+        with pytest.raises(OJSCollectionError):
+            for item in ojs.iter_submissions("jp"):
+                seen.append(item)
+        assert len(seen) == 100
+
+    @responses.activate
+    def test_journal_metrics_hit_each_endpoint_once(self, ojs):
+        """Test overlapping calls in journal metrics are memoized."""
+        responses.add_callback(
+            responses.GET, SUBMISSIONS_URL, callback=_paged_callback(30, 20)
+        )
+        responses.add(
+            responses.GET, "http://ojs:8080/index.php/jp/api/v1/issues",
+            json={"itemsMax": 4, "items": [{"id": 1}]},
+        )
+        responses.add(
+            responses.GET, "http://ojs:8080/index.php/jp/api/v1/sections", json=[],
+        )
+
+        metrics = ojs.get_journal_metrics("jp")
+
+        assert metrics["total_articles"] == 30
+        assert metrics["published_issues"] == 4
+        assert len(metrics["recent_articles"]) == 10
+        # submissions, issues, sections - previously submissions and issues twice
+        assert len(responses.calls) == 3
+
+        # The memo only lives for one composite call
+        ojs.get_journal_metrics("jp")
+        assert len(responses.calls) == 6
+
+    @responses.activate
+    def test_failed_requests_are_not_memoized(self, ojs):
+        """Test a failure inside a request scope is retried on the next call."""
+        responses.add(responses.GET, SUBMISSIONS_URL, status=500)
+        responses.add(responses.GET, SUBMISSIONS_URL, json={"itemsMax": 0, "items": []})
+
+        with ojs.request_scope():
+            assert ojs.get_submissions("jp") is None
+            assert ojs.get_submissions("jp") == {"itemsMax": 0, "items": []}
+            assert ojs.get_submissions("jp") == {"itemsMax": 0, "items": []}
+
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_not_modified_reuses_cached_body(self, ojs):
+        """Test repeat requests are conditional and 304 reuses the body."""
+        article_url = "http://ojs:8080/index.php/jp/api/v1/articles/5"
+        responses.add(
+            responses.GET, article_url, json={"id": 5},
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+        responses.add(responses.GET, article_url, status=304)
+
+        assert ojs.get_article("jp", 5) == {"id": 5}
+        assert ojs.get_article("jp", 5) == {"id": 5}
+
+        conditional = responses.calls[1].request.headers
+        assert conditional["If-None-Match"] == '"v1"'
+        assert conditional["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+        assert "If-None-Match" not in responses.calls[0].request.headers
+        assert ojs.validators.stats()["hit_rate"] == 0.5
+
+    @responses.activate
+    def test_validator_cache_is_bounded(self, ojs):
+        """Test least recently used validators are evicted."""
+        ojs.validators.max_entries = 1
+        for article_id in (1, 2):
+            responses.add(
+                responses.GET, f"http://ojs:8080/index.php/jp/api/v1/articles/{article_id}",
+                json={"id": article_id}, headers={"ETag": f'"{article_id}"'},
+            )
+            ojs.get_article("jp", article_id)
+
+        assert ojs.validators.stats()["entries"] == 1
+        ojs.get_article("jp", 1)
+        assert "If-None-Match" not in responses.calls[2].request.headers
+
+    @responses.activate
+    def test_validator_cache_is_bounded_by_size(self, ojs):
+        """Test bodies are evicted once their total size exceeds the budget."""
+        ojs.validators.max_bytes = 100
+        for article_id in (1, 2):
+            responses.add(
+                responses.GET, f"http://ojs:8080/index.php/jp/api/v1/articles/{article_id}",
+                json={"id": article_id, "abstract": "x" * 40}, headers={"ETag": f'"{article_id}"'},
+            )
+            ojs.get_article("jp", article_id)
+
+        stats = ojs.validators.stats()
+        assert stats["entries"] == 1
+        assert 0 < stats["bytes"] <= 100
+
+    @responses.activate
+    def test_not_modified_body_is_a_copy(self, ojs):
+        """Test callers mutating a reused body do not change the cached one."""
+        article_url = "http://ojs:8080/index.php/jp/api/v1/articles/5"
+        responses.add(responses.GET, article_url, json={"id": 5, "tags": []}, headers={"ETag": '"v1"'})
+        responses.add(responses.GET, article_url, status=304)
+
+        ojs.get_article("jp", 5)["tags"].append("changed")
+        ojs.get_article("jp", 5)["tags"].append("changed")
+
+        assert ojs.get_article("jp", 5) == {"id": 5, "tags": []}
+
+    @responses.activate
+    def test_citation_tracker_covers_all_pages(self, ojs):
+        """Test the daily citation update is not limited to one page."""
+        from analytics.services.citation_service import CitationTracker
+
+        responses.add_callback(
+            responses.GET, SUBMISSIONS_URL, callback=_paged_callback(120, 100)
+        )
+        tracker = CitationTracker()
+        tracker._update_item = Mock(return_value=("Title", True, True))
+
+        with patch('analytics.services.ojs_service.ojs_service', ojs):
+            tracker.update_all_citations()
+
+        assert tracker._update_item.call_count == 120
+
+
+@pytest.fixture
+def mirror_env(memory_service):
+    """Catalog mirror on the in-process backend with a mocked OJS."""
+    from analytics.services.ojs_mirror import OJSCatalogMirror
+
+    ojs = Mock()
+    ojs.known_journals = [{"path": "jp", "id": 1}]
+    ojs.get_journal_context.return_value = {"id": 1, "urlPath": "jp"}
+    ojs.iter_issues.side_effect = _collection({"id": 7, "isPublished": True})
+    ojs.get_sections.return_value = [{"id": 3, "title": "Research"}]
+
+    with patch('analytics.services.ojs_mirror.redis_service', memory_service), \
+            patch('analytics.services.ojs_mirror.ojs_service', ojs):
+        yield OJSCatalogMirror(), ojs, memory_service.client
+
+
+class TestOJSCatalogMirror:
+    """Tests for OJSCatalogMirror."""
+
+    def test_sync_stores_catalog_and_article_index(self, mirror_env):
+        """Test a sync mirrors articles, issues, authors and the article index."""
+        mirror, ojs, client = mirror_env
+        ojs.iter_submissions.side_effect = _collection(
+            _article(2, "2024-02-02 10:00:00", published="2024-02-01"),
+            _article(1, "2024-01-05 09:00:00"),
+        )
+
+        result = mirror.sync_journal("jp", 1)
+
+        assert result["articles"] == 2
+        assert mirror.journal_for_article(2) == "jp"
+        assert mirror.get_article(2)["title"]["en"] == "Article 2"
+        submissions = mirror.get_submissions("jp", status="published", page=1, items_per_page=1)
+        assert submissions["itemsMax"] == 2
+        assert [a["id"] for a in submissions["items"]] == [2]
+        assert mirror.get_issues("jp", status="published")["items"] == [{"id": 7, "isPublished": True}]
+        authors = mirror.get_authors("jp")
+        assert authors[0]["key"] == "name:ada lovelace"
+        assert authors[0]["article_ids"] == [1, 2]
+
+    def test_unpublished_issues_are_not_counted(self, mirror_env):
+        """Test journal stats and issue pages agree on published issues only."""
+        mirror, ojs, client = mirror_env
+        ojs.iter_issues.side_effect = _collection(
+            {"id": 7, "isPublished": True}, {"id": 8, "isPublished": False},
+        )
+        ojs.iter_submissions.side_effect = _collection(_article(1, "2024-01-05 09:00:00"))
+
+        result = mirror.sync_journal("jp", 1)
+
+        assert result["issues"] == 1
+        assert mirror.get_journal_stats("jp")["total_issues"] == 1
+        assert mirror.get_issues("jp", status="published")["itemsMax"] == 1
+
+    def test_incremental_sync_stops_at_watermark(self, mirror_env):
+        """Test a second sync only takes articles modified since the first."""
+        mirror, ojs, client = mirror_env
+        ojs.iter_submissions.side_effect = _collection(_article(1, "2024-01-05 09:00:00"))
+        mirror.sync_journal("jp", 1)
+
+        ojs.iter_submissions.side_effect = _collection(
+            _article(2, "2024-03-01 08:00:00"),
+            _article(1, "2024-01-05 09:00:00"),
+        )
+        result = mirror.sync_journal("jp", 1)
+
+        assert result["articles"] == 1
+        assert ojs.iter_submissions.call_args.kwargs["order_by"] == "lastModified"
+        assert client.hget("ojs:mirror:jp:state", "watermark") == "2024-03-01 08:00:00"
+
+    def test_failed_page_keeps_previous_mirror(self, mirror_env):
+        """Test a failed OJS fetch leaves the mirror and watermark untouched."""
+        from analytics.services.ojs_service import OJSCollectionError
+
+        mirror, ojs, client = mirror_env
+        ojs.iter_submissions.side_effect = _collection(_article(1, "2024-01-05 09:00:00"))
+        mirror.sync_journal("jp", 1)
+
+        ojs.iter_submissions.side_effect = _collection(
+            _article(3, "2024-04-01 08:00:00"), error=OJSCollectionError("page 2"),
+        )
+        result = mirror.sync_journal("jp", 1)
+
+        assert "error" in result
+        assert client.hget("ojs:mirror:jp:state", "watermark") == "2024-01-05 09:00:00"
+        assert mirror.get_article(1) is not None
+
+    def test_full_sync_prunes_removed_articles(self, mirror_env):
+        """Test a full sync drops articles OJS no longer lists."""
+        mirror, ojs, client = mirror_env
+        ojs.iter_submissions.side_effect = _collection(
+            _article(2, "2024-02-02 10:00:00"), _article(1, "2024-01-05 09:00:00"),
+        )
+        mirror.sync_journal("jp", 1)
+
+        ojs.iter_submissions.side_effect = _collection(_article(2, "2024-02-02 10:00:00"))
+        result = mirror.sync_journal("jp", 1, full=True)
+
+        assert result["removed"] == 1
+        assert mirror.journal_for_article(1) is None
+        assert mirror.get_authors("jp")[0]["article_ids"] == [2]
+
+    def test_stale_mirror_is_served_while_refreshing(self, mirror_env):
+        """Test stale data is returned and a background refresh is started."""
+        mirror, ojs, client = mirror_env
+        client.hset("ojs:mirror:jp:state", mapping={"synced_at": time.time() - 3600})
+        client.hset("ojs:mirror:jp:articles", "5", '{"id": 5}')
+        client.zadd("ojs:mirror:jp:published", {"5": 1})
+
+        with patch.object(mirror, 'refresh_async') as mock_refresh:
+            submissions = mirror.get_submissions("jp", status="published")
+
+            assert submissions["items"] == [{"id": 5}]
+            mock_refresh.assert_called_once_with("jp")
+
+    def test_unsynced_journal_falls_through(self, mirror_env):
+        """Test a journal that was never synced is left to OJS."""
+        mirror, ojs, client = mirror_env
+
+        with patch.object(mirror, 'refresh_async') as mock_refresh:
+            assert mirror.get_submissions("jp", status="published") is None
+            assert mirror.get_submissions("jp", status="queued") is None
+            mock_refresh.assert_called_once_with("jp")
+
+    def test_only_published_reads_are_served(self, mirror_env):
+        """Test unfiltered and failed reads are left to OJS."""
+        mirror, ojs, client = mirror_env
+        ojs.iter_submissions.side_effect = _collection(_article(1, "2024-01-05 09:00:00"))
+        mirror.sync_journal("jp", 1)
+
+        assert mirror.get_submissions("jp") is None
+        assert mirror.get_issues("jp") is None
+        assert mirror.get_submissions("jp", status="published")["itemsMax"] == 1
+
+        with patch.object(client, 'zrevrange', side_effect=Exception("Connection lost")), \
+                patch.object(client, 'hgetall', side_effect=Exception("Connection lost")):
+            assert mirror.get_submissions("jp", status="published") is None
+            assert mirror.get_issues("jp", status="published") is None
+
+
+class TestOJSProjection:
+    """Tests for OJS proxy field projection."""
+
+    ARTICLE = {
+        "id": 5,
+        "title": {"en_US": "Deep Learning", "fr_CA": "Apprentissage profond"},
+        "abstract": {"en_US": "Long abstract", "fr_CA": "Long résumé"},
+        "authors": [{
+            "fullName": "Ada Lovelace",
+            "biography": {"en_US": "Very long biography"},
+            "affiliation": {"en_US": "UDSM", "fr_CA": ""},
+        }],
+        "stageAssignments": [{"id": 1}],
+        "doiObject": {"doi": "10.1/x", "id": 2},
+    }
+
+    def test_default_shape_is_compact(self):
+        """Test the default drops unused fields and extra locales."""
+        from analytics.services.ojs_projection import shape_response
+
+        shaped = shape_response({"itemsMax": 1, "items": [self.ARTICLE]}, "article")
+
+        item = shaped["items"][0]
+        assert shaped["itemsMax"] == 1
+        assert item["title"] == {"en_US": "Deep Learning"}
+        assert item["authors"] == [{"fullName": "Ada Lovelace", "affiliation": {"en_US": "UDSM"}}]
+        assert "stageAssignments" not in item
+
+    def test_fields_and_locale(self):
+        """Test explicit dotted fields and locale selection."""
+        from analytics.services.ojs_projection import shape_response
+
+        shaped = shape_response(self.ARTICLE, "article", fields="id,title,authors.fullName", locale="fr_CA")
+
+        assert shaped == {
+            "id": 5,
+            "title": {"fr_CA": "Apprentissage profond"},
+            "authors": [{"fullName": "Ada Lovelace"}],
+        }
+
+    def test_full_payload_on_request(self):
+        """Test fields=all and locale=all pass the payload through."""
+        from analytics.services.ojs_projection import shape_response
+
+        assert shape_response(self.ARTICLE, "article", fields="all", locale="all") == self.ARTICLE
+
+    def test_submissions_view_applies_projection(self):
+        """Test the proxy view shapes the response before serialization."""
+        from analytics.views import ojs_submissions
+
+        with patch('analytics.views.ojs_mirror') as mock_mirror:
+            mock_mirror.get_submissions.return_value = {"itemsMax": 1, "items": [self.ARTICLE]}
+
+            from rest_framework.test import APIRequestFactory
+            factory = APIRequestFactory()
+            request = factory.get('/api/ojs/jp/submissions', {'fields': 'id'})
+            response = ojs_submissions(request, "jp")
+
+            assert response.status_code == 200
+            assert response.data["items"] == [{"id": 5}]
+
+
+OAI_URL = "http://ojs:8080/index.php/jp/oai"
+
+OAI_PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <ListRecords>
+    <record>
+      <header>
+        <identifier>oai:ojs.udsm.ac.tz:article/{id}</identifier>
+        <datestamp>{datestamp}</datestamp>
+      </header>
+      <metadata>
+        <oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+                   xmlns:dc="http://purl.org/dc/elements/1.1/">
+          <dc:title xml:lang="en-US">Deep Learning</dc:title>
+          <dc:title xml:lang="fr-CA">Apprentissage profond</dc:title>
+          <dc:creator>Lovelace, Ada</dc:creator>
+          <dc:subject xml:lang="en-US">neural networks; vision</dc:subject>
+          <dc:description xml:lang="en-US">Abstract</dc:description>
+          <dc:date>2024-01-15</dc:date>
+          <dc:identifier>https://journals.udsm.ac.tz/index.php/jp/article/view/{id}</dc:identifier>
+          <dc:identifier>10.1234/jp.{id}</dc:identifier>
+        </oai_dc:dc>
+      </metadata>
+    </record>
+    <record>
+      <header status="deleted">
+        <identifier>oai:ojs.udsm.ac.tz:article/99</identifier>
+        <datestamp>{datestamp}</datestamp>
+      </header>
+    </record>
+    <resumptionToken>{token}</resumptionToken>
+  </ListRecords>
+</OAI-PMH>"""
+
+
+class TestOAIHarvester:
+    """Tests for OAI-PMH harvesting."""
+
+    @responses.activate
+    def test_records_follow_resumption_tokens(self, ojs):
+        """Test records are parsed and resumption tokens are followed."""
+        responses.add(
+            responses.GET, OAI_URL,
+            body=OAI_PAGE.format(id=1, datestamp="2024-01-16T10:00:00Z", token="next"),
+        )
+        responses.add(
+            responses.GET, OAI_URL,
+            body=OAI_PAGE.format(id=2, datestamp="2024-01-17T10:00:00Z", token=""),
+        )
+
+        records = list(ojs.iter_oai_records("jp", from_="2024-01-01"))
+
+        assert [r["id"] for r in records] == [1, 99, 2, 99]
+        article = records[0]
+        assert article["title"] == {"en_US": "Deep Learning", "fr_CA": "Apprentissage profond"}
+        assert article["authors"] == [{"fullName": "Ada Lovelace", "givenName": "Ada", "familyName": "Lovelace"}]
+        assert article["keywords"] == {"en_US": ["neural networks", "vision"]}
+        assert article["doi"] == "10.1234/jp.1"
+        assert article["datePublished"] == "2024-01-15"
+        assert records[1] == {"id": 99, "lastModified": "2024-01-16T10:00:00Z", "deleted": True}
+        assert "from=2024-01-01" in responses.calls[0].request.url
+        assert "resumptionToken=next" in responses.calls[1].request.url
+        assert "metadataPrefix" not in responses.calls[1].request.url
+
+    @responses.activate
+    def test_no_records_match(self, ojs):
+        """Test an empty incremental harvest yields nothing."""
+        responses.add(responses.GET, OAI_URL, body=(
+            '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+            '<error code="noRecordsMatch">No matching records</error></OAI-PMH>'
+        ))
+
+        assert list(ojs.iter_oai_records("jp")) == []
+
+    def test_harvest_merges_into_mirror(self, mirror_env):
+        """Test harvested records merge over REST payloads and move the watermark."""
+        mirror, ojs, client = mirror_env
+        client.hset("ojs:mirror:jp:articles", "1", json.dumps({
+            "id": 1, "status": 3, "authors": [{"fullName": "Ada Lovelace", "orcid": "0000"}],
+        }))
+        client.hset("ojs:mirror:jp:articles", "99", json.dumps({"id": 99}))
+        ojs.iter_oai_records.side_effect = _collection(
+            {"id": 1, "lastModified": "2024-01-16", "title": {"en_US": "New title"},
+             "authors": [{"fullName": "Ada Lovelace"}]},
+            {"id": 99, "lastModified": "2024-01-17", "deleted": True},
+        )
+
+        result = mirror.harvest_journal("jp")
+
+        assert result == {"journal": "jp", "records": 2, "deleted": 1, "from": None}
+        article = json.loads(client.hget("ojs:mirror:jp:articles", "1"))
+        assert article["title"] == {"en_US": "New title"}
+        assert article["status"] == 3
+        assert article["authors"][0]["orcid"] == "0000"
+        assert client.hget("ojs:mirror:jp:articles", "99") is None
+        assert client.hget("ojs:mirror:jp:state", "oai_watermark") == "2024-01-17"
+
+        mirror.harvest_journal("jp")
+        assert ojs.iter_oai_records.call_args.kwargs["from_"] == "2024-01-17"
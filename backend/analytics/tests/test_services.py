@@ -2,8 +2,9 @@
 Tests for Redis service.
 """
 
+import json
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, PropertyMock
 
 
 class TestRedisService:
@@ -86,6 +87,7 @@ class TestRedisService:
 
         service = RedisService()
         mock_client = Mock()
+        mock_client.raw.return_value = mock_client
         service._client = mock_client
 
         # Set cache
@@ -166,3 +168,1129 @@ class TestRedisServiceConnection:
         service._client = mock_client
 
         assert service.is_connected() is False
+
+
+class TestTrackingSpool:
+    """Tests for the local tracking spool used while Redis is down."""
+
+    @patch('analytics.services.redis_service.redis')
+    def test_failed_increment_is_spooled(self, mock_redis):
+        """Test a failed increment trips the circuit and is spooled."""
+        from analytics.services.redis_service import RedisService
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.incrby.side_effect = Exception("Connection refused")
+        service._client = mock_client
+
+        with patch.object(service, '_spool') as mock_spool:
+            result = service.increment_article_views("42")
+
+            assert result == 0
+            mock_spool.assert_called_once_with("incrby", "article:42:views", 1)
+
+            # Circuit is open: the next call is spooled without touching Redis
+            service.increment_article_views("42")
+            assert mock_client.incrby.call_count == 1
+            assert mock_spool.call_count == 2
+
+    def test_replay_applies_operations_in_bulk(self, tmp_path):
+        """Test spooled operations are replayed through a pipeline."""
+        from analytics.services.spool_service import TrackingSpool
+
+        spool = TrackingSpool(directory=str(tmp_path), fsync_batch=2)
+        with patch.object(spool, 'start_replayer'):
+            spool.append("incrby", "article:1:views", 1)
+            spool.append("zincrby", "trending:articles", 1.0, "1")
+            spool.append("hincrby", "geo:countries", "TZ", 1)
+            spool.append("xadd", "events:stream", {"event": "{}"}, 1000)
+
+        mock_client = Mock()
+        mock_pipe = mock_client.pipeline.return_value
+
+        applied = spool.replay(mock_client)
+
+        assert applied == 4
+        mock_pipe.xadd.assert_called_once_with(
+            "events:stream", {"event": "{}"}, maxlen=1000, approximate=True
+        )
+        mock_pipe.incrby.assert_called_once_with("article:1:views", 1)
+        mock_pipe.zincrby.assert_called_once_with("trending:articles", 1.0, "1")
+        mock_pipe.hincrby.assert_called_once_with("geo:countries", "TZ", 1)
+        mock_pipe.execute.assert_called_once()
+        assert not spool.has_pending()
+
+    def test_replay_resumes_from_checkpoint(self, tmp_path):
+        """Test an interrupted replay resumes after the last checkpointed batch."""
+        from analytics.services.spool_service import TrackingSpool
+
+        spool = TrackingSpool(directory=str(tmp_path), replay_batch=2)
+        with patch.object(spool, 'start_replayer'):
+            for i in range(3):
+                spool.append("incrby", f"article:{i}:views", 1)
+
+        mock_client = Mock()
+        mock_pipe = mock_client.pipeline.return_value
+        mock_pipe.execute.side_effect = [None, Exception("Connection lost")]
+
+        with pytest.raises(Exception):
+            spool.replay(mock_client)
+
+        mock_pipe.reset_mock()
+        mock_pipe.execute.side_effect = None
+        applied = spool.replay(mock_client)
+
+        assert applied == 1
+        mock_pipe.incrby.assert_called_once_with("article:2:views", 1)
+
+
+    def test_final_partial_batch_is_checkpointed(self, tmp_path):
+        """Test a crash after the last batch does not replay it again."""
+        from pathlib import Path
+        from analytics.services.spool_service import TrackingSpool
+
+        spool = TrackingSpool(directory=str(tmp_path), replay_batch=2)
+        with patch.object(spool, 'start_replayer'):
+            for i in range(3):
+                spool.append("incrby", f"article:{i}:views", 1)
+
+        mock_client = Mock()
+        mock_pipe = mock_client.pipeline.return_value
+
+        # Crash before the drained segment is removed
+        with patch.object(Path, 'unlink', side_effect=OSError("crash")):
+            with pytest.raises(OSError):
+                spool.replay(mock_client)
+
+        mock_pipe.reset_mock()
+        assert spool.replay(mock_client) == 0
+        mock_pipe.incrby.assert_not_called()
+
+
+class TestEventStream:
+    """Tests for the durable tracking event stream."""
+
+    @patch('analytics.services.redis_service.redis')
+    def test_append_event(self, mock_redis):
+        """Test events are appended to the capped stream."""
+        from analytics.services.redis_service import RedisService, EVENT_STREAM_KEY
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.xadd.return_value = "1700000000000-0"
+        service._client = mock_client
+
+        entry_id = service.append_event({"type": "view", "article_id": "1"})
+
+        assert entry_id == "1700000000000-0"
+        args, kwargs = mock_client.xadd.call_args
+        assert args[0] == EVENT_STREAM_KEY
+        assert kwargs["approximate"] is True
+
+    @patch('analytics.services.redis_service.redis')
+    def test_failed_append_is_spooled(self, mock_redis):
+        """Test an event that cannot reach the stream is spooled, not lost."""
+        import json
+        from analytics.services.redis_service import RedisService, EVENT_STREAM_KEY
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.xadd.side_effect = Exception("Connection refused")
+        service._client = mock_client
+
+        with patch.object(service, '_spool') as mock_spool:
+            assert service.append_event({"type": "view", "article_id": "1"}) is None
+
+            op, key, fields, maxlen = mock_spool.call_args.args
+            assert (op, key) == ("xadd", EVENT_STREAM_KEY)
+            assert json.loads(fields["event"]) == {"type": "view", "article_id": "1", "spooled": True}
+
+    def test_spooled_event_is_dated_by_its_timestamp(self):
+        """Test a replayed event counts in the hour it happened, not when it was replayed."""
+        from analytics.services.event_stream import EventAggregate
+
+        aggregate = EventAggregate()
+        aggregate.add("1700000000000-0", {
+            "type": "view", "article_id": "1", "timestamp": "2023-11-14T08:30:00", "spooled": True,
+        })
+
+        assert aggregate.hourly == {("views", "2023-11-14T08"): 1}
+
+    def test_worker_derives_state_in_one_pipeline(self):
+        """Test a batch is aggregated, written and acknowledged together."""
+        import json
+        from analytics.services.event_stream import EventStreamWorker
+
+        entries = [
+            ("1700000000000-0", {"event": json.dumps({"type": "view", "article_id": "1", "journal_id": "j"})}),
+            ("1700000000001-0", {"event": json.dumps({"type": "view", "article_id": "1"})}),
+            ("1700000000002-0", {"event": json.dumps({"type": "download", "article_id": "2"})}),
+        ]
+
+        with patch('analytics.services.event_stream.redis_service') as mock_service:
+            mock_service.article_counter_location.side_effect = (
+                lambda article_id, metric: (f"article:{article_id}:{metric}", None)
+            )
+            mock_service.trending_key.return_value = "trending:articles"
+            mock_pipe = mock_service.client.pipeline.return_value
+            worker = EventStreamWorker(derive_counters=True, broadcast=False)
+
+            processed = worker.process(entries)
+
+            assert processed == 3
+            mock_pipe.hincrby.assert_any_call("timeseries:views", "2023-11-14T22", 2)
+            mock_pipe.hincrby.assert_any_call("timeseries:views:article:1", "2023-11-14", 2)
+            mock_pipe.incrby.assert_any_call("article:1:views", 2)
+            mock_pipe.incrby.assert_any_call("article:2:downloads", 1)
+            mock_pipe.incrby.assert_any_call("journal:j:views", 1)
+            mock_pipe.zincrby.assert_called_once_with("trending:articles", 2, "1")
+            mock_pipe.xack.assert_called_once()
+            mock_pipe.execute.assert_called_once()
+
+    def test_replay_overwrites_time_series(self):
+        """Test replaying a range recomputes buckets instead of adding to them."""
+        import json
+        from datetime import datetime, timezone
+        from analytics.services.event_stream import replay_range
+
+        entries = [
+            ("1700000000000-0", {"event": json.dumps({"type": "view", "article_id": "1"})}),
+            ("1700000000001-0", {"event": json.dumps({"type": "view", "article_id": "1"})}),
+        ]
+
+        with patch('analytics.services.event_stream.redis_service') as mock_service:
+            mock_service.client.xrange.return_value = entries
+            mock_pipe = mock_service.client.pipeline.return_value
+
+            result = replay_range(
+                datetime(2023, 11, 14, tzinfo=timezone.utc),
+                datetime(2023, 11, 15, tzinfo=timezone.utc),
+            )
+
+            assert result["events"] == 2
+            mock_pipe.hset.assert_any_call("timeseries:views", "2023-11-14T22", 2)
+            mock_pipe.hincrby.assert_not_called()
+            mock_pipe.incrby.assert_not_called()
+
+    def test_replay_counts_spooled_events_on_their_own_day(self):
+        """Test a late-spooled event is rebuilt with its day, not the day it was appended."""
+        import json
+        from datetime import datetime, timezone
+        from analytics.services.event_stream import replay_range
+
+        def view(**extra):
+            return {"event": json.dumps({"type": "view", "article_id": "1", **extra})}
+
+        entries = [
+            ("1700000000000-0", view()),  # 2023-11-14T22:13
+            ("1700086400000-0", view()),  # 2023-11-15T22:13
+            # Spooled during an outage on the 14th, appended on the 15th
+            ("1700086400001-0", view(timestamp="2023-11-14T10:00:00", spooled=True)),
+        ]
+
+        def xrange(key, min, max, count):
+            start = int(min.split("-")[0])
+            return [entry for entry in entries if int(entry[0].split("-")[0]) >= start]
+
+        def replay(day):
+            with patch('analytics.services.event_stream.redis_service') as mock_service:
+                mock_service.client.xrange.side_effect = xrange
+                mock_pipe = mock_service.client.pipeline.return_value
+                result = replay_range(
+                    datetime(2023, 11, day, tzinfo=timezone.utc),
+                    datetime(2023, 11, day, 23, 59, 59, tzinfo=timezone.utc),
+                )
+                return result, {call.args[:2]: call.args[2] for call in mock_pipe.hset.call_args_list}
+
+        result, written = replay(15)
+        assert result["events"] == 1
+        assert written == {
+            ("timeseries:views", "2023-11-15T22"): 1,
+            ("timeseries:views:article:1", "2023-11-15"): 1,
+        }
+
+        result, written = replay(14)
+        assert result["events"] == 2
+        assert written[("timeseries:views", "2023-11-14T10")] == 1
+        assert written[("timeseries:views:article:1", "2023-11-14")] == 2
+        assert ("timeseries:views:article:1", "2023-11-15") not in written
+
+
+class TestCounterLayout:
+    """Tests for the hash-packed article counter layout."""
+
+    @patch('analytics.services.redis_service.redis')
+    def test_hash_layout_counters(self, mock_redis):
+        """Test article counters are packed into bucket hashes."""
+        from analytics.services.redis_service import RedisService
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.hincrby.return_value = 3
+        mock_client.hget.return_value = "3"
+        service._client = mock_client
+
+        with patch('analytics.services.redis_service.settings') as mock_settings:
+            mock_settings.REDIS_COUNTER_LAYOUT = "hash"
+            mock_settings.REDIS_COUNTER_BUCKET_SIZE = 64
+
+            assert service.increment_article_views("130") == 3
+            mock_client.hincrby.assert_called_once_with("counters:2", "130:v", 1)
+
+            assert service.get_article_downloads("130") == 3
+            mock_client.hget.assert_called_once_with("counters:2", "130:d")
+
+    @patch('analytics.services.redis_service.redis')
+    def test_hash_layout_totals(self, mock_redis):
+        """Test totals are summed across bucket hashes."""
+        from analytics.services.redis_service import RedisService
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.scan_iter.return_value = ["counters:0", "counters:1"]
+        mock_client.hgetall.side_effect = [
+            {"1:v": "10", "1:d": "2"},
+            {"70:v": "5"},
+        ]
+        service._client = mock_client
+
+        with patch('analytics.services.redis_service.settings') as mock_settings:
+            mock_settings.REDIS_COUNTER_LAYOUT = "hash"
+
+            assert service.get_total_views() == 15
+
+    def test_non_numeric_ids_are_bucketed_by_checksum(self):
+        """Test non-numeric article ids still map to a stable bucket."""
+        from analytics.services.redis_service import counter_bucket_key
+
+        key = counter_bucket_key("article-123", 64)
+
+        assert key.startswith("counters:h")
+        assert key == counter_bucket_key("article-123", 64)
+
+
+class TestRedisCluster:
+    """Tests for cluster key hash-tagging and cross-slot aggregates."""
+
+    def test_article_keys_are_hash_tagged(self):
+        """Test per-article keys share one slot when hash tags are enabled."""
+        from analytics.services.redis_service import article_key, article_id_from_key
+
+        with patch('analytics.services.redis_service.settings') as mock_settings:
+            mock_settings.REDIS_HASH_TAGS = True
+
+            assert article_key("42", "views") == "article:{42}:views"
+            assert article_key("42", "citations") == "article:{42}:citations"
+            assert article_id_from_key("article:{42}:views") == "42"
+
+            mock_settings.REDIS_HASH_TAGS = False
+
+            assert article_key("42", "views") == "article:42:views"
+
+    @patch('analytics.services.redis_service.redis')
+    def test_sharded_trending_is_merged(self, mock_redis):
+        """Test trending shards are read in one pipeline and merged."""
+        from analytics.services.redis_service import RedisService
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.pipeline.return_value.execute.return_value = [
+            [("a", 9.0), ("b", 2.0)],
+            [("c", 5.0)],
+        ]
+        service._client = mock_client
+
+        with patch('analytics.services.redis_service.settings') as mock_settings:
+            mock_settings.REDIS_TRENDING_SHARDS = 2
+
+            trending = service.get_trending_articles(limit=2)
+
+            assert [t["article_id"] for t in trending] == ["a", "c"]
+            assert service.trending_key("a") in service.trending_keys()
+
+    @patch('analytics.services.redis_service.redis')
+    def test_cluster_totals_fetch_values_per_slot(self, mock_redis):
+        """Test totals use slot-aware MGET in cluster mode."""
+        from analytics.services.redis_service import RedisService
+
+        service = RedisService()
+        mock_client = Mock()
+        mock_client.keys.return_value = ["article:{1}:views", "article:{2}:views"]
+        mock_client.mget_nonatomic.return_value = ["4", None]
+        service._client = mock_client
+
+        with patch.object(RedisService, 'cluster_mode', new_callable=PropertyMock, return_value=True):
+            assert service.get_total_views() == 4
+            mock_client.get.assert_not_called()
+
+
+class TestArticleMetadata:
+    """Tests for the article metadata cache used to hydrate trending."""
+
+    def test_hydrate_fills_misses_then_reads_cache(self, memory_service):
+        """Test misses are looked up once and then served from the cache."""
+        from analytics.services.article_metadata import ArticleMetadataCache
+
+        cache = ArticleMetadataCache()
+
+        with patch('analytics.services.article_metadata.redis_service', memory_service), \
+                patch('analytics.services.article_metadata.ojs_mirror') as mock_mirror, \
+                patch('analytics.services.article_metadata.ojs_service') as mock_ojs:
+            mock_mirror.journal_for_article.side_effect = lambda i: "jp" if i == "1" else None
+            mock_mirror.get_article.return_value = {
+                "id": 1,
+                "title": {"en_US": "Deep Learning"},
+                "authors": [{"givenName": {"en_US": "Ada"}, "familyName": {"en_US": "Lovelace"}}],
+            }
+
+            mock_ojs.known_journals = [{"path": "jp", "id": 1}]
+            mock_ojs.get_article.return_value = None
+
+            rows = cache.hydrate([
+                {"article_id": "1", "score": 9},
+                {"article_id": "2", "score": 4},
+                {"article_id": "demo-article", "score": 1},
+            ])
+
+            assert rows[0]["article"]["title"] == "Deep Learning"
+            assert rows[0]["article"]["authors"] == ["Ada Lovelace"]
+            assert rows[0]["article"]["journal_path"] == "jp"
+            assert rows[1]["article"] is None
+            assert rows[2]["article"] is None
+            mock_ojs.get_article.assert_called_once_with("jp", 2)
+
+            mock_mirror.reset_mock()
+            again = cache.get_many(["1", "2"])
+
+            assert again["1"]["title"] == "Deep Learning"
+            assert again["2"] is None
+            mock_mirror.journal_for_article.assert_not_called()
+            assert memory_service.client.ttl("article:2:meta") <= 300
+
+    def test_unmirrored_article_is_looked_up_in_known_journals(self, memory_service):
+        """Test articles missing from the mirror are fetched from each OJS journal."""
+        from analytics.services.article_metadata import ArticleMetadataCache
+
+        cache = ArticleMetadataCache()
+
+        with patch('analytics.services.article_metadata.redis_service', memory_service), \
+                patch('analytics.services.article_metadata.ojs_mirror') as mock_mirror, \
+                patch('analytics.services.article_metadata.ojs_service') as mock_ojs:
+            mock_mirror.journal_for_article.return_value = None
+            mock_ojs.known_journals = [{"path": "a", "id": 1}, {"path": "b", "id": 2}]
+            mock_ojs.get_article.side_effect = lambda path, i: {"id": i, "title": "New"} if path == "b" else None
+
+            result = cache.get_many(["7"])
+
+            assert result["7"]["title"] == "New"
+            assert result["7"]["journal_path"] == "b"
+            assert memory_service.client.ttl("article:7:meta") > 300
+
+    def test_failed_lookup_is_not_cached(self, memory_service):
+        """Test a lookup that could not be attempted is retried next time."""
+        from analytics.services.article_metadata import ArticleMetadataCache
+
+        cache = ArticleMetadataCache()
+
+        with patch('analytics.services.article_metadata.redis_service', memory_service), \
+                patch('analytics.services.article_metadata.ojs_mirror') as mock_mirror, \
+                patch('analytics.services.article_metadata.ojs_service') as mock_ojs:
+            mock_mirror.journal_for_article.side_effect = Exception("Redis down")
+            assert cache.get_many(["7"]) == {"7": None}
+
+            mock_mirror.journal_for_article.side_effect = None
+            mock_mirror.journal_for_article.return_value = None
+            mock_ojs.is_configured = False
+            assert cache.get_many(["7"]) == {"7": None}
+
+            assert memory_service.client.get("article:7:meta") is None
+
+
+class TestArticleAggregator:
+    """Tests for the article-centric analytics join."""
+
+    def test_joins_sources_and_caches_slow_ones(self, memory_service):
+        """Test each source is batched once and Matomo/OJS data is reused."""
+        from analytics.services.article_aggregator import ArticleAnalyticsAggregator
+
+        aggregator = ArticleAnalyticsAggregator()
+        memory_service.increment_article_views("1")
+        memory_service.increment_article_views("1")
+        memory_service.increment_article_downloads("2")
+        memory_service.client.hset(
+            "article:1:citations",
+            mapping={"citation_count": 7, "total_results": 9, "last_updated": "2024-01-01T00:00:00"},
+        )
+
+        with patch('analytics.services.article_aggregator.redis_service', memory_service), \
+                patch('analytics.services.article_aggregator.matomo_service') as mock_matomo, \
+                patch('analytics.services.article_aggregator.article_metadata') as mock_metadata:
+            mock_matomo.get_article_metrics_bulk.return_value = [
+                [{"nb_hits": 40}],
+                {"result": "error", "message": "boom"},
+            ]
+            mock_metadata.get_many.return_value = {"1": {"id": 1, "title": "Deep Learning"}, "2": None}
+
+            first = aggregator.get_records(["1", "2"])
+
+            mock_matomo.get_article_metrics_bulk.assert_called_once_with(
+                ["/article/1", "/article/2"], "month", "today"
+            )
+            mock_metadata.get_many.assert_called_once_with(["1", "2"])
+            assert first[0]["realtime"] == {"views": 2, "downloads": 0}
+            assert first[1]["realtime"] == {"views": 0, "downloads": 1}
+            assert first[0]["citations"]["citation_count"] == 7
+            assert first[1]["citations"] is None
+            assert first[0]["matomo"] == [{"nb_hits": 40}]
+            assert first[0]["article"]["title"] == "Deep Learning"
+            assert first[0]["sources"]["matomo"]["cached"] is False
+            assert first[1]["sources"]["matomo"]["stale"] is True
+
+            mock_matomo.reset_mock()
+            mock_metadata.reset_mock()
+            mock_matomo.get_article_metrics_bulk.return_value = [[{"nb_hits": 3}]]
+            memory_service.increment_article_views("1")
+
+            second = aggregator.get_records(["1", "2"])
+
+            # Only the article whose Matomo call failed is refetched
+            mock_matomo.get_article_metrics_bulk.assert_called_once_with(["/article/2"], "month", "today")
+            mock_metadata.get_many.assert_not_called()
+            assert second[0]["realtime"]["views"] == 3
+            assert second[0]["sources"]["matomo"]["cached"] is True
+            assert second[1]["matomo"] == [{"nb_hits": 3}]
+            assert second[0]["sources"]["citations"]["fetched_at"] == "2024-01-01T00:00:00"
+
+
+class TestCitationTracker:
+    """Tests for the parallel, resumable citation update."""
+
+    def test_token_bucket_waits_for_refill(self):
+        """Test the bucket allows a burst and then paces acquisitions."""
+        from analytics.services.citation_service import TokenBucket
+
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(2, 2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            bucket.acquire()
+
+        assert sleeps == [0.5, 0.5]
+
+    def _tracker(self, items):
+        from analytics.services.citation_service import CitationTracker
+
+        ojs = Mock()
+        ojs.known_journals = [{"path": "jp", "id": 1}]
+        ojs.iter_submissions.return_value = iter(items)
+        citations = Mock()
+        citations.get_article_citations.side_effect = lambda article_title, **kw: (
+            None if article_title == "Broken" else {"citation_count": 3, "total_results": 1}
+        )
+        return CitationTracker(citations), ojs
+
+    def test_resume_skips_checkpointed_articles(self, memory_service):
+        """Test a resumed run only refreshes articles not yet checkpointed."""
+        items = [{"id": i, "title": {"en": f"Paper {i}"}} for i in range(1, 6)]
+        items.append({"id": 6, "title": {"en": "Broken"}})
+        tracker, ojs = self._tracker(items)
+        memory_service.client.sadd("citations:update:done", "1", "2")
+
+        with patch('analytics.services.redis_service.redis_service', memory_service), \
+                patch('analytics.services.citation_history.redis_service', memory_service), \
+                patch('analytics.services.title_index.redis_service', memory_service), \
+                patch('analytics.services.ojs_service.ojs_service', ojs):
+            result = tracker.update_all_citations(resume=True, concurrency=3)
+
+        assert result["skipped"] == 2
+        assert sorted(result["updated"]) == ["Paper 3", "Paper 4", "Paper 5"]
+        assert result["failed"] == ["Broken"]
+        assert memory_service.client.hgetall("article:4:citations")["citation_count"] == "3"
+        # The finished run clears its checkpoint
+        assert memory_service.client.smembers("citations:update:done") == set()
+        for call in tracker.citation_service.get_article_citations.call_args_list:
+            assert call.kwargs["force_refresh"] is False
+
+    def test_interrupted_run_keeps_checkpoint(self, memory_service):
+        """Test articles refreshed before an OJS failure are remembered."""
+        from analytics.services.ojs_service import OJSCollectionError
+
+        def items():
+            yield {"id": 1, "title": {"en": "Paper 1"}}
+            raise OJSCollectionError("page 2 failed")
+
+        tracker, ojs = self._tracker([])
+        ojs.iter_submissions.return_value = items()
+
+        with patch('analytics.services.redis_service.redis_service', memory_service), \
+                patch('analytics.services.citation_history.redis_service', memory_service), \
+                patch('analytics.services.title_index.redis_service', memory_service), \
+                patch('analytics.services.ojs_service.ojs_service', ojs):
+            result = tracker.update_all_citations(force=True)
+
+        assert result["updated"] == ["Paper 1"]
+        assert memory_service.client.smembers("citations:update:done") == {"1"}
+        assert tracker.citation_service.get_article_citations.call_args.kwargs["force_refresh"] is True
+
+
+    def test_only_serper_lookups_are_counted(self, memory_service):
+        """Test articles served by an earlier lookup of their work are not counted."""
+        from analytics.services.citation_service import CitationService, CitationTracker
+
+        citations = CitationService()
+        citations.api_key = "key"
+        citations.search_citations = Mock(return_value={"citation_count": 2, "search_time": "2999-01-01"})
+        tracker = CitationTracker(citations)
+        items = [
+            ({"id": 1, "title": {"en": "Deep Learning: A Survey"}}, "jp"),
+            ({"id": 2, "title": {"en": "Deep learning - a survey"}}, "jp"),
+            ({"id": 3, "title": {"en": "Rainfall forecasting in Tanzania"}}, "jp"),
+        ]
+        results = {"updated": [], "failed": [], "total": 0, "lookups": 0}
+
+        with patch('analytics.services.redis_service.redis_service', memory_service), \
+                patch('analytics.services.citation_history.redis_service', memory_service), \
+                patch('analytics.services.title_index.redis_service', memory_service):
+            tracker.process(items, results, force=True, concurrency=1)
+
+        assert results["total"] == 3
+        assert results["lookups"] == 2
+
+
+class TestCitationScheduler:
+    """Tests for prioritized citation refresh scheduling."""
+
+    def _scheduler(self, items):
+        from analytics.services.citation_scheduler import CitationScheduler
+
+        tracker = Mock()
+        tracker.iter_published.side_effect = lambda journal_path=None: iter(
+            [(item, "jp") for item in items]
+        )
+        return CitationScheduler(tracker)
+
+    def test_priority_prefers_overdue_popular_recent(self):
+        """Test scores rank by overdue ratio, views and publication age."""
+        from datetime import datetime
+        from analytics.services.citation_scheduler import CitationScheduler
+
+        scheduler = CitationScheduler(Mock())
+        now = datetime(2024, 6, 1).timestamp()
+        day = 86400
+        fresh = {"refreshed_at": now - day / 2, "interval": day}
+        overdue = {"refreshed_at": now - 3 * day, "interval": day}
+
+        assert scheduler.priority(fresh, 100, None, now) == 0
+        assert scheduler.priority(overdue, 100, None, now) > scheduler.priority(overdue, 0, None, now)
+        assert scheduler.priority(overdue, 0, datetime(2024, 1, 1), now) > \
+            scheduler.priority(overdue, 0, datetime(2010, 1, 1), now)
+        assert scheduler.priority({}, 0, None, now) > scheduler.priority(overdue, 0, None, now)
+
+    def test_interval_stretches_while_unchanged(self):
+        """Test the refresh interval doubles on unchanged counts and resets on change."""
+        from analytics.services.citation_scheduler import CitationScheduler
+
+        scheduler = CitationScheduler(Mock())
+        with patch('analytics.services.citation_scheduler.settings') as mock_settings:
+            mock_settings.CITATION_REFRESH_INTERVAL_DAYS = 1
+            mock_settings.CITATION_MAX_REFRESH_INTERVAL_DAYS = 3
+            state = scheduler.next_state({}, 5, 0)
+            assert state["interval"] == 86400
+            state = scheduler.next_state(state, 5, 1)
+            assert state["interval"] == 2 * 86400
+            state = scheduler.next_state(state, 5, 2)
+            assert state["interval"] == 3 * 86400
+            state = scheduler.next_state(state, 6, 3)
+            assert state["interval"] == 86400
+
+    def test_run_spends_only_remaining_budget(self, memory_service):
+        """Test a run refreshes the top due articles and records budget and state."""
+        items = [{"id": i, "title": {"en": f"Paper {i}"}} for i in (1, 2, 3)]
+        scheduler = self._scheduler(items)
+        memory_service.increment_article_views("3")
+        refreshed = []
+
+        def process(batch, results, force, concurrency, on_result):
+            for item, _ in batch:
+                refreshed.append(item["id"])
+                results["total"] += 1
+                results["lookups"] += 1
+                on_result(item, {"citation_count": 4})
+
+        scheduler.tracker.process.side_effect = process
+
+        with patch('analytics.services.citation_scheduler.redis_service', memory_service), \
+                patch('analytics.services.citation_scheduler.settings') as mock_settings:
+            mock_settings.CITATION_DAILY_BUDGET = 3
+            mock_settings.CITATION_REFRESH_INTERVAL_DAYS = 1
+            mock_settings.CITATION_MAX_REFRESH_INTERVAL_DAYS = 30
+            memory_service.client.set(scheduler.budget_key(__import__('time').time()), 1)
+
+            result = scheduler.run()
+
+            assert result["due"] == 3
+            assert result["budget"] == 2
+            # The viewed article goes first
+            assert refreshed[0] == 3 and len(refreshed) == 2
+            assert scheduler.remaining_budget() == 0
+            assert set(memory_service.client.hkeys("citations:schedule")) == {str(i) for i in refreshed}
+
+            # Refreshed articles are no longer due
+            assert len(scheduler.plan()) == 1
+
+    def test_run_without_transactions(self, memory_service):
+        """Test a run works on clients that reject transactional pipelines, like Redis Cluster."""
+        items = [{"id": i, "title": {"en": f"Paper {i}"}} for i in (1, 2)]
+        scheduler = self._scheduler(items)
+        backend = memory_service.client
+        pipeline = backend.pipeline
+
+        def non_transactional(transaction=True):
+            if transaction:
+                raise RuntimeError("Transactions are not supported in cluster mode")
+            return pipeline(transaction=False)
+
+        def process(batch, results, force, concurrency, on_result):
+            results["total"] += len(batch)
+            results["lookups"] += len(batch)
+
+        scheduler.tracker.process.side_effect = process
+
+        with patch.object(backend, 'pipeline', side_effect=non_transactional), \
+                patch('analytics.services.citation_scheduler.redis_service', memory_service):
+            result = scheduler.run(budget=5)
+
+            assert result["due"] == 2 and result["total"] == 2
+            assert backend.zcard("citations:queue") == 2
+            assert scheduler.remaining_budget(budget=5) == 3
+
+    def test_budget_is_reserved_before_lookups(self, memory_service):
+        """Test concurrent runs share the budget and unused reservations are refunded."""
+        import time
+        items = [{"id": i, "title": {"en": f"Paper {i}"}} for i in (1, 2, 3)]
+        scheduler = self._scheduler(items)
+
+        def process(batch, results, force, concurrency, on_result):
+            # Another run took part of the budget meanwhile
+            assert scheduler._reserve(5, 4, time.time()) == 1
+            results["total"] += 1
+            results["lookups"] += 1
+            raise RuntimeError("worker crashed")
+
+        scheduler.tracker.process.side_effect = process
+
+        with patch('analytics.services.citation_scheduler.redis_service', memory_service):
+            with pytest.raises(RuntimeError):
+                scheduler.run(budget=4)
+
+            # 3 reserved, 1 used; the other run's lookup stays charged
+            assert scheduler.remaining_budget(budget=4) == 2
+            assert scheduler._reserve(5, 4, time.time()) == 2
+            assert scheduler._reserve(1, 4, time.time()) == 0
+            assert scheduler.remaining_budget(budget=4) == 0
+
+
+class TestTitleIndex:
+    """Tests for canonical works of article titles."""
+
+    def test_normalize_title(self):
+        """Test markup, entities, accents, case and punctuation are ignored."""
+        from analytics.services.title_index import normalize_title, title_fingerprint
+
+        assert normalize_title("<i>Café</i> Networks &amp; Deep-Learning!") == "cafe networks deep learning"
+        assert title_fingerprint("Deep  Learning: A Survey") == title_fingerprint("deep learning a survey.")
+        assert title_fingerprint("  <b></b> ") is None
+
+    def test_near_duplicates_share_a_work(self, memory_service):
+        """Test close variants resolve to one work and distinct titles do not."""
+        from analytics.services.title_index import TitleIndex
+
+        index = TitleIndex()
+        title = "Machine learning approaches for crop yield prediction in East Africa"
+
+        with patch('analytics.services.title_index.redis_service', memory_service):
+            work = index.resolve(title, article_id=1)
+            assert index.resolve(title.upper() + ".", article_id=2) == work
+            assert index.resolve(title.replace("approaches", "approach"), article_id=3) == work
+            assert index.resolve("Soil moisture sensing with low-cost IoT devices", article_id=4) != work
+            assert index.articles(work) == ["1", "2", "3"]
+            assert index.find("MACHINE LEARNING APPROACHES for crop yield prediction in east africa") == work
+
+    def test_numbered_parts_and_other_authors_stay_apart(self, memory_service):
+        """Test similar titles of different papers are not merged."""
+        from analytics.services.title_index import TitleIndex
+
+        index = TitleIndex()
+        title = "Urban water supply and informal settlements in Dar es Salaam"
+
+        with patch('analytics.services.title_index.redis_service', memory_service):
+            part_one = index.resolve(f"{title}: Part I", author="Ada Lovelace")
+            assert index.resolve(f"{title}: Part II", author="Ada Lovelace") != part_one
+            census = index.resolve(f"{title} after the 2012 census")
+            assert index.resolve(f"{title} after the 2022 census") != census
+            assert index.resolve(f"{title}: part I.", author="A. Lovelace") == part_one
+            hopper = index.resolve(f"{title}: Part I", author="Grace Hopper")
+            assert hopper != part_one
+            assert index.find(f"{title}: Parts I", author="Grace Hopper") == hopper
+            assert index.find(f"{title}: Parts I", author="Alan Turing") is None
+
+    def test_generic_titles_by_other_authors_stay_apart(self, memory_service):
+        """Test exact title matches still need the same first author."""
+        from analytics.services.title_index import TitleIndex
+
+        index = TitleIndex()
+
+        with patch('analytics.services.title_index.redis_service', memory_service):
+            lovelace = index.resolve("Editorial", article_id=1, author="Ada Lovelace")
+            hopper = index.resolve("Editorial", article_id=2, author="Grace Hopper")
+
+            assert hopper != lovelace
+            assert index.resolve("<b>Editorial</b>", article_id=3, author="G. Hopper") == hopper
+            assert index.resolve("Editorial", article_id=4) == lovelace
+            assert index.find("Editorial", author="Grace Hopper") == hopper
+            assert index.find("Editorial", author="Alan Turing") is None
+            assert index.articles(lovelace) == ["1", "4"]
+            assert index.articles(hopper) == ["2", "3"]
+
+    def test_retitled_article_moves_to_its_new_work(self, memory_service):
+        """Test an article leaves its old work when its title changes."""
+        from analytics.services.title_index import TitleIndex
+
+        index = TitleIndex()
+
+        with patch('analytics.services.title_index.redis_service', memory_service):
+            old = index.resolve("Soil moisture sensing with low-cost IoT devices", article_id=1)
+            index.resolve("Soil moisture sensing with low-cost IoT devices", article_id=2)
+            new = index.resolve("Rainfall forecasting with satellite imagery", article_id=1)
+
+            assert new != old
+            assert index.articles(old) == ["2"]
+            assert index.articles(new) == ["1"]
+            assert index.article_works()["1"] == new
+
+    def test_citation_results_are_shared_per_work(self, memory_service):
+        """Test articles of one work reuse its cached citation lookup."""
+        from analytics.services.citation_service import CitationService
+        from analytics.services.title_index import TitleIndex
+
+        index = TitleIndex()
+        citations = CitationService()
+        citations.search_citations = Mock(return_value={"citation_count": 2, "search_time": "2024-01-01"})
+
+        with patch('analytics.services.title_index.redis_service', memory_service), \
+                patch('analytics.services.redis_service.redis_service', memory_service):
+            first = citations.get_article_citations("Deep Learning: A Survey", article_id=1)
+            second = citations.get_article_citations("<em>Deep learning</em> - a survey", article_id=2)
+
+        assert citations.search_citations.call_count == 1
+        assert second == first
+        with patch('analytics.services.title_index.redis_service', memory_service):
+            assert index.articles(first["work_id"]) == ["1", "2"]
+
+
+class TestCitationHistory:
+    """Tests for daily citation series and citing-work diffs."""
+
+    def test_records_series_and_diffs(self, memory_service):
+        """Test counts are kept per day and only changes are stored."""
+        from datetime import datetime
+        from analytics.services.cache_codec import cache_codec
+        from analytics.services.citation_history import CitationHistory
+
+        history = CitationHistory()
+
+        def result(*links):
+            return {
+                "citation_count": len(links),
+                "total_results": len(links),
+                "citations": [{"title": f"Work {link}", "link": f"https://x/{link}"} for link in links],
+            }
+
+        with patch('analytics.services.citation_history.redis_service', memory_service):
+            history.record(["1"], result("a", "b"), now=datetime(2024, 3, 1))
+            history.record(["1"], result("a", "b"), now=datetime(2024, 3, 2))
+            blob = cache_codec.decode(memory_service.raw_client.hget("article:1:citations", "data"))
+            history.record(["1"], result("a", "c"), now=datetime(2024, 3, 3))
+
+            series = history.get_trajectories(["1", "2"], days=30, now=datetime(2024, 3, 10))
+            assert series["1"] == [
+                {"date": "2024-03-01", "citation_count": 2},
+                {"date": "2024-03-02", "citation_count": 2},
+                {"date": "2024-03-03", "citation_count": 2},
+            ]
+            assert series["2"] == []
+
+            # The first refresh is the baseline and unchanged days store nothing
+            diffs = history.get_diffs("1")
+            assert [d["date"] for d in diffs] == ["2024-03-03"]
+            assert [w["title"] for w in diffs[0]["added"]] == ["Work c"]
+            assert len(diffs[0]["removed"]) == 1
+            # Citing works live in the citation graph, not in the result blob
+            assert blob == {"citation_count": 2, "total_results": 2}
+
+
+class TestStoredCitations:
+    """Tests for batched reads of stored citations."""
+
+    def test_reads_counts_without_searching(self, memory_service):
+        """Test stored citations come from one pipeline and misses are not searched."""
+        from analytics.services.citation_service import CitationService
+
+        memory_service.client.hset("article:1:citations", mapping={
+            "citation_count": 5,
+            "total_results": 2,
+            "last_updated": "2024-03-01T00:00:00",
+            "data": json.dumps({"citations": [{"title": "Citing work"}]}),
+        })
+        citations = CitationService()
+        citations.search_citations = Mock()
+
+        with patch('analytics.services.redis_service.redis_service', memory_service):
+            counts = citations.get_stored_citations(["1", "2", "1"])
+            full = citations.get_stored_citations(["1"], full=True)
+
+        assert counts == {
+            "1": {"citation_count": 5, "total_results": 2, "last_updated": "2024-03-01T00:00:00"},
+            "2": None,
+        }
+        assert full["1"]["citations"] == [{"title": "Citing work"}]
+        citations.search_citations.assert_not_called()
+
+
+class TestCitationGraph:
+    """Tests for the citation graph built from citation refreshes."""
+
+    def test_cited_by_co_citation_and_venues(self, memory_service):
+        """Test shared citing works are stored once and queried as sets."""
+        from analytics.services.citation_graph import CitationGraph
+        from analytics.services.citation_history import CitationHistory, citing_work_id
+        from analytics.services.citation_service import CitationService
+
+        history, graph = CitationHistory(), CitationGraph()
+        review = {"title": "A review", "link": "https://x/review", "venue": "Nature", "cited_by": 50}
+        thesis = {"title": "A thesis", "link": "https://x/thesis", "venue": "Arxiv", "cited_by": 1}
+
+        def result(*citations):
+            return {"citation_count": 1, "total_results": len(citations), "citations": list(citations)}
+
+        with patch('analytics.services.citation_history.redis_service', memory_service), \
+                patch('analytics.services.citation_graph.redis_service', memory_service), \
+                patch('analytics.services.redis_service.redis_service', memory_service):
+            history.record(["1"], result(review, thesis))
+            history.record(["2"], result(review))
+            history.record(["3"], result(review))
+
+            assert [w["title"] for w in graph.cited_by("1")] == ["A review", "A thesis"]
+            assert graph.get_work(citing_work_id(review))["cites"] == ["1", "2", "3"]
+            assert len(memory_service.client.hgetall("citing:works")) == 2
+            assert graph.co_cited("1") == [
+                {"article_id": "2", "shared_citing_works": 1},
+                {"article_id": "3", "shared_citing_works": 1},
+            ]
+            assert graph.top_venues() == [
+                {"venue": "Nature", "citations": 3},
+                {"venue": "Arxiv", "citations": 1},
+            ]
+            assert graph.top_venues(["1"]) == [
+                {"venue": "Arxiv", "citations": 1},
+                {"venue": "Nature", "citations": 1},
+            ]
+
+            # Article 3 is no longer cited by the review
+            history.record(["3"], result())
+            assert graph.get_work(citing_work_id(review))["cites"] == ["1", "2"]
+            assert graph.top_venues(limit=1) == [{"venue": "Nature", "citations": 2}]
+
+            stored = CitationService().get_stored_citations(["1", "2"], full=True)
+            assert [w["title"] for w in stored["1"]["citations"]] == ["A review", "A thesis"]
+            assert [w["title"] for w in stored["2"]["citations"]] == ["A review"]
+
+    def test_removed_and_expired_articles_are_unlinked(self, memory_service):
+        """Test removed articles and expired edges leave no trace in the graph."""
+        from datetime import datetime, timedelta
+        from analytics.services.citation_graph import CitationGraph
+        from analytics.services.citation_history import CitationHistory, citing_work_id
+
+        history, graph = CitationHistory(), CitationGraph()
+        review = {"title": "A review", "link": "https://x/review", "venue": "Nature"}
+        thesis = {"title": "A thesis", "link": "https://x/thesis", "venue": "Arxiv"}
+        result = {"citation_count": 2, "total_results": 2, "citations": [review, thesis]}
+        start = datetime(2024, 3, 1)
+
+        with patch('analytics.services.citation_history.redis_service', memory_service), \
+                patch('analytics.services.citation_graph.redis_service', memory_service):
+            history.record(["1", "2"], result, now=start)
+            history.record(["3"], {**result, "citations": [thesis]}, now=start + timedelta(days=300))
+
+            graph.unlink_articles(["2"])
+            assert graph.get_work(citing_work_id(review))["cites"] == ["1"]
+            assert graph.co_cited("1") == [{"article_id": "3", "shared_citing_works": 1}]
+
+            # Article 1 was not refreshed for a year; article 3 was
+            history.record(["3"], {**result, "citations": [thesis]}, now=start + timedelta(days=400))
+            assert graph.get_work(citing_work_id(review)) is None
+            assert graph.get_work(citing_work_id(thesis))["cites"] == ["3"]
+            assert graph.top_venues() == [{"venue": "Arxiv", "citations": 1}]
+
+            # A re-baselined article counts its venues once
+            history.record(["1"], result, now=start + timedelta(days=401))
+            assert graph.top_venues() == [
+                {"venue": "Arxiv", "citations": 2},
+                {"venue": "Nature", "citations": 1},
+            ]
+
+
+class TestAuthorIndex:
+    """Tests for incrementally maintained author metrics."""
+
+    def test_h_index_follows_citation_changes(self, memory_service):
+        """Test h-index, i10 and totals match a full recount after each change."""
+        import random
+        from analytics.services.author_index import AuthorIndex
+
+        index = AuthorIndex()
+        ada = {"fullName": "Ada Lovelace", "orcid": "https://orcid.org/0000-0001"}
+        articles = [{"id": i, "authors": [ada]} for i in range(1, 16)]
+        counts = {str(i): 0 for i in range(1, 16)}
+        rng = random.Random(7)
+
+        with patch('analytics.services.author_index.redis_service', memory_service):
+            index.index_articles(articles)
+            for _ in range(60):
+                article_id = rng.choice(list(counts))
+                counts[article_id] = rng.randint(0, 25)
+                index.update_citations(article_id, counts[article_id])
+
+                ranked = sorted(counts.values(), reverse=True)
+                expected_h = sum(1 for i, c in enumerate(ranked, 1) if c >= i)
+                author = index.get_author("orcid:0000-0001")
+                assert author["h_index"] == expected_h
+                assert author["i10_index"] == sum(1 for c in ranked if c >= 10)
+                assert author["citations"] == sum(ranked)
+
+    def test_authors_aggregate_across_articles(self, memory_service):
+        """Test authors are keyed by ORCID or name and lose removed articles."""
+        from analytics.services.author_index import AuthorIndex
+
+        index = AuthorIndex()
+        memory_service.increment_article_views("1")
+        memory_service.increment_article_downloads("2")
+        memory_service.client.hset("article:2:citations", "citation_count", 4)
+        grace = {"fullName": {"en_US": "Grace  Hopper"}}
+        alan = {"fullName": "Alan Turing", "orcid": "0000-0002"}
+
+        with patch('analytics.services.author_index.redis_service', memory_service), \
+                patch('analytics.services.redis_service.redis_service', memory_service):
+            index.index_articles([
+                {"id": 1, "authors": [grace, alan]},
+                {"id": 2, "publications": [{"authors": [grace]}]},
+            ])
+
+            author = index.get_author("name:grace hopper")
+            assert author["name"] == "Grace  Hopper"
+            assert author["views"] == 1 and author["downloads"] == 1
+            assert author["citations"] == 4 and author["h_index"] == 1
+            assert [a["article_id"] for a in author["articles"]] == ["2", "1"]
+            assert [a["key"] for a in index.top_authors("citations")][0] == "name:grace hopper"
+
+            index.remove_articles(["2"])
+            author = index.get_author("name:grace hopper")
+            assert author["citations"] == 0 and author["h_index"] == 0
+            assert index.get_author("orcid:0000-0002")["articles"][0]["article_id"] == "1"
+
+
+class TestImpactMetrics:
+    """Tests for the vectorized journal impact metrics."""
+
+    def test_impact_factor_and_sections(self, memory_service):
+        """Test impact factors count citing years against publication years."""
+        pytest.importorskip("numpy")
+        from analytics.services.citation_history import CitationHistory
+        from analytics.services.impact_metrics import JournalImpactMetrics
+
+        articles = [
+            {"id": 1, "sectionId": 10, "datePublished": "2021-03-01"},
+            {"id": 2, "sectionId": 10, "datePublished": "2022-05-01"},
+            {"id": 3, "sectionId": 20, "datePublished": "2022-07-01"},
+            {"id": 4, "datePublished": "2023-01-01"},
+        ]
+        sections = [{"id": 10, "title": {"en_US": "Articles"}}, {"id": 20, "title": "Reviews"}]
+
+        def work(name, year):
+            return {"title": name, "link": f"https://x/{name}", "year": year}
+
+        def result(*citations):
+            return {"citation_count": len(citations), "citations": list(citations)}
+
+        history = CitationHistory()
+        with patch('analytics.services.citation_history.redis_service', memory_service), \
+                patch('analytics.services.citation_graph.redis_service', memory_service), \
+                patch('analytics.services.author_index.redis_service', memory_service), \
+                patch('analytics.services.impact_metrics.redis_service', memory_service), \
+                patch('analytics.services.impact_metrics.ojs_mirror') as mirror:
+            mirror.get_articles.return_value = articles
+            mirror.get_sections.return_value = sections
+            history.record(["1"], result(work("a", "2023"), work("b", "2022"), work("c", "2023")))
+            history.record(["2"], result(work("a", "2023"), work("d", "2024")))
+            history.record(["3"], result(work("e", "2024")))
+
+            metrics = JournalImpactMetrics().run("journal")
+            stored = JournalImpactMetrics().get("journal")
+
+        assert metrics["articles"] == 4 and metrics["citations"] == 6
+        # 2023: articles of 2021-2022 (3) cited 3 times in 2023
+        assert metrics["impact_factor"]["2023"] == {
+            "citations": 3, "citable_items": 3, "impact_factor": 1.0,
+        }
+        # 2024: articles of 2022-2023 (3) cited twice in 2024
+        assert metrics["impact_factor"]["2024"]["impact_factor"] == 0.667
+        assert metrics["five_year_impact_factor"]["2024"]["citable_items"] == 4
+        assert metrics["sections"] == [
+            {"section_id": "10", "title": "Articles", "articles": 2, "citations": 5,
+             "citations_per_article": 2.5, "cited_articles": 2, "max_citations": 3},
+            {"section_id": "20", "title": "Reviews", "articles": 1, "citations": 1,
+             "citations_per_article": 1.0, "cited_articles": 1, "max_citations": 1},
+            {"section_id": None, "title": "", "articles": 1, "citations": 0,
+             "citations_per_article": 0.0, "cited_articles": 0, "max_citations": 0},
+        ]
+        assert stored == metrics
+
+    def test_sections_of_publications(self, memory_service):
+        """Test the section comes from the latest publication in OJS 3.x data."""
+        pytest.importorskip("numpy")
+        from analytics.services.impact_metrics import JournalImpactMetrics, UNASSIGNED
+
+        articles = [
+            {"id": 1, "publications": [
+                {"sectionId": 10, "datePublished": "2021-03-01"},
+                {"sectionId": 20, "datePublished": "2021-03-01"},
+            ]},
+            {"id": 2, "sectionId": 10, "publications": [{"sectionId": 20}]},
+            {"id": 3, "publications": []},
+        ]
+
+        with patch('analytics.services.impact_metrics.redis_service', memory_service), \
+                patch('analytics.services.impact_metrics.ojs_mirror') as mirror:
+            mirror.get_articles.return_value = articles
+            mirror.get_sections.return_value = [{"id": 10, "title": "Articles"}, {"id": 20, "title": "Reviews"}]
+            data = JournalImpactMetrics().load("journal")
+
+        assert [data["section_ids"][i] for i in data["section"]] == ["20", "10", UNASSIGNED]
+        assert data["pub_year"].tolist() == [2021, 0, 0]
+
+    def test_requires_redis(self):
+        """Test metrics are not computed without a Redis client."""
+        from analytics.services.impact_metrics import JournalImpactMetrics, ImpactMetricsError
+
+        with patch('analytics.services.impact_metrics.redis_service') as mock_service, \
+                patch('analytics.services.impact_metrics.np', object()), \
+                patch('analytics.services.impact_metrics.ojs_mirror') as mirror:
+            mock_service.client = None
+            mirror.get_articles.return_value = []
+            with pytest.raises(ImpactMetricsError):
+                JournalImpactMetrics().run("journal")
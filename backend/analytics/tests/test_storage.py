@@ -0,0 +1,369 @@
+"""
+Tests for storage backends.
+"""
+
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+
+class TestInMemoryBackend:
+    """Tests for InMemoryBackend."""
+
+    def test_counters_and_ttl(self):
+        """Test string counters and key expiry."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        assert backend.incrby("views", 2) == 2
+        assert backend.incrby("views", 3) == 5
+        assert backend.get("views") == "5"
+
+        backend.setex("cached", 1, "value")
+        assert backend.ttl("cached") == 1
+        with patch("analytics.services.storage_backends.time.monotonic", return_value=time.monotonic() + 2):
+            assert backend.get("cached") is None
+            assert backend.exists("cached") == 0
+
+    def test_sorted_set_ranges(self):
+        """Test sorted set ordering and rank trimming match Redis."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        backend.zadd("z", {"a": 1, "b": 3, "c": 2})
+        backend.zincrby("z", 5, "a")
+
+        assert backend.zrevrange("z", 0, 1, withscores=True) == [("a", 6.0), ("b", 3.0)]
+        assert backend.zcount("z", 2, "+inf") == 3
+        assert backend.zcount("z", "(2", "+inf") == 2
+
+        # Keep only the top 2, like update_trending does with -101
+        assert backend.zremrangebyrank("z", 0, -3) == 1
+        assert backend.zrevrange("z", 0, -1) == ["a", "b"]
+
+    def test_pipeline_and_pubsub(self):
+        """Test pipelines return results in order and pub/sub delivers."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        pubsub = backend.pubsub()
+        pubsub.subscribe("events")
+
+        pipe = backend.pipeline(transaction=False)
+        pipe.hincrby("h", "f", 2)
+        pipe.hset("h", mapping={"g": 1})
+        pipe.hmget("h", ["f", "g", "missing"])
+        assert pipe.execute() == [2, 1, ["2", "1", None]]
+        assert backend.hlen("h") == 2
+        assert backend.hlen("missing") == 0
+
+        assert backend.publish("events", "hello") == 1
+        message = pubsub.get_message(ignore_subscribe_messages=True)
+        assert message["data"] == "hello"
+
+    def test_consumer_group_delivery_ack_and_claim(self):
+        """Test XREADGROUP, XACK and XAUTOCLAIM follow Redis semantics."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        backend.xgroup_create("s", "g", id="0", mkstream=True)
+        with pytest.raises(ValueError, match="BUSYGROUP"):
+            backend.xgroup_create("s", "g", id="0")
+        first = backend.xadd("s", {"n": 1})
+        second = backend.xadd("s", {"n": 2})
+
+        assert backend.xreadgroup("g", "a", {"s": ">"}, count=1) == [["s", [(first, {"n": "1"})]]]
+        assert backend.xreadgroup("g", "b", {"s": ">"}, block=10) == [["s", [(second, {"n": "2"})]]]
+        assert backend.xreadgroup("g", "a", {"s": ">"}, block=10) == []
+        # Consumer history: entries delivered but not acknowledged
+        assert backend.xreadgroup("g", "a", {"s": "0"}) == [["s", [(first, {"n": "1"})]]]
+
+        assert backend.xack("s", "g", second, "0-1") == 1
+        assert backend.xautoclaim("s", "g", "c", 0) == ["0-0", [(first, {"n": "1"})], []]
+        assert backend.xreadgroup("g", "c", {"s": "0"}) == [["s", [(first, {"n": "1"})]]]
+
+        backend.xadd("s", {"n": 3}, maxlen=1)
+        assert backend.xautoclaim("s", "g", "c", 0) == ["0-0", [], [first]]
+
+    def test_reads_without_group_are_rejected(self):
+        """Test reading through a missing group raises like NOGROUP."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        with pytest.raises(ValueError, match="NOGROUP"):
+            backend.xreadgroup("g", "a", {"s": ">"})
+
+    def test_mget_nonatomic(self):
+        """Test the cluster-safe MGET reads like MGET on one node."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        backend.set("a", 1)
+        assert backend.mget_nonatomic(["a", "b"]) == ["1", None]
+
+    def test_wrong_type_is_rejected(self):
+        """Test type errors mirror Redis WRONGTYPE errors."""
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        backend.hset("h", "f", 1)
+        with pytest.raises(TypeError):
+            backend.get("h")
+
+
+class TestStorageBackendContract:
+    """Tests for the StorageBackend interface."""
+
+    def test_backends_implement_every_command(self):
+        """Test both backends implement the whole abstract interface."""
+        from analytics.services.storage_backends import (
+            InMemoryBackend, RedisBackend, StorageBackend,
+        )
+
+        with pytest.raises(TypeError):
+            StorageBackend()
+        InMemoryBackend()
+        RedisBackend(Mock())
+
+    def test_mget_nonatomic_uses_cluster_client(self):
+        """Test RedisBackend prefers the cluster client's per-slot MGET."""
+        from analytics.services.storage_backends import RedisBackend
+
+        single = Mock(spec=["mget"])
+        single.mget.return_value = ["1"]
+        assert RedisBackend(single).mget_nonatomic(["a"]) == ["1"]
+
+        cluster = Mock()
+        RedisBackend(cluster).mget_nonatomic(["a"])
+        cluster.mget_nonatomic.assert_called_once_with(["a"])
+        cluster.mget.assert_not_called()
+
+    def test_event_worker_on_memory_backend(self, memory_service):
+        """Test the stream worker runs end to end without Redis."""
+        from analytics.services.event_stream import EventStreamWorker, EVENT_STREAM_KEY
+
+        with patch('analytics.services.event_stream.redis_service', memory_service):
+            worker = EventStreamWorker(block_ms=10, broadcast=False)
+            worker.ensure_group()
+            worker.ensure_group()
+            memory_service.append_event({"type": "view", "article_id": "1"})
+            memory_service.append_event({"type": "download", "article_id": "1"})
+
+            assert worker.run_once() == 2
+            assert worker.run_once() == 0
+            assert worker.claim_stale(min_idle_ms=0) == 0
+            assert len(memory_service.client.xrange(EVENT_STREAM_KEY)) == 2
+
+
+class TestRedisServiceOnMemoryBackend:
+    """Tests running RedisService logic end to end without Redis."""
+
+    def test_tracking_counters_and_trending(self, memory_service):
+        """Test views, downloads, trending and totals."""
+        for _ in range(3):
+            memory_service.increment_article_views("1")
+            memory_service.update_trending("1")
+        memory_service.increment_article_views("2")
+        memory_service.update_trending("2")
+        memory_service.increment_article_downloads("1")
+
+        assert memory_service.get_article_views("1") == 3
+        assert memory_service.get_total_views() == 4
+        assert memory_service.get_total_downloads() == 1
+        assert memory_service.get_trending_articles(limit=1) == [
+            {"article_id": "1", "score": 3}
+        ]
+
+    def test_hash_layout_totals(self, memory_service):
+        """Test the packed counter layout on real data structures."""
+        with patch('analytics.services.redis_service.settings') as mock_settings:
+            mock_settings.REDIS_COUNTER_LAYOUT = "hash"
+            mock_settings.REDIS_COUNTER_BUCKET_SIZE = 64
+
+            memory_service.increment_article_views("1")
+            memory_service.increment_article_views("100")
+            memory_service.increment_article_downloads("100")
+
+            assert memory_service.get_article_views("100") == 1
+            assert memory_service.get_total_views() == 2
+            assert memory_service.get_total_downloads() == 1
+
+    def test_cache_round_trip(self, memory_service):
+        """Test JSON caching."""
+        memory_service.cache_set("k", {"a": [1, 2]}, ttl=60)
+
+        assert memory_service.cache_get("k") == {"a": [1, 2]}
+        memory_service.cache_delete("k")
+        assert memory_service.cache_get("k") is None
+
+    def test_cache_reads_legacy_json(self, memory_service):
+        """Test entries written as JSON text before the codec still decode."""
+        memory_service.client.setex("legacy", 60, '{"a": [1, 2]}')
+
+        assert memory_service.cache_get("legacy") == {"a": [1, 2]}
+
+
+class TestCacheCodec:
+    """Tests for the binary cache codec."""
+
+    @pytest.mark.parametrize("serializer", ["json", "msgpack"])
+    def test_round_trip_and_compression(self, serializer):
+        """Test large values are compressed and small ones are not."""
+        from analytics.services.cache_codec import CacheCodec, FLAG_ZLIB
+
+        codec = CacheCodec(serializer=serializer, compress_threshold=256)
+        small = {"title": "Deep learning", "count": 3}
+        large = {"citations": [{"title": f"Work {i}", "snippet": "lorem ipsum " * 10} for i in range(50)]}
+
+        encoded = codec.encode(small)
+        assert encoded[:2] == b"\x00\x01" and not encoded[2] & FLAG_ZLIB
+        assert codec.decode(encoded) == small
+
+        encoded = codec.encode(large)
+        assert encoded[2] & FLAG_ZLIB
+        assert len(encoded) < len(str(large)) // 4
+        assert codec.decode(encoded) == large
+
+    def test_unknown_version_is_rejected(self):
+        """Test values from a newer codec version are not misread."""
+        from analytics.services.cache_codec import CacheCodec, CodecError
+
+        with pytest.raises(CodecError):
+            CacheCodec().decode(b"\x00\x09\x00{}")
+
+    def test_binary_values_in_memory_backend(self, memory_service):
+        """Test binary values are kept as bytes and read through the raw view."""
+        from analytics.services.cache_codec import CacheCodec
+
+        value = CacheCodec(serializer="json", compress_threshold=0).encode({"a": 1})
+        memory_service.client.hset("h", mapping={"data": value, "count": 2})
+
+        assert memory_service.raw_client.hget("h", "data") == value
+        assert memory_service.raw_client.hmget("h", ["count"]) == [b"2"]
+        assert memory_service.client.hget("h", "count") == "2"
+
+
+class TestLocalCache:
+    """Tests for the in-process cache tier."""
+
+    def test_lru_eviction_and_expiry(self):
+        """Test the least recently used entry goes first and entries expire."""
+        from analytics.services.local_cache import LocalCache, MISSING
+
+        cache = LocalCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        cache.set("c", 3, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("c") is MISSING
+        assert cache.stats()["evictions"] == 1
+
+    def test_tiers_report_hit_ratios(self, memory_service):
+        """Test repeated reads are served locally and counted per tier."""
+        from analytics.services.cache_codec import cache_codec
+
+        memory_service.client.setex("k", 60, cache_codec.encode({"a": 1}))
+        for _ in range(4):
+            assert memory_service.cache_get("k") == {"a": 1}
+        assert memory_service.cache_get("missing") is None
+
+        stats = memory_service.cache_stats()
+        assert stats["local"]["hits"] == 3 and stats["local"]["misses"] == 2
+        assert stats["redis"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+        memory_service.cache_set("k", {"a": 2}, ttl=60)
+        assert memory_service.cache_get("k") == {"a": 2}
+
+    def test_invalidations_from_other_workers(self):
+        """Test keys published by another process are dropped locally."""
+        from analytics.services.local_cache import (
+            LocalCache, InvalidationListener, INVALIDATION_CHANNEL, MISSING,
+        )
+        from analytics.services.storage_backends import InMemoryBackend
+
+        backend = InMemoryBackend()
+        cache = LocalCache(max_entries=10, ttl=60)
+        listener = InvalidationListener(cache, backend.pubsub)
+        other = InvalidationListener(LocalCache(), backend.pubsub)
+        cache.set("mine", 1)
+        cache.set("theirs", 2)
+        listener.start()
+
+        deadline = time.monotonic() + 2
+        while not backend._subscribers.get(INVALIDATION_CHANNEL) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        backend.publish(INVALIDATION_CHANNEL, listener.message(["mine"]))
+        backend.publish(INVALIDATION_CHANNEL, other.message(["theirs"]))
+        while cache.get("theirs") is not MISSING and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert cache.get("theirs") is MISSING
+        assert cache.get("mine") == 1
+        assert cache.stats()["invalidations"] == 1
+
+
+class TestCacheFill:
+    """Tests for single-flight cache fills with early refresh."""
+
+    def test_concurrent_misses_compute_once(self, memory_service):
+        """Test one thread computes a missing value while the others wait."""
+        import threading
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"report": 1}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(memory_service.cache_fill("r", compute, ttl=60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{"report": 1}] * 8
+
+    def test_early_refresh_near_expiry(self, memory_service):
+        """Test a live entry is recomputed once its early-refresh roll hits."""
+        memory_service.cache_set("r", {"value": "old", "delta": 1.0, "expires": time.time() + 600}, 600)
+
+        with patch('analytics.services.redis_service.should_refresh_early', return_value=False):
+            assert memory_service.cache_fill("r", lambda: "new") == "old"
+        with patch('analytics.services.redis_service.should_refresh_early', return_value=True):
+            assert memory_service.cache_fill("r", lambda: "new") == "new"
+        assert memory_service.cache_get("r")["value"] == "new"
+
+    def test_other_process_holds_the_lock(self, memory_service):
+        """Test callers keep the current value while another process refreshes."""
+        memory_service.cache_set("r", {"value": "old", "delta": 1.0, "expires": time.time() + 1}, 600)
+        memory_service.client.set("r:fill_lock", "other", nx=True, px=5000)
+
+        with patch('analytics.services.redis_service.should_refresh_early', return_value=True):
+            assert memory_service.cache_fill("r", lambda: "new") == "old"
+
+    def test_failed_results_are_not_cached(self, memory_service):
+        """Test values rejected by ``cacheable`` are recomputed next time."""
+        assert memory_service.cache_fill("r", lambda: {"kpi": None}, cacheable=lambda v: v["kpi"]) == {"kpi": None}
+        assert memory_service.cache_get("r") is None
+        assert memory_service.cache_fill("r", lambda: None) is None
+
+    def test_xfetch_probability(self):
+        """Test early refresh gets likelier close to expiry."""
+        from analytics.services.single_flight import should_refresh_early
+
+        entry = {"delta": 2.0, "expires": 1000.0}
+        assert not should_refresh_early(entry, 1.0, now=900.0, rand=0.5)
+        assert should_refresh_early(entry, 1.0, now=999.0, rand=0.5)
+        assert should_refresh_early(entry, 1.0, now=1000.0, rand=1.0)
+        assert not should_refresh_early(entry, 0.0, now=999.9, rand=0.001)
@@ -197,6 +197,61 @@ class TestTrending:
             assert response.status_code == 200
             assert len(response.data['trending']) == 2
 
+    def test_trending_hydrated(self):
+        """Test trending rows carry article metadata when asked to."""
+        from analytics.views import trending
+
+        with patch('analytics.views.redis_service') as mock_redis, \
+                patch('analytics.views.article_metadata') as mock_metadata:
+            rows = [{"article_id": "1", "score": 100}]
+            mock_redis.get_trending_articles.return_value = rows
+            mock_metadata.hydrate.return_value = [
+                {"article_id": "1", "score": 100, "article": {"title": "Deep Learning"}},
+            ]
+
+            from rest_framework.test import APIRequestFactory
+            factory = APIRequestFactory()
+            request = factory.get('/api/trending', {'hydrate': 'true'})
+            response = trending(request)
+
+            assert response.status_code == 200
+            assert response.data['trending'][0]['article'] == {"title": "Deep Learning"}
+            mock_metadata.hydrate.assert_called_once_with(rows)
+
+
+class TestTimeSeries:
+    """Tests for the time series endpoint."""
+
+    def _get(self, params):
+        from analytics.views import time_series
+        from rest_framework.test import APIRequestFactory
+
+        with patch('analytics.views.redis_service') as mock_redis:
+            mock_redis.get_time_series.return_value = {}
+            request = APIRequestFactory().get('/api/time-series', params)
+            return time_series(request), mock_redis
+
+    def test_non_integer_range_is_rejected(self):
+        """Test a non-integer hours or days value is a 400, not a 500."""
+        response, mock_redis = self._get({'hours': 'abc'})
+        assert response.status_code == 400
+        response, mock_redis = self._get({'article_id': '1', 'days': '1.5'})
+        assert response.status_code == 400
+        mock_redis.get_time_series.assert_not_called()
+
+    @override_settings(TIME_SERIES_MAX_HOURS=48, TIME_SERIES_MAX_DAYS=10)
+    def test_range_is_clamped(self):
+        """Test oversized and non-positive ranges are clamped."""
+        response, _ = self._get({'hours': '10000000'})
+        assert response.status_code == 200
+        assert len(response.data['series']) == 48
+
+        response, _ = self._get({'article_id': '1', 'days': '500'})
+        assert len(response.data['series']) == 10
+
+        response, _ = self._get({'hours': '-5'})
+        assert len(response.data['series']) == 1
+
 
 class TestGeoHeatmap:
     """Tests for geo heatmap endpoint."""
@@ -222,3 +277,32 @@ class TestGeoHeatmap:
             assert response.status_code == 200
             assert 'matomo' in response.data
             assert 'redis' in response.data
+
+
+class TestArticleCitations:
+    """Tests for article citations endpoint."""
+
+    def test_journal_is_found_through_mirror(self):
+        """Test journal_path is optional for articles in the OJS mirror."""
+        from analytics.views import article_citations
+
+        with patch('analytics.views.redis_service') as mock_redis, \
+                patch('analytics.views.ojs_mirror') as mock_mirror, \
+                patch('analytics.views.citation_service') as mock_citations:
+            mock_redis.raw_client.hmget.return_value = [None, None, None, None]
+            mock_mirror.journal_for_article.return_value = "innovative-minds"
+            mock_mirror.get_article.return_value = {
+                "title": {"en": "Deep Learning"},
+                "authors": [{"fullName": "Ada Lovelace"}],
+            }
+            mock_citations.get_article_citations.return_value = {"citation_count": 4}
+
+            from rest_framework.test import APIRequestFactory
+            factory = APIRequestFactory()
+            request = factory.get('/api/citations/article/42')
+            response = article_citations(request, "42")
+
+            assert response.status_code == 200
+            assert response.data['citation_count'] == 4
+            mock_mirror.get_article.assert_called_once_with(42, "innovative-minds")
+            assert mock_citations.get_article_citations.call_args.kwargs['journal'] == "innovative-minds"
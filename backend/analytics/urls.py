@@ -40,12 +40,20 @@ urlpatterns = [
     # Trending
     path('trending', views.trending, name='trending'),
 
+    # Time series derived from the event stream
+    path('timeseries', views.time_series, name='time_series'),
+
     # Tracking
     path('track/view', views.track_article_view, name='track_view'),
     path('track/download', views.track_article_download, name='track_download'),
 
     # Article metrics
     path('article/<str:article_id>/metrics', views.article_metrics, name='article_metrics'),
+    path('articles/analytics', views.articles_analytics, name='articles_analytics'),
+
+    # Authors
+    path('authors', views.authors, name='authors'),
+    path('authors/<str:author_key>', views.author_detail, name='author_detail'),
 
     # OJS Content Proxy
     path('ojs/journals', views.ojs_journals, name='ojs_journals'),
@@ -60,6 +68,12 @@ urlpatterns = [
     # Citations
     path('citations/search', views.search_citations, name='search_citations'),
     path('citations/article/<str:article_id>', views.article_citations, name='article_citations'),
+    path('citations/article/<str:article_id>/cited-by', views.article_cited_by, name='article_cited_by'),
+    path('citations/article/<str:article_id>/co-cited', views.article_co_cited, name='article_co_cited'),
+    path('citations/works/<str:work_id>', views.citing_work, name='citing_work'),
+    path('citations/venues', views.citing_venues, name='citing_venues'),
+    path('citations/batch', views.citations_batch, name='citations_batch'),
+    path('citations/trajectories', views.citation_trajectories, name='citation_trajectories'),
     path('citations/update', views.update_citations, name='update_citations'),
 
     # All Metrics (Combined Dashboard)
@@ -3,13 +3,26 @@ API Views for analytics endpoints.
 """
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.conf import settings
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from .services import redis_service, matomo_service, ojs_service
-from .services.citation_service import citation_service, citation_tracker
+from .services.event_stream import hour_bucket, day_bucket
+from .services.redis_service import article_key
+from .services.citation_service import citation_service
+from .services.citation_scheduler import citation_scheduler
+from .services.citation_history import citation_history
+from .services.citation_graph import citation_graph
+from .services.author_index import author_index
+from .services.ojs_mirror import ojs_mirror
+from .services.ojs_projection import shape_response
+from .services.article_metadata import article_metadata
+from .services.article_aggregator import article_aggregator
+from .services.impact_metrics import impact_metrics
+from .services.cache_codec import cache_codec
 from .serializers import (
     DashboardSerializer,
     TrendingArticleSerializer,
@@ -31,7 +44,9 @@ def health_check(request):
             "redis": redis_service.is_connected(),
             "matomo": matomo_service.is_configured,
             "ojs": ojs_service.is_configured,
-        }
+        },
+        "ojs_conditional_requests": ojs_service.validators.stats(),
+        "cache": redis_service.cache_stats(),
     })
 
 
@@ -45,6 +60,7 @@ def dashboard(request):
     Query params:
     - period: day, week, month, year (default: month)
     - date: today, yesterday, YYYY-MM-DD (default: today)
+    - hydrate: include article metadata in trending (default: false)
     """
     period = request.query_params.get('period', 'month')
     date = request.query_params.get('date', 'today')
@@ -62,6 +78,8 @@ def dashboard(request):
 
     # Get trending from Redis
     trending = redis_service.get_trending_articles(limit=10)
+    if _wants_hydration(request):
+        trending = article_metadata.hydrate(trending)
 
     # Combine data
     data = {
@@ -145,12 +163,21 @@ def top_articles(request):
     - period: day, week, month, year (default: week)
     - date: today, yesterday, YYYY-MM-DD (default: today)
     - limit: number of results (default: 20)
+    - offset: rows to skip, for pagination (default: 0)
+    - sort: numeric column to sort by, e.g. nb_visits (default: Matomo's order)
+    - order: asc or desc (default: desc)
     """
     period = request.query_params.get('period', 'week')
     date = request.query_params.get('date', 'today')
     limit = int(request.query_params.get('limit', 20))
+    offset = int(request.query_params.get('offset', 0))
 
-    articles = matomo_service.get_top_articles(period, date, limit)
+    articles = matomo_service.get_top_articles(
+        period, date, limit,
+        offset=offset,
+        sort=request.query_params.get('sort'),
+        order=request.query_params.get('order', 'desc'),
+    )
 
     if articles is None:
         return Response(
@@ -158,7 +185,7 @@ def top_articles(request):
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
 
-    return Response({"articles": articles})
+    return Response({"articles": articles, "limit": limit, "offset": offset})
 
 
 @api_view(['GET'])
@@ -170,12 +197,21 @@ def downloads(request):
     - period: day, week, month, year (default: month)
     - date: today, yesterday, YYYY-MM-DD (default: today)
     - limit: number of results (default: 20)
+    - offset: rows to skip, for pagination (default: 0)
+    - sort: numeric column to sort by, e.g. nb_hits (default: Matomo's order)
+    - order: asc or desc (default: desc)
     """
     period = request.query_params.get('period', 'month')
     date = request.query_params.get('date', 'today')
     limit = int(request.query_params.get('limit', 20))
+    offset = int(request.query_params.get('offset', 0))
 
-    downloads = matomo_service.get_downloads(period, date, limit)
+    downloads = matomo_service.get_downloads(
+        period, date, limit,
+        offset=offset,
+        sort=request.query_params.get('sort'),
+        order=request.query_params.get('order', 'desc'),
+    )
 
     if downloads is None:
         return Response(
@@ -183,7 +219,7 @@ def downloads(request):
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
 
-    return Response({"downloads": downloads})
+    return Response({"downloads": downloads, "limit": limit, "offset": offset})
 
 
 # ============== Geo Data ==============
@@ -294,17 +330,80 @@ def trends(request):
 
 # ============== Trending ==============
 
+def _wants_hydration(request):
+    return request.query_params.get('hydrate', 'false').lower() == 'true'
+
+
 @api_view(['GET'])
 def trending(request):
-    """Get trending articles from Redis."""
+    """
+    Get trending articles from Redis.
+
+    Query params:
+    - limit: number of results (default: 10)
+    - hydrate: include title, authors and journal of each article so
+      clients need no follow-up requests (default: false)
+    """
     limit = int(request.query_params.get('limit', 10))
 
     trending = redis_service.get_trending_articles(limit)
+    if _wants_hydration(request):
+        trending = article_metadata.hydrate(trending)
 
     serializer = TrendingArticleSerializer(trending, many=True)
     return Response({"trending": serializer.data})
 
 
+@api_view(['GET'])
+def time_series(request):
+    """
+    Get view/download time series derived from the event stream.
+
+    Query params:
+    - metric: views, downloads (default: views)
+    - article_id: restrict to one article, in daily buckets (optional)
+    - hours: number of hourly buckets for site-wide series (default: 24,
+      at most TIME_SERIES_MAX_HOURS)
+    - days: number of daily buckets for article series (default: 30,
+      at most TIME_SERIES_MAX_DAYS)
+    """
+    metric = request.query_params.get('metric', 'views')
+    article_id = request.query_params.get('article_id')
+
+    if metric not in ('views', 'downloads'):
+        return Response(
+            {"error": "metric must be views or downloads"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        if article_id:
+            days = int(request.query_params.get('days', 30))
+        else:
+            hours = int(request.query_params.get('hours', 24))
+    except ValueError:
+        return Response(
+            {"error": "days and hours must be integers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    now = datetime.utcnow()
+    if article_id:
+        days = max(1, min(days, getattr(settings, 'TIME_SERIES_MAX_DAYS', 365)))
+        buckets = [day_bucket(now - timedelta(days=i)) for i in range(days - 1, -1, -1)]
+    else:
+        hours = max(1, min(hours, getattr(settings, 'TIME_SERIES_MAX_HOURS', 24 * 30)))
+        buckets = [hour_bucket(now - timedelta(hours=i)) for i in range(hours - 1, -1, -1)]
+
+    series = redis_service.get_time_series(metric, buckets, article_id)
+
+    return Response({
+        "metric": metric,
+        "article_id": article_id,
+        "series": [{"bucket": b, "count": series.get(b, 0)} for b in buckets],
+    })
+
+
 @api_view(['POST'])
 def track_article_view(request):
     """
@@ -323,20 +422,23 @@ def track_article_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Increment counters
-    redis_service.increment_article_views(article_id)
-    redis_service.update_trending(article_id, score=1.0)
+    # Increment counters, unless the event stream worker derives them
+    if not settings.EVENT_STREAM_DERIVE_COUNTERS:
+        redis_service.increment_article_views(article_id)
+        redis_service.update_trending(article_id, score=1.0)
 
-    if journal_id:
-        redis_service.increment_journal_views(journal_id)
+        if journal_id:
+            redis_service.increment_journal_views(journal_id)
 
-    # Publish event
-    redis_service.publish_event("analytics:views", {
+    # Log and publish event
+    event = {
         "type": "view",
         "article_id": article_id,
         "journal_id": journal_id,
         "timestamp": datetime.utcnow().isoformat(),
-    })
+    }
+    redis_service.append_event(event)
+    redis_service.publish_event("analytics:views", event)
 
     return Response({
         "success": True,
@@ -363,16 +465,19 @@ def track_article_download(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Increment counters
-    redis_service.increment_article_downloads(article_id)
+    # Increment counters, unless the event stream worker derives them
+    if not settings.EVENT_STREAM_DERIVE_COUNTERS:
+        redis_service.increment_article_downloads(article_id)
 
-    # Publish event
-    redis_service.publish_event("analytics:downloads", {
+    # Log and publish event
+    event = {
         "type": "download",
         "article_id": article_id,
         "journal_id": journal_id,
         "timestamp": datetime.utcnow().isoformat(),
-    })
+    }
+    redis_service.append_event(event)
+    redis_service.publish_event("analytics:downloads", event)
 
     return Response({
         "success": True,
@@ -406,12 +511,92 @@ def article_metrics(request, article_id):
     })
 
 
+@api_view(['GET'])
+def articles_analytics(request):
+    """
+    Joined analytics for several articles at once.
+
+    Query params:
+    - ids: comma-separated article ids (required, at most 100)
+    - period, date: Matomo period and date (default: month, today)
+    """
+    article_ids = [i.strip() for i in request.query_params.get('ids', '').split(',') if i.strip()]
+    if not article_ids:
+        return Response(
+            {"error": "ids is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    max_ids = getattr(settings, 'ARTICLE_ANALYTICS_MAX_IDS', 100)
+    if len(article_ids) > max_ids:
+        return Response(
+            {"error": f"At most {max_ids} ids per request"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    period = request.query_params.get('period', 'month')
+    date = request.query_params.get('date', 'today')
+    return Response({
+        "period": period,
+        "date": date,
+        "articles": article_aggregator.get_records(article_ids, period, date),
+    })
+
+
+# ============== Authors ==============
+
+@api_view(['GET'])
+def authors(request):
+    """
+    Authors ranked across all journals.
+
+    Query params:
+    - by: "h_index" (default) or "citations"
+    - limit: number of authors (default: 20)
+    """
+    by = request.query_params.get('by', 'h_index')
+    if by not in ('h_index', 'citations'):
+        return Response(
+            {"error": "by must be 'h_index' or 'citations'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = int(request.query_params.get('limit', 20))
+    return Response({"by": by, "authors": author_index.top_authors(by, limit)})
+
+
+@api_view(['GET'])
+def author_detail(request, author_key):
+    """
+    An author's citations, h-index, views and downloads across their articles.
+
+    ``author_key`` is ``orcid:<ORCID>`` or ``name:<normalized name>``.
+    """
+    author = author_index.get_author(author_key)
+    if author is None:
+        return Response(
+            {"error": "Author not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(author)
+
+
 # ============== OJS Content Proxy ==============
 
+def _shape(request, payload, kind):
+    """Apply the ``fields`` and ``locale`` query params to an OJS payload."""
+    return shape_response(
+        payload,
+        kind,
+        fields=request.query_params.get('fields'),
+        locale=request.query_params.get('locale'),
+    )
+
+
 @api_view(['GET'])
 def ojs_journals(request):
-    """Get journals from OJS."""
-    journals = ojs_service.get_journals()
+    """Get journals, from the local mirror when it has been synced."""
+    journals = ojs_mirror.get_journals()
+    if journals is None:
+        journals = ojs_service.get_journals()
 
     if journals is None:
         return Response(
@@ -424,11 +609,20 @@ def ojs_journals(request):
 
 @api_view(['GET'])
 def ojs_issues(request, journal_path):
-    """Get issues for a journal from OJS."""
+    """
+    Get issues for a journal from OJS.
+
+    Query params:
+    - status, page
+    - fields: comma-separated fields to return, or "all" (default: compact)
+    - locale: locale of localized fields, or "all" (default: English)
+    """
     status_filter = request.query_params.get('status')
     page = int(request.query_params.get('page', 1))
 
-    issues = ojs_service.get_issues(journal_path, status_filter, page)
+    issues = ojs_mirror.get_issues(journal_path, status_filter, page)
+    if issues is None:
+        issues = ojs_service.get_issues(journal_path, status_filter, page)
 
     if issues is None:
         return Response(
@@ -436,19 +630,30 @@ def ojs_issues(request, journal_path):
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
 
-    return Response(issues)
+    return Response(_shape(request, issues, "issue"))
 
 
 @api_view(['GET'])
 def ojs_submissions(request, journal_path):
-    """Get submissions for a journal from OJS."""
+    """
+    Get submissions for a journal from OJS.
+
+    Query params:
+    - status, page, items_per_page
+    - fields: comma-separated fields to return, or "all" (default: compact)
+    - locale: locale of localized fields, or "all" (default: English)
+    """
     status_filter = request.query_params.get('status')
     page = int(request.query_params.get('page', 1))
     items_per_page = int(request.query_params.get('items_per_page', 20))
 
-    submissions = ojs_service.get_submissions(
+    submissions = ojs_mirror.get_submissions(
         journal_path, status_filter, page, items_per_page
     )
+    if submissions is None:
+        submissions = ojs_service.get_submissions(
+            journal_path, status_filter, page, items_per_page
+        )
 
     if submissions is None:
         return Response(
@@ -456,13 +661,21 @@ def ojs_submissions(request, journal_path):
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
 
-    return Response(submissions)
+    return Response(_shape(request, submissions, "article"))
 
 
 @api_view(['GET'])
 def ojs_article(request, journal_path, article_id):
-    """Get a specific article from OJS."""
-    article = ojs_service.get_article(journal_path, article_id)
+    """
+    Get a specific article from OJS.
+
+    Query params:
+    - fields: comma-separated fields to return, or "all" (default: compact)
+    - locale: locale of localized fields, or "all" (default: English)
+    """
+    article = ojs_mirror.get_article(article_id, journal_path)
+    if article is None:
+        article = ojs_service.get_article(journal_path, article_id)
 
     if article is None:
         return Response(
@@ -470,13 +683,15 @@ def ojs_article(request, journal_path, article_id):
             status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
 
-    return Response(article)
+    return Response(_shape(request, article, "article"))
 
 
 @api_view(['GET'])
 def ojs_stats(request, journal_path):
     """Get statistics for a journal."""
-    stats = ojs_service.get_journal_stats(journal_path)
+    stats = ojs_mirror.get_journal_stats(journal_path)
+    if stats is None:
+        stats = ojs_service.get_journal_stats(journal_path)
     return Response(stats)
 
 
@@ -489,40 +704,49 @@ def article_citations(request, article_id):
     
     Query params:
     - force_refresh: Force cache refresh (default: false)
+    - journal_path: Journal of the article (optional when the article is
+      in the OJS mirror)
     """
     force_refresh = request.query_params.get('force_refresh', 'false').lower() == 'true'
     
     # Try to get from Redis cache first
-    from .services.redis_service import redis_service
-    import json
-    
-    cached = redis_service.redis.hgetall(f"article:{article_id}:citations")
-    if cached and not force_refresh:
+    client = redis_service.raw_client
+    if client is not None and not force_refresh:
         try:
-            data = cached.get(b"data")
+            # The stored result is binary: read the hash without decoding
+            count, total, updated, data = client.hmget(
+                article_key(article_id, "citations"),
+                ["citation_count", "total_results", "last_updated", "data"],
+            )
             if data:
+                citations = cache_codec.decode(data).get("citations")
+                if citations is None:
+                    citations = citation_graph.cited_by(article_id)
                 return Response({
                     "article_id": article_id,
                     "cached": True,
-                    "citation_count": cached.get(b"citation_count", 0),
-                    "total_results": cached.get(b"total_results", 0),
-                    "last_updated": cached.get(b"last_updated", b"").decode(),
-                    "citations": json.loads(data).get("citations", []),
+                    "citation_count": int(count or 0),
+                    "total_results": int(total or 0),
+                    "last_updated": updated.decode() if updated else "",
+                    "citations": citations,
                 })
         except Exception as e:
             logger.warning(f"Failed to get cached citations: {e}")
     
-    # Get article from OJS
-    # We need journal_path to get the article, so we'll search by article_id
-    # For now, return error if no journal_path provided
-    journal_path = request.query_params.get('journal_path')
+    # Find the article's journal through the mirror's article index
+    journal_path = (
+        request.query_params.get('journal_path')
+        or ojs_mirror.journal_for_article(article_id)
+    )
     if not journal_path:
         return Response(
-            {"error": "journal_path is required"},
+            {"error": "journal_path is required for articles not in the OJS mirror"},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    article = ojs_service.get_article(journal_path, int(article_id))
+    article = ojs_mirror.get_article(int(article_id), journal_path)
+    if article is None:
+        article = ojs_service.get_article(journal_path, int(article_id))
     if not article:
         return Response(
             {"error": "Article not found"},
@@ -539,6 +763,7 @@ def article_citations(request, article_id):
         author=author_name,
         journal=journal_path,
         force_refresh=force_refresh,
+        article_id=article_id,
     )
     
     if citations is None:
@@ -560,6 +785,134 @@ def article_citations(request, article_id):
     })
 
 
+@api_view(['POST'])
+def citations_batch(request):
+    """
+    Stored citations for many articles at once.
+
+    Body:
+    - ids: list of article ids (required, at most CITATION_BATCH_MAX_IDS)
+    - fields: "count" (default) or "full" to include the citing works
+
+    Only citations already stored by the tracker are returned; articles
+    without them are listed under "missing" and are not searched.
+    """
+    article_ids = request.data.get('ids')
+    if not isinstance(article_ids, list) or not article_ids:
+        return Response(
+            {"error": "ids must be a non-empty list"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    max_ids = getattr(settings, 'CITATION_BATCH_MAX_IDS', 200)
+    if len(article_ids) > max_ids:
+        return Response(
+            {"error": f"At most {max_ids} ids per request"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    fields = request.data.get('fields', 'count')
+    if fields not in ('count', 'full'):
+        return Response(
+            {"error": "fields must be 'count' or 'full'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    stored = citation_service.get_stored_citations(article_ids, full=fields == 'full')
+    return Response({
+        "articles": [
+            {"article_id": article_id, **entry}
+            for article_id, entry in stored.items()
+            if entry is not None
+        ],
+        "missing": [article_id for article_id, entry in stored.items() if entry is None],
+    })
+
+
+@api_view(['GET'])
+def article_cited_by(request, article_id):
+    """Works citing an article, from the citation graph."""
+    return Response({
+        "article_id": article_id,
+        "works": citation_graph.cited_by(article_id),
+    })
+
+
+@api_view(['GET'])
+def article_co_cited(request, article_id):
+    """
+    Articles cited together with an article.
+
+    Query params:
+    - limit: number of articles (default: 10)
+    """
+    limit = int(request.query_params.get('limit', 10))
+    return Response({
+        "article_id": article_id,
+        "articles": citation_graph.co_cited(article_id, limit),
+    })
+
+
+@api_view(['GET'])
+def citing_work(request, work_id):
+    """A citing work and the articles it cites."""
+    work = citation_graph.get_work(work_id)
+    if work is None:
+        return Response(
+            {"error": "Citing work not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(work)
+
+
+@api_view(['GET'])
+def citing_venues(request):
+    """
+    Venues citing our articles most.
+
+    Query params:
+    - ids: comma-separated article ids (default: all articles)
+    - limit: number of venues (default: 10)
+    """
+    article_ids = [i.strip() for i in request.query_params.get('ids', '').split(',') if i.strip()]
+    limit = int(request.query_params.get('limit', 10))
+    return Response({"venues": citation_graph.top_venues(article_ids, limit)})
+
+
+@api_view(['GET'])
+def citation_trajectories(request):
+    """
+    Daily citation counts for several articles.
+
+    Query params:
+    - ids: comma-separated article ids (required, at most 100)
+    - days: days of history (default: 90)
+    - diffs: also return added/removed citing works per day (default: false)
+    """
+    article_ids = [i.strip() for i in request.query_params.get('ids', '').split(',') if i.strip()]
+    if not article_ids:
+        return Response(
+            {"error": "ids is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    max_ids = getattr(settings, 'ARTICLE_ANALYTICS_MAX_IDS', 100)
+    if len(article_ids) > max_ids:
+        return Response(
+            {"error": f"At most {max_ids} ids per request"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    days = int(request.query_params.get('days', 90))
+    series = citation_history.get_trajectories(article_ids, days)
+    articles = [
+        {"article_id": article_id, "series": points}
+        for article_id, points in series.items()
+    ]
+    if request.query_params.get('diffs', 'false').lower() == 'true':
+        for article in articles:
+            article["diffs"] = citation_history.get_diffs(article["article_id"])
+
+    return Response({"days": days, "articles": articles})
+
+
 @api_view(['GET'])
 def search_citations(request):
     """
@@ -598,15 +951,19 @@ def search_citations(request):
 @api_view(['POST'])
 def update_citations(request):
     """
-    Trigger daily citation update for all articles.
-    This endpoint should be called daily via cron/celery.
+    Trigger the daily citation update.
+    This endpoint should be called daily via cron/celery; it refreshes the
+    most overdue articles within CITATION_DAILY_BUDGET Serper lookups.
     """
-    result = citation_tracker.update_all_citations()
+    result = citation_scheduler.run()
     return Response({
         "success": True,
         "updated": len(result.get("updated", [])),
         "failed": len(result.get("failed", [])),
         "total": result.get("total", 0),
+        "lookups": result.get("lookups", 0),
+        "due": result.get("due", 0),
+        "budget": result.get("budget", 0),
         "timestamp": result.get("timestamp"),
     })
 
@@ -624,6 +981,10 @@ def ojs_all_metrics(request):
 def ojs_journal_metrics(request, journal_path):
     """Get comprehensive metrics for a specific journal."""
     metrics = ojs_service.get_journal_metrics(journal_path)
+    # Impact factors come from the compute_impact_metrics batch job
+    impact = impact_metrics.get(journal_path)
+    if impact and isinstance(metrics, dict):
+        metrics["impact"] = impact
     return Response(metrics)
 
 
@@ -639,13 +1000,13 @@ def ojs_article_metrics(request, journal_path, article_id):
         )
     
     # Get cached citations if available
-    from .services.redis_service import redis_service
-    import json
-    
-    cached_citations = redis_service.redis.hgetall(f"article:{article_id}:citations")
-    if cached_citations:
-        metrics["citation_count"] = int(cached_citations.get(b"citation_count", 0))
-        metrics["citation_last_updated"] = cached_citations.get(b"last_updated", b"").decode()
+    client = redis_service.client
+    cached_citations = client.hmget(
+        article_key(article_id, "citations"), ["citation_count", "last_updated"]
+    ) if client else None
+    if cached_citations and cached_citations[1] is not None:
+        metrics["citation_count"] = int(cached_citations[0] or 0)
+        metrics["citation_last_updated"] = cached_citations[1]
     
     return Response(metrics)
 
@@ -5,6 +5,8 @@ Django settings for backend project.
 import os
 from pathlib import Path
 
+from analytics.redis_nodes import parse_nodes
+
 # Build paths inside the project
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +51,61 @@ REDIS_HOST = os.environ.get('REDIS_HOST', 'redis')
 REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
 REDIS_DB = int(os.environ.get('REDIS_DB', 0))
 
+# Redis topology: "standalone", "sentinel" or "cluster"
+REDIS_MODE = os.environ.get('REDIS_MODE', 'standalone')
+# Sentinel: comma-separated host:port list and the monitored master name
+REDIS_SENTINELS = os.environ.get('REDIS_SENTINELS', '')
+REDIS_SENTINEL_MASTER = os.environ.get('REDIS_SENTINEL_MASTER', 'mymaster')
+# Cluster: comma-separated host:port list of startup nodes
+REDIS_CLUSTER_NODES = os.environ.get('REDIS_CLUSTER_NODES', '')
+# Wrap article ids in {hash tags} so each article's keys share one cluster slot.
+# Defaults to on in cluster mode; changing it renames the per-article keys.
+REDIS_HASH_TAGS = os.environ.get('REDIS_HASH_TAGS', str(REDIS_MODE == 'cluster')).lower() == 'true'
+# Number of sorted sets trending scores are sharded over (spread over cluster nodes)
+REDIS_TRENDING_SHARDS = int(os.environ.get('REDIS_TRENDING_SHARDS', 16 if REDIS_MODE == 'cluster' else 1))
+
+# Article counter storage: "keys" (one string key per counter) or "hash" (packed
+# into small hashes). Keep 2 * bucket size <= Redis hash-max-listpack-entries so the
+# hashes stay listpack-encoded. Switch with: manage.py migrate_counter_layout
+REDIS_COUNTER_LAYOUT = os.environ.get('REDIS_COUNTER_LAYOUT', 'keys')
+REDIS_COUNTER_BUCKET_SIZE = int(os.environ.get('REDIS_COUNTER_BUCKET_SIZE', 64))
+
+# Seconds to skip Redis calls after a failure, so requests never wait on a dead socket
+REDIS_CIRCUIT_COOLDOWN = float(os.environ.get('REDIS_CIRCUIT_COOLDOWN', 10))
+
+# Tracking spool - local write-ahead log for tracking writes while Redis is down
+TRACKING_SPOOL_ENABLED = os.environ.get('TRACKING_SPOOL_ENABLED', 'True').lower() == 'true'
+TRACKING_SPOOL_DIR = os.environ.get('TRACKING_SPOOL_DIR', str(BASE_DIR / 'spool'))
+TRACKING_SPOOL_FSYNC_BATCH = int(os.environ.get('TRACKING_SPOOL_FSYNC_BATCH', 100))
+TRACKING_SPOOL_FSYNC_INTERVAL = float(os.environ.get('TRACKING_SPOOL_FSYNC_INTERVAL', 1.0))
+
+# Event stream - durable log of tracking events consumed by run_event_worker
+EVENT_STREAM_ENABLED = os.environ.get('EVENT_STREAM_ENABLED', 'True').lower() == 'true'
+EVENT_STREAM_MAXLEN = int(os.environ.get('EVENT_STREAM_MAXLEN', 1000000))
+# When True, counters and trending are derived by the worker instead of the request
+EVENT_STREAM_DERIVE_COUNTERS = os.environ.get('EVENT_STREAM_DERIVE_COUNTERS', 'False').lower() == 'true'
+# Longest range /time-series serves: hourly buckets site-wide, daily per article
+TIME_SERIES_MAX_HOURS = int(os.environ.get('TIME_SERIES_MAX_HOURS', 24 * 30))
+TIME_SERIES_MAX_DAYS = int(os.environ.get('TIME_SERIES_MAX_DAYS', 365))
+
+# Storage backend for counters, trending and caches: "redis", or "memory" for
+# single-process installs and tests that should not need a Redis server
+ANALYTICS_STORAGE_BACKEND = os.environ.get('ANALYTICS_STORAGE_BACKEND', 'redis')
+
+# Cached values and stored citation results: "msgpack" (when installed) or "json",
+# zlib-compressed from CACHE_COMPRESS_THRESHOLD bytes. Compare with: manage.py benchmark_cache_codec
+CACHE_CODEC = os.environ.get('CACHE_CODEC', 'msgpack')
+CACHE_COMPRESS_THRESHOLD = int(os.environ.get('CACHE_COMPRESS_THRESHOLD', 1024))
+CACHE_COMPRESS_LEVEL = int(os.environ.get('CACHE_COMPRESS_LEVEL', 1))
+# In-process LRU in front of the Redis cache: entries per worker (0 disables) and
+# seconds an entry may be served locally; changes are broadcast over pub/sub
+CACHE_LOCAL_MAX_ENTRIES = int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1024))
+CACHE_LOCAL_TTL = float(os.environ.get('CACHE_LOCAL_TTL', 5))
+# cache_fill: how eagerly entries are recomputed before expiry (0 = only on expiry)
+# and the seconds a cross-process fill lock is held at most
+CACHE_FILL_BETA = float(os.environ.get('CACHE_FILL_BETA', 1.0))
+CACHE_FILL_LOCK_TIMEOUT = float(os.environ.get('CACHE_FILL_LOCK_TIMEOUT', 30))
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
@@ -59,6 +116,31 @@ CACHES = {
     }
 }
 
+if REDIS_MODE == 'sentinel':
+    CACHES['default'].update({
+        'LOCATION': f'redis://{REDIS_SENTINEL_MASTER}/{REDIS_DB}',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.SentinelClient',
+            'CONNECTION_FACTORY': 'django_redis.pool.SentinelConnectionFactory',
+            'SENTINELS': parse_nodes(REDIS_SENTINELS, 26379),
+        },
+    })
+elif REDIS_MODE == 'cluster' and REDIS_CLUSTER_NODES:
+    _host, _port = parse_nodes(REDIS_CLUSTER_NODES, 6379)[0]
+    CACHES['default'].update({
+        'LOCATION': f'redis://{_host}:{_port}/0',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_FACTORY': 'analytics.services.redis_connection.ClusterConnectionFactory',
+        },
+    })
+if ANALYTICS_STORAGE_BACKEND == 'memory':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Channel layers for WebSockets
 CHANNEL_LAYERS = {
     'default': {
@@ -103,13 +185,55 @@ if OJS_JOURNALS_CONFIG:
         if len(parts) == 2:
             OJS_JOURNALS.append({'path': parts[0].strip(), 'id': int(parts[1].strip())})
 
+# Local OJS catalog mirror. Proxy views serve from the mirror and refresh it
+# in the background once it is older than OJS_MIRROR_MAX_AGE seconds.
+OJS_MIRROR_ENABLED = os.environ.get('OJS_MIRROR_ENABLED', 'true').lower() == 'true'
+OJS_MIRROR_MAX_AGE = int(os.environ.get('OJS_MIRROR_MAX_AGE', 300))
+
+# Concurrent page requests when crawling a whole OJS collection
+OJS_MAX_CONCURRENCY = int(os.environ.get('OJS_MAX_CONCURRENCY', 4))
+# OJS responses kept with their ETag/Last-Modified for conditional requests
+OJS_CONDITIONAL_CACHE_SIZE = int(os.environ.get('OJS_CONDITIONAL_CACHE_SIZE', 512))
+# Total size of the response bodies kept for those requests
+OJS_CONDITIONAL_CACHE_BYTES = int(os.environ.get('OJS_CONDITIONAL_CACHE_BYTES', 32 * 1024 * 1024))
+# Seconds /ojs/all-metrics is cached
+OJS_METRICS_CACHE_TTL = int(os.environ.get('OJS_METRICS_CACHE_TTL', 300))
+
+# Article metadata used to hydrate trending responses (?hydrate=true)
+ARTICLE_METADATA_TTL = int(os.environ.get('ARTICLE_METADATA_TTL', 3600))
+ARTICLE_METADATA_MISSING_TTL = int(os.environ.get('ARTICLE_METADATA_MISSING_TTL', 300))
+
+# Joined per-article analytics (/articles/analytics)
+ARTICLE_ANALYTICS_MATOMO_MAX_AGE = int(os.environ.get('ARTICLE_ANALYTICS_MATOMO_MAX_AGE', 300))
+ARTICLE_ANALYTICS_MAX_IDS = int(os.environ.get('ARTICLE_ANALYTICS_MAX_IDS', 100))
+
 # Matomo Configuration
 MATOMO_BASE_URL = os.environ.get('MATOMO_BASE_URL', 'http://matomo:8085')
 MATOMO_TOKEN = os.environ.get('MATOMO_TOKEN', '')
 MATOMO_SITE_ID = int(os.environ.get('MATOMO_SITE_ID', 1))
+# Seconds Matomo dashboard reports are cached
+MATOMO_CACHE_TTL = int(os.environ.get('MATOMO_CACHE_TTL', 300))
+# Rows fetched per cached report (-1 for all); limits, offsets and sorting are
+# served from this copy
+MATOMO_REPORT_MAX_ROWS = int(os.environ.get('MATOMO_REPORT_MAX_ROWS', 1000))
 
 # Serper API Configuration (for citation tracking)
 SERPER_API_KEY = os.environ.get('SERPER_API_KEY', '')
+# Serper quota (requests per second and burst) and citation update workers
+SERPER_RATE_LIMIT = float(os.environ.get('SERPER_RATE_LIMIT', 5))
+SERPER_RATE_BURST = int(os.environ.get('SERPER_RATE_BURST', 5))
+CITATION_CONCURRENCY = int(os.environ.get('CITATION_CONCURRENCY', 4))
+# Scheduled refreshes (update_citations --scheduled): lookups per day and
+# the per-article interval, which stretches while citation counts are unchanged
+CITATION_DAILY_BUDGET = int(os.environ.get('CITATION_DAILY_BUDGET', 500))
+CITATION_REFRESH_INTERVAL_DAYS = int(os.environ.get('CITATION_REFRESH_INTERVAL_DAYS', 1))
+CITATION_MAX_REFRESH_INTERVAL_DAYS = int(os.environ.get('CITATION_MAX_REFRESH_INTERVAL_DAYS', 30))
+# Estimated Jaccard similarity above which two titles are the same work
+TITLE_SIMILARITY_THRESHOLD = float(os.environ.get('TITLE_SIMILARITY_THRESHOLD', 0.8))
+# Days of daily citation counts and citing-work diffs kept per article
+CITATION_HISTORY_DAYS = int(os.environ.get('CITATION_HISTORY_DAYS', 365))
+# Article ids accepted by POST /citations/batch
+CITATION_BATCH_MAX_IDS = int(os.environ.get('CITATION_BATCH_MAX_IDS', 200))
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -82,17 +82,17 @@ export const analyticsAPI = {
   },
 
   // Top Articles
-  getTopArticles: async (period: string = 'week', date: string = 'today', limit: number = 20) => {
+  getTopArticles: async (period: string = 'week', date: string = 'today', limit: number = 20, offset: number = 0) => {
     const response = await djangoApi.get('/api/top-articles', {
-      params: { period, date, limit }
+      params: { period, date, limit, offset }
     })
     return response.data
   },
 
   // Downloads
-  getDownloads: async (period: string = 'month', date: string = 'today', limit: number = 20) => {
+  getDownloads: async (period: string = 'month', date: string = 'today', limit: number = 20, offset: number = 0) => {
     const response = await djangoApi.get('/api/downloads', {
-      params: { period, date, limit }
+      params: { period, date, limit, offset }
     })
     return response.data
   },
@@ -136,9 +136,9 @@ export const analyticsAPI = {
   },
 
   // Trending
-  getTrending: async (limit: number = 10) => {
+  getTrending: async (limit: number = 10, hydrate: boolean = false) => {
     const response = await djangoApi.get('/api/trending', {
-      params: { limit }
+      params: { limit, hydrate }
     })
     return response.data
   },